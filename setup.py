@@ -13,7 +13,7 @@ setup(
     package_data = {'syncsketchGUI.config': ['*.yaml']},
     install_requires = [
           "requests",
-          "syncsketch",
+          "syncsketch==1.0.12.1",
           "pyyaml"
     ],
 )
\ No newline at end of file
@@ -251,6 +251,7 @@ def uninitializePlugin(mobject):
     # Remove the menu
     import syncsketchGUI
     syncsketchGUI.delete_menu()
+    syncsketchGUI.remove_callbacks()
     
     # Deregister command pairs
     mplugin = ommpx.MFnPlugin(mobject)
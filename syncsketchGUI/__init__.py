@@ -10,6 +10,7 @@ except:
 
 
 import os
+import threading
 import time
 import webbrowser
 import logging
@@ -40,8 +41,9 @@ WAIT_TIME = 0.1 # seconds
 
 
 from syncsketchGUI.lib import user, path
-from syncsketchGUI.lib import video, database
-from syncsketchGUI.lib.gui import icons, qt_utils, qt_widgets
+from syncsketchGUI.lib import video, database, jobs, presets
+from syncsketchGUI.lib import upload_queue
+from syncsketchGUI.lib.gui import icons, qt_utils, qt_widgets, ui_settings
 import syncsketchGUI.gui
 
 # ======================================================================
@@ -56,6 +58,9 @@ PRESET_YAML = 'syncsketch_preset.yaml'
 CACHE_YAML = 'syncsketch_cache.yaml'
 VIEWPORT_PRESET_YAML = 'syncsketch_viewport.yaml'
 
+# set from the start of record() until it is done
+_recording = False
+
 # ======================================================================
 # Module Functions
 
@@ -63,10 +68,21 @@ VIEWPORT_PRESET_YAML = 'syncsketch_viewport.yaml'
 def show_web_login_window():
     gui.show_web_login_window()
 
+def remove_callbacks():
+    """
+    Remove the Maya callbacks and capture panels the session keeps, before a reload or unloading the plugin
+    """
+    from syncsketchGUI.lib.maya import capabilities, view_state
+    capabilities.reset_capabilities()
+    view_state.reset_view_state()
+    maya_scene.close_capture_pool()
+
 def reload_toolkit():
     """
     Convenient Method to reload
     """
+    remove_callbacks()
+
     from syncsketchGUI.lib import path
     from syncsketchGUI.lib import database
     from syncsketchGUI.lib import video
@@ -116,6 +132,9 @@ def show_download_window():
 def show_viewport_preset_window():
     gui.show_viewport_preset_window()
 
+def show_batch_upload_window():
+    gui.show_batch_upload_window()
+
 
 def get_current_file():
     # validate file name
@@ -160,12 +179,14 @@ def play(filename = None):
     logger.info('Playing current video: {}'.format(filename.replace('"', '')))
 
 
-def upload(open_after_upload = None, show_success_msg = False):
+def upload(open_after_upload = None, show_success_msg = False, on_progress = None):
 
     logger.info("open_after_upload Url: {}".format(open_after_upload))
-    uploaded_item = _upload()
+    uploaded_item = _upload(on_progress = on_progress)
+    return show_uploaded_item(uploaded_item, open_after_upload)
 
 
+def show_uploaded_item(uploaded_item, open_after_upload = None):
     if not uploaded_item:
         return
 
@@ -189,7 +210,7 @@ def upload(open_after_upload = None, show_success_msg = False):
 
 def download(current_user = None):
     if not current_user:
-        current_user = user.SyncSketchUser()
+        current_user = user.get_current_user()
     review_id = database.read_cache('target_review_id')
     media_id  = database.read_cache('target_media_id')
     logger.info("current_user: %s"%current_user)
@@ -200,33 +221,78 @@ def download(current_user = None):
 
 def downloadVideo(current_user = None, media_id=None):
     if not current_user:
-        current_user = user.SyncSketchUser()
+        current_user = user.get_current_user()
     media_id  = media_id or database.read_cache('target_media_id')
     logger.info("current_user: %s"%current_user)
     logger.info("target_media_id: %s"%media_id)
     return current_user.download_converted_video(media_id)
 
 
-def record(upload_after_creation = None, play_after_creation = None,  show_success_msg = True):
+def _progress_in_main_thread(on_progress):
+    '''
+    Wrap on_progress(progress) as the on_progress(job, progress) of a background
+    job, it runs deferred on Maya's main thread at most once every WAIT_TIME seconds
+    '''
+    if not on_progress:
+        return None
+    deferred = _in_main_thread(on_progress)
+    last_call = [0.0]
+
+    def throttled(job, progress):
+        now = time.time()
+        if now - last_call[0] >= WAIT_TIME or progress.get('end') or progress.get('percent') == 100.0:
+            last_call[0] = now
+            deferred(progress)
+    return throttled
+
+
+def is_recording():
+    '''
+    True from the start of record() until its on_finished is called
+    '''
+    return _recording
+
+
+def record(upload_after_creation = None, play_after_creation = None,  show_success_msg = True,
+           on_encode_progress = None, on_upload_progress = None, on_finished = None):
+    '''
+    Capture a playblast, an image sequence is then encoded and uploaded in the
+    background. on_finished(recordData) and the progress callbacks are called
+    on Maya's main thread. Returns recordData if it is done right away, None
+    while the encode still runs.
+    '''
     # This a wrapper function and if called individually should mirror all the same effect as hitting 'record' in the UI
+    global _recording
+    if _recording:
+        logger.warning("A recording is still running, try again once it is done")
+        return {"playblast_file": ""}
+    _recording = True
+
+    def on_done(recordData):
+        global _recording
+        _recording = False
+        if on_finished:
+            on_finished(recordData)
+
+    try:
+        return _record_and_process(upload_after_creation, play_after_creation, on_done,
+                                   on_encode_progress = on_encode_progress, on_upload_progress = on_upload_progress)
+    except Exception:
+        _recording = False
+        raise
+
+
+def _record_and_process(upload_after_creation, play_after_creation, on_done,
+                        on_encode_progress = None, on_upload_progress = None):
     recordData = {}
     capturedFile = _record()
     if not capturedFile:
-        return {"playblast_file": ""}
+        recordData["playblast_file"] = ""
+        on_done(recordData)
+        return recordData
     logger.info("capturedFile: {}".format(capturedFile))
     capturedFileNoExt, ext = os.path.splitext(capturedFile)
-    if capturedFileNoExt[-5:] == '.####':
-        #Reencode to quicktime
-        recordData["playblast_file"] = video.encodeToH264Mov(
-            capturedFile, output_file=capturedFileNoExt[:-5] + ".mov")
-        logger.info("reencoded File: {}".format(recordData["playblast_file"]))
-        database.dump_cache({"last_recorded_selection": recordData["playblast_file"]})
-    
-    else:
-        recordData["playblast_file"] = capturedFile
-    # Post actions
 
-    # To Do - post Recording script call
     if upload_after_creation is None:
         upload_after_creation = True if database.read_cache('ps_upload_after_creation_checkBox') == 'true' else False
 
@@ -235,17 +301,313 @@ def record(upload_after_creation = None, play_after_creation = None,  show_succe
 
     open_after_creation = True if database.read_cache('ps_open_afterUpload_checkBox') == 'true' else False
 
-    if upload_after_creation:
-        uploaded_item = upload(open_after_upload = open_after_creation)
-        recordData["uploaded_item"] = uploaded_item
-    else:
-        if play_after_creation:
-            play(recordData["playblast_file"])
+    def post_actions(uploaded_item = None, sent = False):
+        # To Do - post Recording script call
+        try:
+            if upload_after_creation:
+                if uploaded_item:
+                    uploaded_item = show_uploaded_item(uploaded_item, open_after_upload = open_after_creation)
+                elif not sent:
+                    uploaded_item = upload(open_after_upload = open_after_creation, on_progress = on_upload_progress)
+                recordData["uploaded_item"] = uploaded_item
+            else:
+                if play_after_creation:
+                    play(recordData["playblast_file"])
+        finally:
+            on_done(recordData)
+        return recordData
+
+    if capturedFileNoExt[-5:] != '.####':
+        recordData["playblast_file"] = capturedFile
+        return post_actions()
+
+    #Reencode to quicktime in the background and keep the UI responsive
+    output_file = path.sanitize(capturedFileNoExt[:-5] + ".mov")
+    target = get_upload_target()
+    send = upload_after_creation and target['item_type'] in ['review', 'media']
+    post_data = _get_post_data() if send else None
+
+    def on_encoded(encode_job, message = None):
+        recordData["playblast_file"] = video.get_encoded_file(encode_job, capturedFile, output_file)
+        database.dump_cache({"last_recorded_selection": recordData["playblast_file"]})
+        logger.info("reencoded File: {}".format(recordData["playblast_file"]))
+        if not send or encode_job.state != jobs.FINISHED:
+            post_actions()
+            return
+        # the upload view needs the Content-Length, so the mov goes out once ffmpeg is done with it
+        _send_recording(recordData["playblast_file"], target, post_data, on_upload_progress,
+                        on_sent = lambda uploaded_item: post_actions(uploaded_item, sent = True))
+
+    video.encodeToH264MovAsync(capturedFile, output_file = output_file,
+                               on_progress = _progress_in_main_thread(on_encode_progress),
+                               on_finished = _in_main_thread(on_encoded),
+                               on_error = _in_main_thread(on_encoded))
+
+
+def _send_recording(playblast_file, target, post_data, on_progress, on_sent, current_user = None):
+    '''
+    Upload the recorded mov in the background, on_sent(uploaded_item) is called
+    on Maya's main thread, the item is None if the upload failed. A failed
+    upload isn't tried again as the file may have been sent already.
+    '''
+    if not current_user:
+        current_user = user.get_current_user()
+
+    def on_upload_done(upload_job, message = None):
+        if upload_job.state != jobs.FINISHED or not upload_job.result:
+            logger.error('Uploading {} failed: {}'.format(playblast_file, upload_job.error))
+            on_sent(None)
+            return
+        on_sent(upload_job.result)
+
+    jobs.FunctionJob(_send_upload, args = (current_user, target, playblast_file, post_data),
+                     on_progress = _progress_in_main_thread(on_progress),
+                     on_finished = _in_main_thread(on_upload_done),
+                     on_error = _in_main_thread(on_upload_done)).start()
+
+
+def _send_upload(job, current_user, target, filepath, post_data):
+    item_parent_id = target['item_id'] if target['item_type'] == 'media' else False
+    logger.info('Sending {} to review_id {}'.format(filepath, target['review_id']))
+    uploaded_item = current_user.send_media_to_review(target['review_id'], filepath, noConvertFlag = True,
+                                                      itemParentId = item_parent_id, data = post_data,
+                                                      on_progress = lambda progress: job.set_progress(**progress))
+    return _finish_upload(current_user, uploaded_item, target['review_id'], filepath)
+
+
+def record_batch(shots = None, upload_after_creation = None):
+    '''
+    Record several cameras/shots with the current settings in one go.
+    shots is a list of dicts with camera and optionally name, start_frame, end_frame
+    and target (see queue_batch_upload), it defaults to the shots of the camera sequencer.
+    Image sequences are encoded and every playblast is queued for upload in the
+    background while the next shot is recorded.
+    Returns a list of dicts with shot, playblast_file and the encode_job if any.
+    '''
+    shots = shots or maya_scene.get_sequencer_shots()
+    if not shots:
+        logger.info('No shots to record')
+        return []
+
+    recArgs = _get_record_args()
+    if not recArgs:
+        return []
+
+    if upload_after_creation is None:
+        upload_after_creation = True if database.read_cache('ps_upload_after_creation_checkBox') == 'true' else False
+    current_target = get_upload_target()
+    shot_uploads = _ShotUploads(upload_after_creation)
+
+    records = []
+    def on_captured(shot, playblast_file):
+        records.append(_process_shot(shot, playblast_file, recArgs, current_target, shot_uploads))
+
+    try:
+        maya_scene.playblast_batch(
+            shots,
+            viewport_preset=database.read_cache('current_viewport_preset'),
+            viewport_preset_yaml=VIEWPORT_PRESET_YAML,
+            on_captured=on_captured,
+            **recArgs
+        )
+    finally:
+        shot_uploads.release()
+    return records
+
+
+def record_farm(shots = None, workers = None, upload_after_creation = None, on_finished = None):
+    '''
+    Like record_batch, but the scene is saved once and every shot is captured
+    by a background mayapy process, so maya stays usable meanwhile.
+    on_finished(records) is called on Maya's main thread once all shots are done.
+    Returns the running CaptureFarm.
+    '''
+    from syncsketchGUI.lib.maya import farm
+
+    shots = shots or maya_scene.get_sequencer_shots()
+    recArgs = _get_record_args()
+    if not shots or not recArgs:
+        return
+
+    if upload_after_creation is None:
+        upload_after_creation = True if database.read_cache('ps_upload_after_creation_checkBox') == 'true' else False
+    current_target = get_upload_target()
+    shot_uploads = _ShotUploads(upload_after_creation)
+
+    preset = maya_scene.get_viewport_args(database.read_cache('current_viewport_preset'), VIEWPORT_PRESET_YAML)
+    preset = dict(preset, **recArgs)
+    items = []
+    for shot in shots:
+        items.append({
+            'camera': shot['camera'],
+            'start_frame': shot.get('start_frame', recArgs['start_frame']),
+            'end_frame': shot.get('end_frame', recArgs['end_frame']),
+            'filename': maya_scene.get_shot_filepath(recArgs['filename'], shot),
+        })
+
+    records = []
+    def on_item_finished(job):
+        if job.output_file:
+            shot = shots[job.index]
+            playblast_file = maya_scene.add_extension(job.output_file, recArgs)
+            records.append(_process_shot(shot, playblast_file, recArgs, current_target, shot_uploads))
+
+    def on_farm_finished(capture_farm):
+        shot_uploads.release()
+        if on_finished:
+            on_finished(records)
+
+    # the workers are watched from background threads, the scene and the caches are touched on the main thread
+    return farm.CaptureFarm(items, preset = preset, workers = workers or farm.DEFAULT_WORKERS,
+                            on_item_finished = _in_main_thread(on_item_finished),
+                            on_finished = _in_main_thread(on_farm_finished)).start()
+
+
+def record_sharded(shards = None, workers = None, upload_after_creation = None, on_finished = None):
+    '''
+    Record the current camera and frame range split into shards, each shard
+    is captured by a background mayapy process and the frames are encoded
+    to one mov with the scene's frame numbers.
+    on_finished(sharded) is called on Maya's main thread once the mov is written.
+    Returns the running ShardedCapture.
+    '''
+    from syncsketchGUI.lib.maya import farm
+    import maya.mel as mel
+
+    recArgs = _get_record_args()
+    if not recArgs:
+        return
 
-    return recordData
+    if upload_after_creation is None:
+        upload_after_creation = True if database.read_cache('ps_upload_after_creation_checkBox') == 'true' else False
+    current_target = dict(get_upload_target(),
+                          first_frame = recArgs['start_frame'],
+                          last_frame = recArgs['end_frame'])
+
+    preset = maya_scene.get_viewport_args(database.read_cache('current_viewport_preset'), VIEWPORT_PRESET_YAML)
+    preset = dict(preset, **recArgs)
+    for key in ['camera', 'start_frame', 'end_frame', 'filename']:
+        preset.pop(key, None)
+
+    def on_sharded(sharded):
+        if sharded.output_file:
+            database.save_last_recorded(dict(recArgs, filename = sharded.output_file))
+            database.dump_cache({"last_recorded_selection": sharded.output_file})
+            if upload_after_creation:
+                _queue_shot_upload(sharded.output_file, current_target)
+        if on_finished:
+            on_finished(sharded)
+
+    shards = shards or farm.DEFAULT_WORKERS
+    return farm.ShardedCapture(recArgs['camera'], recArgs['start_frame'], recArgs['end_frame'], recArgs['filename'],
+                               shards = shards, preset = preset, workers = workers or shards,
+                               framerate = mel.eval('currentTimeUnitToFPS()'),
+                               on_finished = _in_main_thread(on_sharded)).start()
+
+
+def _in_main_thread(callback):
+    '''
+    Wrap a callback of a background job so it runs deferred on Maya's main thread
+    '''
+    import maya.utils
+
+    def deferred(*args, **kwargs):
+        maya.utils.executeDeferred(lambda: callback(*args, **kwargs))
+    return deferred
+
+
+def _process_shot(shot, playblast_file, recArgs, current_target, shot_uploads):
+    '''
+    Encode a recorded shot if it is an image sequence and queue its upload
+    into the shot_uploads batch, both run in the background
+    '''
+    record = {"shot": shot, "playblast_file": playblast_file, "encode_job": None}
+    target = dict(shot.get('target') or current_target,
+                  first_frame = shot.get('start_frame', recArgs['start_frame']),
+                  last_frame = shot.get('end_frame', recArgs['end_frame']))
+
+    capturedFileNoExt, ext = os.path.splitext(playblast_file)
+    if capturedFileNoExt[-5:] != '.####':
+        shot_uploads.queue(playblast_file, target)
+        return record
+
+    output_file = capturedFileNoExt[:-5] + ".mov"
+    def on_encoded(job):
+        try:
+            record["playblast_file"] = video.get_encoded_file(job, playblast_file, output_file)
+            shot_uploads.queue(record["playblast_file"], target)
+        finally:
+            shot_uploads.release()
+    shot_uploads.hold()
+    record["encode_job"] = video.encodeToH264MovAsync(playblast_file, output_file=output_file,
+                                                      on_finished=on_encoded,
+                                                      on_error=lambda job, message: shot_uploads.release())
+    return record
+
+
+def _queue_shot_upload(upload_file, target, batch = None):
+    if target.get('item_type') not in ['review', 'media']:
+        logger.info('Not uploading {}, you cannot upload to {} "{}" directly'.format(upload_file, target.get('item_type'), target.get('item_name')))
+        return
+    return upload_queue.get_upload_queue().submit(_task_from_target(upload_file, target), batch)
+
+
+class _ShotUploads(object):
+    '''
+    Uploads of the shots of one recording, they go into one UploadBatch so the
+    window reacts once to batch_finished instead of once per shot.
+    The recording holds the batch open until release(), every shot that is still
+    being encoded holds it too.
+    '''
+    def __init__(self, upload_after_creation):
+        self.batch = upload_queue.get_upload_queue().open_batch() if upload_after_creation else None
+        self._holds = 1
+        self._lock = threading.Lock()
+
+    def queue(self, upload_file, target):
+        if self.batch:
+            _queue_shot_upload(upload_file, target, self.batch)
+
+    def hold(self):
+        with self._lock:
+            self._holds += 1
+
+    def release(self):
+        with self._lock:
+            self._holds -= 1
+            closed = self._holds == 0
+        if closed and self.batch:
+            upload_queue.get_upload_queue().close_batch(self.batch)
+
+
+def _task_from_target(upload_file, target):
+    return upload_queue.UploadTask(upload_file, target['review_id'],
+                                   item_type = target['item_type'],
+                                   item_id = target.get('item_id'),
+                                   item_name = target.get('item_name'),
+                                   first_frame = target.get('first_frame'),
+                                   last_frame = target.get('last_frame'))
 
 
 def _record():
+    recArgs = _get_record_args()
+    if not recArgs:
+        return
+
+    # read from database Settings
+    playblast_file = maya_scene.playblast_with_settings(
+        viewport_preset=database.read_cache('current_viewport_preset'),
+        viewport_preset_yaml=VIEWPORT_PRESET_YAML,
+        **recArgs
+    )
+
+    return playblast_file
+
+
+def _get_record_args():
+    # the open windows write their settings with a delay, the cache must have the last edits
+    ui_settings.flush_all()
+
     # filename & path
     filepath = database.read_cache('ps_directory_lineEdit')
     filename = database.read_cache('us_filename_lineEdit')
@@ -263,10 +625,11 @@ def _record():
     filepath = path.sanitize(os.path.join(filepath, filename))
 
     # preset
-    preset_file = path.get_config_yaml(PRESET_YAML)
-    preset_data = database._parse_yaml(preset_file)
     preset_name = database.read_cache('current_preset')
-    preset = preset_data.get(preset_name)
+    preset = presets.get_format_presets(PRESET_YAML).get(preset_name)
+    if preset:
+        for problem in maya_scene.validate_format_preset(preset):
+            logger.warning("Preset {}: {}".format(preset_name, problem))
 
     start_frame, end_frame = maya_scene.get_InOutFrames(database.read_cache('current_range_type'))
     start_frame = database.read_cache('frame_start')
@@ -300,21 +663,13 @@ def _record():
                 True
     }
     logger.info("recArgs: {}".format(recArgs))
-
-    # read from database Settings
-    playblast_file = maya_scene.playblast_with_settings(
-        viewport_preset=database.read_cache('current_viewport_preset'),
-        viewport_preset_yaml=VIEWPORT_PRESET_YAML,
-        **recArgs
-    )
-
-    return playblast_file
+    return recArgs
 
 
-def _upload(current_user=None, ):
+def _upload(current_user=None, on_progress = None):
     errorLog = None
     if not current_user:
-        current_user = user.SyncSketchUser()
+        current_user = user.get_current_user()
     username = current_user.get_name()
     upload_file = get_current_file()
 
@@ -326,29 +681,23 @@ def _upload(current_user=None, ):
     logger.info("selected_item: {0}".format(selected_item))
 
 
-    # ToDo rename media_id to item_id
-    item_type = database.read_cache('target_url_type')
-    review_id = database.read_cache('target_review_id')
-    item_id = database.read_cache('target_media_id')
-    item_name = database.read_cache('target_url_item_name')
+    target = get_upload_target()
+    item_type = target['item_type']
+    review_id = target['review_id']
+    item_id = target['item_id']
+    item_name = target['item_name']
 
     # Upload To
     current_item = selected_item
     upload_to_value = item_name
     logger.info('Selected Item: %s'%item_name)
 
-
-    last_recorded_data = database.read_cache('last_recorded')
-
-    postData = {
-        "first_frame": last_recorded_data['start_frame'],
-        "last_frame": last_recorded_data['end_frame'],
-    }
+    postData = _get_post_data()
 
 
     if item_type == 'review':
         logger.info('Uploading {} to {} with review_id {}'.format(upload_file, upload_to_value, review_id))
-        uploaded_item = current_user.upload_media_to_review(review_id, upload_file, noConvertFlag = True, itemParentId = False, data = postData)
+        uploaded_item = current_user.upload_media_to_review(review_id, upload_file, noConvertFlag = True, itemParentId = False, data = postData, on_progress = on_progress)
         #logger.info("uploaded_item: {0}".format(pformat(uploaded_item)))
 
     elif item_type == 'media':
@@ -356,7 +705,7 @@ def _upload(current_user=None, ):
         logger.info("item id %s"%item_id)
         logger.info("filepath %s"%upload_file)
         logger.info("Trying to upload %s to item_id %s, review %s"%(upload_file,item_id,review_id))
-        uploaded_item = current_user.upload_media_to_review(review_id, upload_file, noConvertFlag = True, itemParentId = item_id, data = postData)
+        uploaded_item = current_user.upload_media_to_review(review_id, upload_file, noConvertFlag = True, itemParentId = item_id, data = postData, on_progress = on_progress)
         logger.info(pformat(uploaded_item))
     else:
         uploaded_item = None
@@ -369,23 +718,81 @@ def _upload(current_user=None, ):
         logger.info('ERROR: This Upload failed: %s'%(errorLog))
         return
 
-    # * this is an old call, that we should replace with an async worker
-    review_data = current_user.get_review_data_from_id(review_id)
+    return _finish_upload(current_user, uploaded_item, review_id, upload_file)
+
 
+def get_upload_target():
+    # ToDo rename media_id to item_id
+    return {
+        'item_type': database.read_cache('target_url_type'),
+        'review_id': database.read_cache('target_review_id'),
+        'item_id': database.read_cache('target_media_id'),
+        'item_name': database.read_cache('target_url_item_name'),
+    }
+
+
+def _get_post_data():
+    last_recorded_data = database.read_cache('last_recorded')
 
-    review_url = review_data.get('reviewURL')
-    #uploaded_media_url = '{}'.format(review_url)
-    uploaded_media_url = '{}#{}'.format(review_url, uploaded_item['id'])
-    logger.info("review_data: {}".format(review_data))
-    logger.info('Upload successful. Uploaded item {} to {}'.format(upload_file, uploaded_media_url))
+    return {
+        "first_frame": last_recorded_data['start_frame'],
+        "last_frame": last_recorded_data['end_frame'],
+    }
 
-    if 'none' in uploaded_media_url.lower():
-        uploaded_media_url = ""
 
-    uploaded_item['reviewURL'] = uploaded_media_url
+def _finish_upload(current_user, uploaded_item, review_id, upload_file):
+    uploaded_item = upload_queue.add_review_url(current_user, uploaded_item, review_id)
+    logger.info('Upload successful. Uploaded item {} to {}'.format(upload_file, uploaded_item['reviewURL']))
     return uploaded_item
 
 
+def queue_upload(upload_file = None):
+    '''
+    Queue the last recorded file for upload to the current target and return the UploadTask.
+    The upload runs in the background, follow it through upload_queue.get_upload_queue().signals
+    '''
+    upload_file = upload_file or get_current_file()
+    if not upload_file or not os.path.isfile(upload_file):
+        return
+
+    target = get_upload_target()
+    if target['item_type'] not in ['review', 'media']:
+        logger.info('ERROR: This Upload failed: You cannot upload to %s "%s" directly.\nPlease select a review in the tree widget to upload to!\n'%(target['item_type'], target['item_name']))
+        return
+
+    post_data = _get_post_data()
+    task = upload_queue.UploadTask(upload_file, target['review_id'],
+                                   item_type = target['item_type'],
+                                   item_id = target['item_id'],
+                                   item_name = target['item_name'],
+                                   first_frame = post_data['first_frame'],
+                                   last_frame = post_data['last_frame'])
+    return upload_queue.get_upload_queue().submit(task)
+
+
+def queue_batch_upload(uploads):
+    '''
+    Queue several files for upload at once and return the UploadBatch.
+    uploads is a list of (filepath, target) pairs, target is a dict like the one
+    get_upload_target returns, optionally with first_frame and last_frame.
+    A target of None uploads to the current target.
+    '''
+    current_target = get_upload_target()
+    tasks = []
+    for upload_file, target in uploads:
+        target = target or current_target
+        if not os.path.isfile(upload_file):
+            logger.info('Skipping {}, not a valid file'.format(upload_file))
+            continue
+        if target.get('item_type') not in ['review', 'media']:
+            logger.info('Skipping {}, you cannot upload to {} "{}" directly'.format(upload_file, target.get('item_type'), target.get('item_name')))
+            continue
+
+        tasks.append(_task_from_target(upload_file, target))
+    if not tasks:
+        return
+    return upload_queue.get_upload_queue().submit_batch(tasks)
+
 
 def playblast_and_upload():
     filepath = maya_scene.playblast()
@@ -435,18 +842,18 @@ def apply_viewport_preset(preset_name):
 
 def cycle_viewport_presets():
     cache = path.get_config_yaml(VIEWPORT_PRESET_YAML)
-    presets = database._parse_yaml(cache).keys()
+    preset_names = presets.get_viewport_presets(VIEWPORT_PRESET_YAML).names()
     current_viewport_preset = database.read_cache('current_viewport_preset')
-    logger.info(presets)
-    l = len(presets)
+    logger.info(preset_names)
+    l = len(preset_names)
 
 
     i = 0
-    if current_viewport_preset in presets:
+    if current_viewport_preset in preset_names:
         for k in range(l):
             i = k
-            logger.info("presets[%s] %s"%(i, presets[i]))
-            if current_viewport_preset == presets[i]:
+            logger.info("preset_names[%s] %s"%(i, preset_names[i]))
+            if current_viewport_preset == preset_names[i]:
                 logger.info("%s is a match"%i)
                 break
     else:
@@ -456,6 +863,6 @@ def cycle_viewport_presets():
     if i >= l:
         i = 0
 
-    database.save_cache('current_viewport_preset', presets[i], yaml_file = CACHE_YAML)
-    maya_scene.apply_viewport_preset(cache, presets[i])
+    database.save_cache('current_viewport_preset', preset_names[i], yaml_file = CACHE_YAML)
+    maya_scene.apply_viewport_preset(cache, preset_names[i])
 
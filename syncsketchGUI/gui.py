@@ -8,7 +8,6 @@ import sys
 import time
 import tempfile
 import yaml
-import re
 from functools import partial
 
 from maya import OpenMayaUI as omui
@@ -25,6 +24,7 @@ from .lib.gui.qt_utils import *
 
 
 from .lib.connection import *
+from .lib import urls
 from .vendor import mayapalette
 from .vendor.Qt import QtCompat
 from .vendor.Qt import QtCore
@@ -139,16 +139,16 @@ def get_current_item_from_ids(tree, payload=None, setCurrentItem=True):
         return
 
     #Got both uuid and id, we are dealing with an item
-    if payload['uuid'] and payload['id']:
+    if payload.uuid and payload.id:
         searchType = 'id'
-        searchValue = int(payload['id'])
-        logger.info("both payload['uuid'] and payload['id'] set {}".format(payload['uuid'], payload['id']))
+        searchValue = payload.id
+        logger.info("both payload.uuid and payload.id set {} {}".format(payload.uuid, payload.id))
 
     #Got only uuid, it's a review
-    elif payload['uuid']:
+    elif payload.uuid:
         searchType = 'uuid'
-        searchValue = payload['uuid']
-        logger.info("payload['uuid'] set: {}".format(payload['uuid']))
+        searchValue = payload.uuid
+        logger.info("payload.uuid set: {}".format(payload.uuid))
 
     #Nothing useful found return
     else:
@@ -172,74 +172,6 @@ def get_current_item_from_ids(tree, payload=None, setCurrentItem=True):
     logger.info("Item not found while iterating, no item set, setCurrentItem: {}".format(setCurrentItem))
 
 
-def parse_url_data(link=database.read_cache('upload_to_value')):
-    '''
-    simple url parser that extract uuid, review_id and revision_id
-    '''
-    #url = 'https://www.syncsketch.com/sketch/bff609f9cbac/#711273/637821'
-    #       https://syncsketch.com/sketch/bff609f9cbac#711680
-
-    #Remove reduntant path and check if it's expected
-    logger.info("link parser: {}".format(link))
-    if not link:
-        logger.info("Link isn't a link: {}".format(link))
-        return
-
-    baseUrl = 'https://syncsketch.com/sketch/'
-
-    #Remove leading forward slash
-    if link[-1] == "/":
-        link = link[:-1]
-
-    #Remove www
-    link = link.replace("www.", "")
-
-    data = {"uuid":0, "id":0, "revision_id":0}
-    #Add a slash so we don't need to chase two different cases
-    if not link.split("#")[0][-1] == "/":
-        link = "/#".join(link.split("#"))
-        logger.info("Modified link: {}".format(link))
-
-
-    if not link[0:len(baseUrl)] == baseUrl:
-        logger.info("URL need's to start with: {}".format(baseUrl))
-        return data
-
-
-    #Find UUID
-    payload = link[len(baseUrl):].split("/")
-
-    if len(link) > 0:
-        uuidPart = (re.findall(r"([a-fA-F\d]{12})", payload[0]))
-        if uuidPart:
-            data['uuid'] = uuidPart[0]
-        else:
-            print("link need's to be of the form https://www.syncsketch.com/sketch/bff609f9cbac/ got {}".format(link))
-    #Find ID
-    if len(payload) > 1:
-        if payload[1].startswith("#"):
-            data['id'] = payload[1][1:]
-        else:
-            print("link need's to be of the form https://www.syncsketch.com/sketch/bff609f9cbac/#711273 got {}".format(link))
-
-    if len(payload) > 3:
-        pass
-        #handle revision
-    return data
-
-
-
-def get_ids_from_link(link = database.read_cache('upload_to_value')):
-    #link: https://www.syncsketch.com/sketch/0a5546b336de/
-    #uploaded_to_value: https://syncsketch.com/sketch/0854aaba81fb#705832
-    #https://syncsketch.com/sketch/0854aaba81fb#705832
-    logger.info("link: {0}".format(link))
-    if not link:
-        return
-    return link.split('/')[-1].split('#')
-
-
-
 # tree function
 def update_target_from_tree(self, treeWidget):
     logger.info("update_target_from_tree")
@@ -252,7 +184,6 @@ def update_target_from_tree(self, treeWidget):
         item_type = selected_item.data(2, QtCore.Qt.EditRole)
     logger.info("update_target_from_tree: item_data {} item_type {}".format(item_data, item_type))
 
-    review_base_url = "https://syncsketch.com/sketch/"
     current_data={}
     current_data['upload_to_value'] = str()
     current_data['breadcrumb'] = str()
@@ -270,7 +201,7 @@ def update_target_from_tree(self, treeWidget):
 
     elif item_type == 'review': # and not item_data.get('reviewURL'):
         current_data['review_id'] = item_data.get('id')
-        current_data['target_url'] = '{0}{1}'.format(review_base_url, item_data.get('uuid'), item_data.get('id'))
+        current_data['target_url'] = urls.make_review_url(item_data.get('uuid'))
         self.ui.thumbnail_itemPreview.clear()
         logger.info("in  item_type == 'review'")
 
@@ -282,8 +213,7 @@ def update_target_from_tree(self, treeWidget):
         # * Expected url links
         #https://syncsketch.com/sketch/300639#692936
         #https://www.syncsketch.com/sketch/5a8d634c8447#692936/619482
-        #current_data['target_url'] = '{}#{}'.format(review_base_url + str(current_data['review_id']), current_data['media_id'])
-        current_data['target_url'] = '{0}{1}#{2}'.format(review_base_url, item_data.get('uuid'), item_data.get('id'))
+        current_data['target_url'] = urls.make_review_url(item_data.get('uuid'), item_data.get('id'))
         logger.info("current_data['target_url'] {}".format(current_data['target_url']))
 
 
@@ -345,6 +275,12 @@ def show_download_window():
     _call_ui_for_maya(DownloadWindow)
 
 
+def show_batch_upload_window():
+    from syncsketchGUI.lib.gui.syncsketchWidgets.batchUploadWidget import BatchUploadWindow
+    _maya_delete_ui(BatchUploadWindow.window_name)
+    _call_ui_for_maya(BatchUploadWindow)
+
+
 def show_viewport_preset_window():
     from syncsketchGUI.lib.gui.syncsketchWidgets.viewportPresetWidget import ViewportPresetWindow
     _maya_delete_ui(ViewportPresetWindow.window_name)
@@ -352,7 +288,7 @@ def show_viewport_preset_window():
 
 
 def show_syncsketch_browser_window():
-    current_user = user.SyncSketchUser()
+    current_user = user.get_current_user()
     if not current_user:
         show_web_login_window()
         return
@@ -1,7 +1,12 @@
+import json
 import pkg_resources
+import re
+import socket
 import syncsketchGUI
 import os
 import sys
+import threading
+import time
 
 try:
     #python2
@@ -12,11 +17,11 @@ except:
 
 try:
     #python3
-    from urllib.request import urlopen
+    from urllib.request import urlopen, Request
+    from urllib.error import HTTPError, URLError
 except:
-    #import urllib2
     #python2
-    from urllib import urlopen
+    from urllib2 import urlopen, Request, HTTPError, URLError
 
 
 
@@ -25,39 +30,152 @@ logger = logging.getLogger("syncsketchGUI")
 
 from syncsketchGUI.installScripts import installGui
 from syncsketchGUI.lib import user as user
+from syncsketchGUI.lib import connection
+from syncsketchGUI.lib import path
+
+# the last answer of the repo is kept here and reused for VERSION_CHECK_TTL seconds
+VERSION_CHECK_JSON = 'syncsketch_version.json'
+VERSION_CHECK_TTL = 6 * 60 * 60
+# seconds to wait for the repo, offline machines give up after this
+VERSION_CHECK_TIMEOUT = 5
+
+SETUP_VERSION_PATTERN = re.compile(r"""version\s*=\s*['"]([^'"]+)['"]""")
 
 class InstallerLiterals(object):
     versionTag = os.getenv("SS_DEV") or "release"
     setupPyPath = 'https://raw.githubusercontent.com/syncsketch/syncsketch-maya/{}/setup.py'.format(versionTag)
     installerPyGuiPath = 'https://raw.githubusercontent.com/syncsketch/syncsketch-maya/{}/syncsketchGUI/installScripts/installGui.py'.format(versionTag)
 
+
+class VersionCheck(object):
+    """Latest released version, asked for on a background thread once per session.
+
+    The answer is cached on disk, within the ttl the repo isn't asked at all and
+    after it the request carries the ETag of the cached answer, so an unchanged
+    setup.py comes back as an empty 304.
+    """
+    def __init__(self, url=None, cache_file=None, ttl=VERSION_CHECK_TTL, timeout=VERSION_CHECK_TIMEOUT):
+        self.url = url or InstallerLiterals.setupPyPath
+        self.cache_file = cache_file or path.get_config_yaml(VERSION_CHECK_JSON)
+        self.ttl = ttl
+        self.timeout = timeout
+        self.remote_version = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='SyncSketchVersionCheck')
+                self._thread.daemon = True
+                self._thread.start()
+        return self
+
+    def wait(self, timeout=None):
+        """Remote version, None if it couldn't be found out in time"""
+        self.start()
+        self._done.wait(self.timeout + 1 if timeout is None else timeout)
+        return self.remote_version
+
+    def _run(self):
+        try:
+            self.remote_version = self._fetch()
+        except Exception as err:
+            logger.warning("Could not check for a new version: {}".format(err))
+        finally:
+            self._done.set()
+
+    def _fetch(self):
+        cached = self._load()
+        if cached and time.time() - cached.get('checked_at', 0) < self.ttl:
+            return cached['version']
+        if connection.get_monitor().is_offline:
+            # don't wait for the repo to time out, the cached answer will do
+            return cached['version'] if cached else None
+
+        headers = {}
+        if cached and cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        try:
+            response = urlopen(Request(self.url, headers=headers), timeout=self.timeout)
+            version = parse_setup_version(response.read().decode('utf8'))
+            etag = response.info().get('ETag')
+        except HTTPError as err:
+            if err.code != 304 or not cached:
+                raise
+            version, etag = cached['version'], cached.get('etag')
+        except (URLError, socket.timeout, IOError) as err:
+            logger.info("Version check failed, offline? {}".format(err))
+            return cached['version'] if cached else None
+
+        self._save({'url': self.url, 'version': version, 'etag': etag, 'checked_at': time.time()})
+        return version
+
+    def _load(self):
+        try:
+            with open(self.cache_file) as f:
+                cached = json.load(f)
+        except (IOError, ValueError):
+            return
+        if cached.get('url') == self.url and cached.get('version'):
+            return cached
+
+    def _save(self, data):
+        try:
+            path.write_atomic(self.cache_file, lambda f: json.dump(data, f))
+        except (IOError, OSError) as err:
+            logger.info("Could not store the version check: {}".format(err))
+
+
+_version_check = None
+_local_version = None
+
+def get_version_check():
+    """The session's VersionCheck, started on the first call"""
+    global _version_check
+    if _version_check is None:
+        _version_check = VersionCheck()
+    return _version_check.start()
+
+
+def parse_setup_version(text):
+    match = SETUP_VERSION_PATTERN.search(text)
+    if not match:
+        raise ValueError("No version in setup.py")
+    return match.group(1)
+
+
 def getLatestSetupPyFileFromRepo():
     """Parses latest setup.py's version number"""
-    response = urlopen(InstallerLiterals.setupPyPath)
-    html = response.read()
-    html = html.decode('utf8')
-    return html.split("version = '")[1].split("',")[0]
+    return get_version_check().wait()
 
 
-def getLatestSetupPyFileFromLocal():
+def getLatestSetupPyFileFromLocal(reload_packages=False):
     """Checks locally installed packages version number"""
-    import pkg_resources
-    #reload module to make sure we have loaded the latest live install
-    reload(pkg_resources)
-    local = pkg_resources.get_distribution(
-        "syncSketchGUI").version
-    return local
+    global _local_version
+    if _local_version is None or reload_packages:
+        if reload_packages:
+            #reload module to make sure we have loaded the latest live install
+            reload(pkg_resources)
+        _local_version = pkg_resources.get_distribution(
+            "syncSketchGUI").version
+    return _local_version
 
 
-def getVersionDifference():
+def getVersionDifference(timeout=None):
     """Returns the difference between local Package and latest Remote"""
-    remote = int(getLatestSetupPyFileFromRepo().replace(".", ""))
+    if connection.get_monitor().is_offline and timeout is None:
+        # the check gives up right away offline, only its cache file is read
+        timeout = 1
+    remote_version = get_version_check().wait(timeout)
+    if not remote_version:
+        return
+    remote = int(remote_version.replace(".", ""))
     local = int(getLatestSetupPyFileFromLocal().replace(".", ""))
     logger.info("Local Version : {} Remote Version {}".format(local, remote))
     if remote > local:
         return remote-local
-    else:
-         pass
 
 def overwriteLatestInstallerFile():
     #import urllib3
@@ -82,8 +200,9 @@ def handleUpgrade():
         [SyncSketchInstaller] -- [Instance of the Upgrade UI]
     """
     # * Check for Updates and load Upgrade UI if Needed
-    if getVersionDifference():
-        logger.info("YOU ARE {} VERSIONS BEHIND".format(getVersionDifference()))
+    version_difference = getVersionDifference()
+    if version_difference:
+        logger.info("YOU ARE {} VERSIONS BEHIND".format(version_difference))
         if os.getenv("SS_DISABLE_UPGRADE"):
             logger.warning("Upgrades disabled as environment Variable SS_DISABLE_UPGRADE is set, skipping")
             return
@@ -103,7 +222,7 @@ def handleUpgrade():
             installGui.InstallOptions.upgrade = 1
 
             #Preserve Credentials
-            current_user = user.SyncSketchUser()
+            current_user = user.get_current_user()
 
             if current_user.is_logged_in():
                 installGui.InstallOptions.tokenData['username'] = current_user.get_name()
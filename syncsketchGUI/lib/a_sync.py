@@ -70,3 +70,46 @@ class Worker(QtCore.QRunnable):
             self.signals.result.emit(result)  # Return the result of the processing
         finally:
             self.signals.finished.emit()  # Done
+
+
+class ConnectivitySignals(QtCore.QObject):
+    '''
+    Qt signal of the ConnectivityMonitor in syncsketchGUI.lib.connection,
+    its observers run on the probing thread.
+
+    Supported signals are:
+
+    changed
+        `bool` True when the server became reachable, False when it was lost
+
+    '''
+    changed = QtCore.Signal(bool)
+
+
+class UploadQueueSignals(QtCore.QObject):
+    '''
+    Qt signals of the upload queue in syncsketchGUI.lib.upload_queue.
+
+    Supported signals are:
+
+    queued
+        `object` the UploadTask that was added
+
+    progress
+        `object`, `dict` the task and its bytes_sent, total, percent and rate
+
+    finished
+        `object` the UploadTask, its uploaded_item holds the created item
+
+    error
+        `object`, `str` the task and the error message
+
+    batch_finished
+        `object` the UploadBatch, once all its uploads are done
+
+    '''
+    queued = QtCore.Signal(object)
+    progress = QtCore.Signal(object, dict)
+    finished = QtCore.Signal(object)
+    error = QtCore.Signal(object, str)
+    batch_finished = QtCore.Signal(object)
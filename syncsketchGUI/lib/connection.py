@@ -1,17 +1,182 @@
+'''
+Reachability of the SyncSketch server.
+
+A ConnectivityMonitor probes the server on a background thread and keeps the
+last answer, is_connected() returns it without touching the network. Only the
+very first call of a session waits for a probe, at most PROBE_TIMEOUT seconds.
+Observers are called with True or False when the state changes.
+
+Setting SS_OFFLINE in the environment keeps the plugin offline, e.g. on
+machines that aren't allowed to reach the internet.
+'''
+import os
 import socket
+import threading
+import time
+import webbrowser
+
+import logging
+logger = logging.getLogger("syncsketchGUI")
+
+# ======================================================================
+# Global Variables
 
 REMOTE_SERVER = "www.syncsketch.com"
+REMOTE_PORT = 443
+
+# seconds a probe may take
+PROBE_TIMEOUT = 2
+# seconds between probes, offline machines are probed more often to notice the network coming back
+ONLINE_PROBE_INTERVAL = 60
+OFFLINE_PROBE_INTERVAL = 15
+
+# ======================================================================
+# Module Utilities
+
+def probe(host = REMOTE_SERVER, port = REMOTE_PORT, timeout = PROBE_TIMEOUT):
+    '''
+    True if a connection to the host can be opened
+    '''
+    try:
+        # see if we can resolve the host name -- tells us if there is a DNS listening
+        address = socket.gethostbyname(host)
+        # connect to the host -- tells us if the host is actually reachable
+        connection = socket.create_connection((address, port), timeout)
+        connection.close()
+        return True
+    except (socket.error, socket.timeout, OSError):
+        return False
+
 
 def is_connected():
-  try:
-    # see if we can resolve the host name -- tells us if there is a DNS listening
-    host = socket.gethostbyname(REMOTE_SERVER)
-    # connect to the host -- tells us if the host is actually reachable
-    s = socket.create_connection((host, 80), 2)
-    return True
-  except:
-     pass
-  return False
-
-def open_url(self):
-    webbrowser.open(url)
\ No newline at end of file
+    '''
+    Last known state of the connection to SyncSketch
+    '''
+    return get_monitor().is_online()
+
+
+def open_url(url):
+    webbrowser.open(url)
+
+
+# ======================================================================
+# Module Classes
+
+class ConnectivityMonitor(object):
+    '''
+    Probes the server in the background and caches the state.
+    online is None until the first probe answered.
+    '''
+    def __init__(self, host = REMOTE_SERVER, port = REMOTE_PORT, timeout = PROBE_TIMEOUT,
+                 online_interval = ONLINE_PROBE_INTERVAL, offline_interval = OFFLINE_PROBE_INTERVAL):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.online_interval = online_interval
+        self.offline_interval = offline_interval
+        self.forced_offline = bool(os.getenv("SS_OFFLINE"))
+        self.online = None
+        self.checked_at = None
+        self._observers = []
+        self._thread = None
+        self._lock = threading.Lock()
+        self._probed = threading.Event()
+        self._wake = threading.Event()
+        # every probe thread gets its own stop event, one that is still finishing a probe can't be revived
+        self._stop = threading.Event()
+
+    @property
+    def is_offline(self):
+        '''
+        True when the server is known to be unreachable, never waits for a probe
+        '''
+        return self.forced_offline or self.online is False
+
+    def start(self):
+        with self._lock:
+            if self._thread is None and not self.forced_offline:
+                self._stop = threading.Event()
+                self._wake.clear()
+                self._thread = threading.Thread(target = self._run, args = (self._stop,), name = 'SyncSketchConnectivity')
+                self._thread.daemon = True
+                self._thread.start()
+        return self
+
+    def stop(self):
+        '''
+        Stop probing, waits up to a probe's timeout for the thread to end
+        '''
+        with self._lock:
+            thread, self._thread = self._thread, None
+            self._stop.set()
+            self._wake.set()
+        if thread and thread is not threading.current_thread():
+            thread.join(self.timeout + 1)
+
+    def is_online(self, timeout = None):
+        '''
+        Cached state, waits for the first probe of the session if there was none
+        '''
+        if self.forced_offline:
+            return False
+        if self.online is None:
+            self.start()
+            self._probed.wait(self.timeout + 1 if timeout is None else timeout)
+        return bool(self.online)
+
+    def probe_now(self):
+        '''
+        Probe again right away, e.g. when the user asks for a refresh
+        '''
+        self.start()
+        self._wake.set()
+
+    def set_forced_offline(self, offline):
+        self.forced_offline = offline
+        if offline:
+            self.stop()
+            self._notify(False)
+        else:
+            self.probe_now()
+
+    def add_observer(self, observer):
+        if observer not in self._observers:
+            self._observers.append(observer)
+
+    def remove_observer(self, observer):
+        if observer in self._observers:
+            self._observers.remove(observer)
+
+    def _run(self, stop):
+        while not stop.is_set():
+            online = probe(self.host, self.port, self.timeout)
+            if stop.is_set():
+                break
+            previous, self.online = self.online, online
+            self.checked_at = time.time()
+            self._probed.set()
+            if previous is not None and previous != online:
+                logger.info("SyncSketch is {}".format("reachable again" if online else "unreachable"))
+                self._notify(online)
+
+            self._wake.wait(self.online_interval if online else self.offline_interval)
+            self._wake.clear()
+
+    def _notify(self, online):
+        for observer in list(self._observers):
+            try:
+                observer(online)
+            except Exception as err:
+                logger.error("Connectivity observer {} failed: {}".format(observer, err))
+
+
+_monitor = None
+
+def get_monitor():
+    '''
+    ConnectivityMonitor of the session, probing starts on the first call
+    '''
+    global _monitor
+    if _monitor is None:
+        _monitor = ConnectivityMonitor()
+    return _monitor.start()
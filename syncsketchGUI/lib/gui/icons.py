@@ -79,6 +79,7 @@ download_color = 'rgb(198, 198, 198);'
 
 
 highlight_color = QtGui.QColor(255, 198, 82)
+stale_color = QtGui.QColor(150, 150, 150)
 success_color = 'rgb(86, 196, 156);'
 warning_color = 'rgb(200, 200, 150);'
 error_color = 'rgb(230, 100, 100);'
@@ -322,7 +322,7 @@ class SyncSketch_Window(QtWidgets.QMainWindow):
         '''
         Updates the UI based on whether the user is logged in
         '''
-        self.current_user = user.SyncSketchUser()
+        self.current_user = user.get_current_user()
         if self.current_user.is_logged_in() and is_connected():
             logger.info("self.current_user.is_logged_in() {} is_connected() {} ".format(self.current_user.is_logged_in(),is_connected() ))
             username = self.current_user.get_name()
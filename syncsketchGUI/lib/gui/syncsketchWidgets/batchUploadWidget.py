@@ -0,0 +1,184 @@
+import os
+import logging
+import syncsketchGUI
+from syncsketchGUI.vendor.Qt import QtWidgets, QtCore
+from syncsketchGUI.lib.gui.qt_widgets import SyncSketch_Window
+from syncsketchGUI.lib import database, upload_queue
+from syncsketchGUI.lib.gui.qt_widgets import RegularStatusLabel, RegularButton, RegularGridLayout, RegularQSpinBox
+from syncsketchGUI.lib.gui.icons import error_color
+
+
+logger = logging.getLogger("syncsketchGUI")
+class BatchUploadWindow(SyncSketch_Window):
+    """
+    UI Frame to upload several playblasts, each to its own review target, in one go
+    """
+    window_name = 'syncsketchGUI_batch_upload_window'
+    window_label = 'Batch Upload'
+
+    FILE_COLUMN, TARGET_COLUMN, STATUS_COLUMN = range(3)
+
+    def __init__(self, parent=None):
+        super(BatchUploadWindow, self).__init__(parent=parent)
+        self.targets = []
+        self.batch = None
+        self.task_rows = {}
+        self.decorate_ui()
+        self.build_connections()
+        self.align_to_center(self.parent)
+
+    def decorate_ui(self):
+        self.ui.ui_status_label = RegularStatusLabel()
+        self.ui.main_layout.addWidget(self.ui.ui_status_label)
+
+        self.ui.uploads_tableWidget = QtWidgets.QTableWidget(0, 3)
+        self.ui.uploads_tableWidget.setHorizontalHeaderLabels(['File', 'Target', 'Status'])
+        self.ui.uploads_tableWidget.horizontalHeader().setStretchLastSection(True)
+        self.ui.uploads_tableWidget.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.ui.uploads_tableWidget.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.ui.uploads_tableWidget.setMinimumSize(560, 240)
+        self.ui.main_layout.addWidget(self.ui.uploads_tableWidget)
+
+        self.ui.add_pushButton = QtWidgets.QPushButton('Add Files...')
+        self.ui.target_pushButton = QtWidgets.QPushButton('Use Current Target')
+        self.ui.target_pushButton.setToolTip('Upload the selected rows to the review or media selected in the SyncSketch window')
+        self.ui.remove_pushButton = QtWidgets.QPushButton('Remove')
+        self.ui.edit_layout = QtWidgets.QHBoxLayout()
+        self.ui.edit_layout.addWidget(self.ui.add_pushButton)
+        self.ui.edit_layout.addWidget(self.ui.target_pushButton)
+        self.ui.edit_layout.addWidget(self.ui.remove_pushButton)
+        self.ui.main_layout.addLayout(self.ui.edit_layout)
+
+        self.ui.parallel_layout = RegularGridLayout(self, label = 'Parallel Uploads')
+        self.ui.parallel_spinBox = RegularQSpinBox()
+        self.ui.parallel_spinBox.setMinimum(1)
+        self.ui.parallel_spinBox.setMaximum(8)
+        self.ui.parallel_spinBox.setValue(upload_queue.get_upload_queue().max_concurrent)
+        self.ui.parallel_layout.addWidget(self.ui.parallel_spinBox, 0, 1)
+        self.ui.main_layout.addLayout(self.ui.parallel_layout)
+
+        self.ui.upload_pushButton = RegularButton()
+        self.ui.upload_pushButton.setText('UPLOAD ALL')
+        self.ui.main_layout.addWidget(self.ui.upload_pushButton)
+
+    def build_connections(self):
+        self.ui.add_pushButton.clicked.connect(self.add_files)
+        self.ui.target_pushButton.clicked.connect(self.use_current_target)
+        self.ui.remove_pushButton.clicked.connect(self.remove_selected)
+        self.ui.upload_pushButton.clicked.connect(self.upload)
+
+        signals = upload_queue.get_upload_queue().signals
+        signals.progress.connect(self.update_task_progress)
+        signals.error.connect(self.task_failed)
+        signals.batch_finished.connect(self.batch_finished)
+
+    def closeEvent(self, event):
+        # uploads keep going in the queue, only stop listening to them
+        signals = upload_queue.get_upload_queue().signals
+        for signal, slot in [(signals.progress, self.update_task_progress),
+                             (signals.error, self.task_failed),
+                             (signals.batch_finished, self.batch_finished)]:
+            try:
+                signal.disconnect(slot)
+            except (RuntimeError, TypeError):
+                pass
+        event.accept()
+
+    def current_target(self):
+        target = syncsketchGUI.get_upload_target()
+        if target['item_type'] not in ['review', 'media']:
+            self.ui.ui_status_label.update('Please select a review or media item in the SyncSketch window', color=error_color)
+            return
+        return target
+
+    def add_files(self):
+        directory = database.read_cache('ps_directory_lineEdit') or ''
+        filepaths, _ = QtWidgets.QFileDialog.getOpenFileNames(self, 'Select Playblasts', directory,
+                                                              'Movies (*.mov *.mp4 *.avi *.webm);;All Files (*)')
+        target = self.current_target()
+        for filepath in filepaths:
+            row = self.ui.uploads_tableWidget.rowCount()
+            self.ui.uploads_tableWidget.insertRow(row)
+            self.targets.append(target)
+            self._set_cell(row, self.FILE_COLUMN, os.path.basename(filepath), tooltip = filepath)
+            self._set_target_cell(row)
+            self._set_cell(row, self.STATUS_COLUMN, '')
+
+    def use_current_target(self):
+        target = self.current_target()
+        if not target:
+            return
+        for row in self._selected_rows():
+            self.targets[row] = target
+            self._set_target_cell(row)
+
+    def remove_selected(self):
+        for row in reversed(self._selected_rows()):
+            self.ui.uploads_tableWidget.removeRow(row)
+            del self.targets[row]
+
+    def upload(self):
+        uploads = []
+        for row in range(self.ui.uploads_tableWidget.rowCount()):
+            if not self.targets[row]:
+                self.ui.ui_status_label.update('Every file needs a target', color=error_color)
+                return
+            filepath = self.ui.uploads_tableWidget.item(row, self.FILE_COLUMN).toolTip()
+            uploads.append((filepath, self.targets[row]))
+
+        upload_queue.get_upload_queue().set_max_concurrent(self.ui.parallel_spinBox.value())
+        self.batch = syncsketchGUI.queue_batch_upload(uploads)
+        if not self.batch:
+            self.ui.ui_status_label.update('Nothing to upload', color=error_color)
+            return
+
+        # files that can't be uploaded are left out of the batch
+        rows = [(row, uploads[row][0]) for row in range(len(uploads))]
+        self.task_rows = {}
+        for task in self.batch.tasks:
+            row = next(row for row, filepath in rows if filepath == task.filepath and row not in self.task_rows.values())
+            self.task_rows[task] = row
+            self._set_cell(row, self.STATUS_COLUMN, 'queued')
+        self.ui.upload_pushButton.setEnabled(False)
+        self.ui.ui_status_label.update('Uploading {} files'.format(len(self.batch.tasks)))
+
+    def update_task_progress(self, task, progress):
+        row = self._task_row(task)
+        if row is not None:
+            self._set_cell(row, self.STATUS_COLUMN, '{:.0f}%'.format(progress.get('percent') or 0))
+
+    def task_failed(self, task, message):
+        row = self._task_row(task)
+        if row is not None:
+            self._set_cell(row, self.STATUS_COLUMN, 'failed: {}'.format(message))
+
+    def batch_finished(self, batch):
+        if batch is not self.batch:
+            return
+        for task in batch.tasks:
+            row = self._task_row(task)
+            if row is not None and task.uploaded_item:
+                self._set_cell(row, self.STATUS_COLUMN, task.uploaded_item.get('reviewURL') or 'done')
+
+        message = 'Uploaded {} of {} files'.format(len(batch.uploaded_items), len(batch.tasks))
+        if batch.failed_tasks:
+            self.ui.ui_status_label.update(message, color=error_color)
+        else:
+            self.ui.ui_status_label.update(message)
+        self.ui.upload_pushButton.setEnabled(True)
+
+    def _task_row(self, task):
+        return self.task_rows.get(task)
+
+    def _selected_rows(self):
+        return sorted(set(index.row() for index in self.ui.uploads_tableWidget.selectedIndexes()))
+
+    def _set_target_cell(self, row):
+        target = self.targets[row]
+        text = target.get('item_name') or target.get('review_id') if target else 'No target'
+        self._set_cell(row, self.TARGET_COLUMN, '{}'.format(text))
+
+    def _set_cell(self, row, column, text, tooltip = None):
+        item = QtWidgets.QTableWidgetItem(text)
+        item.setToolTip(tooltip or text)
+        self.ui.uploads_tableWidget.setItem(row, column, item)
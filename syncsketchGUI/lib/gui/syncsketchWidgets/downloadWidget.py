@@ -2,7 +2,7 @@ import logging
 import syncsketchGUI
 from syncsketchGUI.vendor.Qt import QtWidgets, QtCore
 from syncsketchGUI.lib.gui.qt_widgets import SyncSketch_Window
-from syncsketchGUI.lib import database, user
+from syncsketchGUI.lib import database, user, urls
 from syncsketchGUI.lib.gui.qt_widgets import RegularThumbnail, RegularComboBox, RegularStatusLabel, RegularLineEdit, RegularButton, RegularToolButton, RegularGridLayout, RegularQSpinBox
 from syncsketchGUI.lib.maya import scene as maya_scene
 import maya.cmds as cmds
@@ -21,7 +21,7 @@ class DownloadWindow(SyncSketch_Window):
         self.decorate_ui()
         self.align_to_center(self.parent)
 
-        current_user = user.SyncSketchUser()
+        current_user = user.get_current_user()
         self.ui.review_target_url.editingFinished.connect(self.editingFinished)
         self.media_id = None
 
@@ -52,17 +52,16 @@ class DownloadWindow(SyncSketch_Window):
         self.ui.review_target_name.setText(self.item_data['name'])
 
     def editingFinished(self):
-        from syncsketchGUI.gui import parse_url_data
         text = self.ui.review_target_url.text()
-        current_user = user.SyncSketchUser()
+        current_user = user.get_current_user()
 
         if not current_user.is_logged_in():
             logger.info("You are not logged in, please use the syncsketchGUI to log in first")
             return
 
 
-        cleanUrl = parse_url_data(text)
-        media_id = cleanUrl.get('id')
+        review_url = urls.parse_review_url(text)
+        media_id = review_url.id if review_url else None
         if media_id:
             self.media_id = media_id
             item = current_user.get_item_info(media_id)
@@ -177,7 +177,7 @@ class FormatPresetWindow(SyncSketch_Window):
 
     def update_login_ui(self):
         #user Login
-        self.currentUser = user.SyncSketchUser()
+        self.currentUser = user.get_current_user()
         if self.currentUser.is_logged_in() and is_connected():
             username = self.currentUser.get_name()
             self.ui.ui_login_label.setText("Logged into SyncSketch as \n%s" % username)
@@ -7,7 +7,7 @@ logger = logging.getLogger("syncsketchGUI")
 
 
 
-from syncsketchGUI.lib import video, user, database
+from syncsketchGUI.lib import video, user, database, upload_queue, tree_stream, nodes, search_index, urls, connection, presets
 from syncsketchGUI.lib.gui.qt_widgets import *
 from syncsketchGUI.lib.gui.qt_utils import *
 from syncsketchGUI.lib.maya import scene as maya_scene
@@ -15,14 +15,18 @@ from syncsketchGUI.lib.connection import is_connected, open_url
 from syncsketchGUI.gui import  _maya_delete_ui, show_download_window
 from syncsketchGUI.lib.gui.syncsketchWidgets.web import LoginView, OpenPlayerView, logout_view
 import syncsketchGUI
-from syncsketchGUI.gui import parse_url_data, get_current_item_from_ids, set_tree_selection, update_target_from_tree, getReviewById
+from syncsketchGUI.gui import get_current_item_from_ids, set_tree_selection, update_target_from_tree, getReviewById
 from syncsketchGUI.lib.gui.icons import _get_qicon
+from syncsketchGUI.lib.gui.ui_settings import SettingsModel
 from syncsketchGUI.lib.gui.literals import DEFAULT_VIEWPORT_PRESET, PRESET_YAML, VIEWPORT_YAML, DEFAULT_PRESET, uploadPlaceHolderStr, message_is_not_loggedin, message_is_not_connected
 from syncsketchGUI.installScripts.maintenance import getLatestSetupPyFileFromLocal, getVersionDifference
-from syncsketchGUI.lib.a_sync import Worker, WorkerSignals
+from syncsketchGUI.lib.a_sync import Worker, WorkerSignals, ConnectivitySignals
 
 USER_ACCOUNT_DATA = None
 
+# tree items added per event loop iteration while the browser fills in
+TREE_BATCH_SIZE = 200
+
 class MenuWindow(SyncSketch_Window):
     """
     Main browser window of the syncsketchGUI services
@@ -40,10 +44,24 @@ class MenuWindow(SyncSketch_Window):
         self.reviewData = None
         self.mediaItemParent = None
         self.installer = None
+        self._tree_nodes = None
+        self._tree_items = {}
+        self._restore_review_pending = False
+        self._search_index = search_index.SearchIndex()
+        self._hidden_items = set()
+        # the browser shows the tree of the last sync, made while offline
+        self._tree_is_stale = False
+        self._populate_timer = QtCore.QTimer(self)
+        self._populate_timer.setInterval(0)
+        self._populate_timer.timeout.connect(self._populate_tree_batch)
 
         self.setMaximumSize(700, 650)
         self.decorate_ui()
+        self.settings = SettingsModel(parent=self)
+        self.bind_settings()
         self.build_connections()
+        self.connect_upload_queue()
+        self.connect_connectivity()
         self.accountData = self.retrievePanelData()
 
 
@@ -76,7 +94,7 @@ class MenuWindow(SyncSketch_Window):
         self.accountData = s
 
     def populateReviewPanel(self):
-        self.ui.browser_treeWidget.clear()
+        self.clear_browser()
         if self.accountData:
             self.populate_review_panel(self.accountData, force=True)
         else:
@@ -97,7 +115,7 @@ class MenuWindow(SyncSketch_Window):
         return account_data
 
     def load_leafs(self, user, reviewId=None):
-        items = user.host_data.getMediaByReviewId(reviewId)['objects']
+        items = user.get_media_by_review_id(reviewId)['objects']
         return (items, reviewId)
 
 
@@ -106,30 +124,14 @@ class MenuWindow(SyncSketch_Window):
         if not self.mediaItemParent:
             logger.info("No Review Item parent, returning")
             return
-        self.mediaItemParent.takeChildren()
+        for child in self.mediaItemParent.takeChildren():
+            self._search_index.remove(child)
+            self._hidden_items.discard(child)
         logger.info("takeChildren and populating reviewItems {} ".format(items))
 
         for media in items or []:
-            #add UUID of the review container to the media, so we can use it in itemdata
-            media['uuid'] = self.review['uuid']
-            if not media.get('type'):
-                specified_media_icon = media_unknown_icon
-            elif 'video' in media.get('type').lower():
-                specified_media_icon = media_video_icon
-            elif 'image' in media.get('type').lower():
-                specified_media_icon = media_image_icon
-            elif 'sketchfab' in media.get('type').lower():
-                specified_media_icon = media_sketchfab_icon
-            else:
-                specified_media_icon = media_unknown_icon
-
-            media_treeWidgetItem = self._build_widget_item(parent = self.mediaItemParent,
-                                                        item_name = media.get('name'),
-                                                        item_type='media',
-                                                        item_icon = specified_media_icon,
-                                                        item_data = media)
-
-            media_treeWidgetItem.sizeHint(80)
+            self._add_media_item(self.mediaItemParent, media, self.review)
+        self.apply_search_filter()
             # * this is an obsolute call
             #set_tree_selection(self.ui.browser_treeWidget, None)
 
@@ -167,7 +169,7 @@ class MenuWindow(SyncSketch_Window):
 
 
         if item_type == "review":
-            current_user = user.SyncSketchUser()
+            current_user = user.get_current_user()
             current_user.auto_login()
             if not current_user.is_logged_in():
                 return
@@ -182,13 +184,14 @@ class MenuWindow(SyncSketch_Window):
 
     def populateTree(self):
         #Only called at the beginning of a sessions
-        self.current_user = user.SyncSketchUser()
+        self.current_user = user.get_current_user()
         if not self.current_user.is_logged_in():
             logger.info("User not logged in, returning")
             return
 
         logger.info("Trying to fetch data and co")
         #self.fetchData(user=self.current_user)
+        self._tree_is_stale = connection.get_monitor().is_offline
         self.accountData = self.current_user.get_account_data(withItems=False)
 
         self.populateReviewPanel()
@@ -201,12 +204,19 @@ class MenuWindow(SyncSketch_Window):
     def closeEvent(self, event):
         logger.info("Closing Window")
         self.save_ui_state()
+        self.disconnect_upload_queue()
+        self.disconnect_connectivity()
+        self.stop_tree_population()
         event.accept()
 
 
     def restore_ui_state(self):
         logger.info("restoring ui state")
-        self.ui.upgrade_pushButton.show() if getVersionDifference() else self.ui.upgrade_pushButton.hide()
+        # the version check may wait for github, the button shows up once it answered
+        self.ui.upgrade_pushButton.hide()
+        worker = Worker(getVersionDifference)
+        worker.signals.result.connect(self.update_upgrade_button)
+        self.threadpool.start(worker)
 
         # self.ui.ui_record_pushButton.setEnabled(
         #     True if self.current_user.is_logged_in() else False)
@@ -217,43 +227,28 @@ class MenuWindow(SyncSketch_Window):
         # self.ui.ui_upload_pushButton.setEnabled(
         #     True if self.current_user.is_logged_in() else False)
 
-        # Playblast Settings
-        value = self.sanitize(database.read_cache('ps_directory_lineEdit'))
-        self.ui.ps_directory_lineEdit.setText(
-            value if value else os.path.expanduser('~/Desktop/playblasts'))
-
-        value = self.sanitize(database.read_cache('ps_clipname_lineEdit'))
-        self.ui.ps_clipname_lineEdit.setText(value)
-
-        value = database.read_cache('ps_play_after_creation_checkBox')
-        self.ui.ps_play_after_creation_checkBox.setChecked(
-            True if value == 'true' else False)
+        # Playblast Settings, one read of the cache for all of them
+        self.settings.load()
+        self.settings.apply()
 
-        value = database.read_cache('current_preset')
+        value = self.settings.get('current_preset')
         self.ui.ui_formatPreset_comboBox.set_combobox_index(selection=value)
 
         self.populate_camera_comboBox()
 
-        value = database.read_cache('current_range_type')
-        self.ui.ui_range_comboBox.set_combobox_index(selection=value)
-
-        # value = database.read_cache('ps_upload_after_creation_checkBox')
-        # self.ui.ps_upload_after_creation_checkBox.setChecked(
-        #     True if value == 'true' and self.current_user.is_logged_in() else False)
-
-        value = database.read_cache('us_filename_lineEdit')
-        self.ui.us_filename_lineEdit.setText(
-            value if value else 'playblast')
-
-        value = database.read_cache('ps_open_afterUpload_checkBox')
-        self.ui.ps_open_afterUpload_checkBox.setChecked(
-            True if value == 'true' else False)
+        #Set FrameRange from the lider, written with the other settings
+        self.store_frame()
 
+        if self.is_populating_tree():
+            # the review is restored once the browser is filled
+            self._restore_review_pending = True
+        else:
+            self.restore_review_selection()
 
-        #Set FrameRange from the lider
-        database.dump_cache({"frame_start":self.ui.ui_rangeIn_textEdit.text()})
-        database.dump_cache({"frame_end":self.ui.ui_rangeOut_textEdit.text()})
+    def update_upgrade_button(self, version_difference):
+        self.ui.upgrade_pushButton.setVisible(bool(version_difference))
 
+    def restore_review_selection(self):
         reviewId = database.read_cache('target_review_id')
         if reviewId and self.current_user.is_logged_in() :
             logger.info("Restoring reviewId section for : {} ".format(reviewId))
@@ -262,24 +257,21 @@ class MenuWindow(SyncSketch_Window):
             self.loadLeafs(review)
 
 
+    def bind_settings(self):
+        # Playblast Settings
+        self.settings.bind('ps_directory_lineEdit', self.ui.ps_directory_lineEdit,
+                           default=os.path.expanduser('~/Desktop/playblasts'), clean=self.sanitize)
+        self.settings.bind('ps_clipname_lineEdit', self.ui.ps_clipname_lineEdit, clean=self.sanitize)
+        self.settings.bind('ps_play_after_creation_checkBox', self.ui.ps_play_after_creation_checkBox)
+        self.settings.bind('current_range_type', self.ui.ui_range_comboBox)
+        # saved but not restored, uploading needs a login
+        self.settings.bind('ps_upload_after_creation_checkBox', self.ui.ps_upload_after_creation_checkBox, restore=False)
+        self.settings.bind('us_filename_lineEdit', self.ui.us_filename_lineEdit, default='playblast')
+        self.settings.bind('ps_open_afterUpload_checkBox', self.ui.ps_open_afterUpload_checkBox)
+
     def save_ui_state(self):
-        ui_setting = {
-            # Playblast Settings
-            'ps_directory_lineEdit':
-                self.sanitize(self.ui.ps_directory_lineEdit.text()),
-            'ps_clipname_lineEdit':
-                self.sanitize(self.ui.ps_clipname_lineEdit.text()),
-            'current_range_type':
-                self.ui.ui_range_comboBox.currentText(),
-            'ps_play_after_creation_checkBox':
-                self.bool_to_str(self.ui.ps_play_after_creation_checkBox.isChecked()),
-            'ps_upload_after_creation_checkBox':
-                self.bool_to_str(self.ui.ps_upload_after_creation_checkBox.isChecked()),
-            'us_filename_lineEdit':
-                self.ui.us_filename_lineEdit.text(),
-            'ps_open_afterUpload_checkBox':
-                self.bool_to_str(self.ui.ps_open_afterUpload_checkBox.isChecked())}
-        database.dump_cache(ui_setting)
+        # only the settings that changed since the last save are written
+        self.settings.save()
 
 
     def bool_to_str(self, val):
@@ -308,6 +300,7 @@ class MenuWindow(SyncSketch_Window):
         # Reviews
         self.ui.ui_record_pushButton.clicked.connect(self.playblast)
         self.ui.ui_upload_pushButton.clicked.connect(self.upload)
+        self.ui.ui_batchUpload_pushButton.clicked.connect(syncsketchGUI.show_batch_upload_window)
 
         self.ui.ui_download_pushButton.clicked.connect(self.download)
 
@@ -317,6 +310,7 @@ class MenuWindow(SyncSketch_Window):
         self.ui.browser_treeWidget.currentItemChanged.connect(self.validate_review_url)
         self.ui.browser_treeWidget.currentItemChanged.connect(self.currentItemChanged)
         self.ui.browser_treeWidget.doubleClicked.connect(self.open_upload_to_url)
+        self.ui.search_lineEdit.textChanged.connect(self.apply_search_filter)
 
         # Videos / Playblast Settings
         self.ui.ui_formatPreset_comboBox.currentIndexChanged.connect(self.update_current_preset)
@@ -412,6 +406,10 @@ class MenuWindow(SyncSketch_Window):
         # - tree wdget
         self.ui.ui_treeWidget_layout = QtWidgets.QVBoxLayout()
 
+        self.ui.search_lineEdit = QtWidgets.QLineEdit()
+        self.ui.search_lineEdit.setPlaceholderText('Search Projects, Reviews and Media')
+        self.ui.ui_treeWidget_layout.addWidget(self.ui.search_lineEdit)
+
         self.ui.browser_treeWidget = QtWidgets. QTreeWidget()
 
 
@@ -599,6 +597,10 @@ class MenuWindow(SyncSketch_Window):
         self.ui.ui_upload_pushButton.setToolTip('Upload to SyncSketch Review Target')
         self.ui.ui_clipSelection_gridLayout.addWidget(self.ui.ui_upload_pushButton)
 
+        self.ui.ui_batchUpload_pushButton = QtWidgets.QPushButton('Batch Upload ...')
+        self.ui.ui_batchUpload_pushButton.setToolTip('Upload several playblasts, each to its own review target')
+        self.ui.ui_clipSelection_gridLayout.addWidget(self.ui.ui_batchUpload_pushButton)
+
 
         # RIGHT PANEL
         # - - - - - - - - - -
@@ -695,7 +697,7 @@ class MenuWindow(SyncSketch_Window):
         self.current_user.logout()
         logout_view()
         self.isloggedIn(self)
-        self.ui.browser_treeWidget.clear()
+        self.clear_browser()
         self.ui.ui_status_label.update('You have been successfully logged out', color=warning_color)
         self.restore_ui_state()
         #self.populate_review_panel(self,  force=True)
@@ -848,9 +850,10 @@ class MenuWindow(SyncSketch_Window):
         if not link:
             link = database.read_cache('upload_to_value')
             logger.info("No link, reading from cache: {} ".format(link))
-        #ids = get_ids_from_link(link)
-        url_payload = parse_url_data(link)
+        url_payload = urls.parse_review_url(link)
         logger.info("url_payload: {} ".format(url_payload))
+        if not url_payload:
+            return
 
 
         currentItem = get_current_item_from_ids(self.ui.browser_treeWidget, url_payload, setCurrentItem=True)
@@ -864,7 +867,7 @@ class MenuWindow(SyncSketch_Window):
             while iterator.value():
                 item = iterator.value()
                 item_data = item.data(1, QtCore.Qt.EditRole)
-                if item_data.get('uuid') == url_payload['uuid']:
+                if item_data.get('uuid') == url_payload.uuid:
                     logger.info("Found review with item_data: {} loading reviewItems ...".format(item_data))
                     #self.ui.browser_treeWidget.setCurrentItem(item, 1)
                     #self.ui.browser_treeWidget.scrollToItem(item)
@@ -911,25 +914,24 @@ class MenuWindow(SyncSketch_Window):
         database.dump_cache({'selected_clip': val})
 
         info_string='Please select a format preset'
-        info_string = self.ui.ui_formatPreset_comboBox.currentText()
-        format_preset_file = path.get_config_yaml(PRESET_YAML)
-        data = database._parse_yaml(yaml_file = format_preset_file)[val]
-        self.ui.ps_preset_description.setText("%s | %s | %sx%s "%(data["encoding"],data["format"],data["width"],data["height"]))
+        preset = presets.get_format_presets(PRESET_YAML).get(self.ui.ui_formatPreset_comboBox.currentText())
+        self.ui.ps_preset_description.setText(preset.description if preset else info_string)
 
 
     def update_current_preset(self):
         val = self.ui.ui_formatPreset_comboBox.currentText()
         database.dump_cache({'current_preset': val})
-        format_preset_file = path.get_config_yaml(PRESET_YAML)
-        data = database._parse_yaml(yaml_file = format_preset_file)
-        logger.info("data: {}".format(data))
-        if val in data:
-            data = data[val]
-            #text = "%s | %s | %sx%s " %(data["encoding"], data["format"], data["width"], data["height"])
-            text = "{} | {} | {}x{}".format(data["encoding"], data["format"], data["width"], data["height"])
-        else:
-            text = "no valid preset selected"
-        self.ui.ps_preset_description.setText(text)
+        preset = presets.get_format_presets(PRESET_YAML).get(val)
+        logger.info("preset: {}".format(preset))
+        if not preset:
+            self.ui.ps_preset_description.setText("no valid preset selected")
+            self.ui.ps_preset_description.setToolTip("")
+            return
+        problems = maya_scene.validate_format_preset(preset)
+        if problems:
+            logger.warning("Preset {} can't be recorded: {}".format(val, ", ".join(problems)))
+        self.ui.ps_preset_description.setText(preset.description + (" (unavailable)" if problems else ""))
+        self.ui.ps_preset_description.setToolTip("\n".join(problems))
 
 
     def update_current_viewport_preset(self):
@@ -961,8 +963,8 @@ class MenuWindow(SyncSketch_Window):
 
 
     def store_frame(self):
-        database.dump_cache({'frame_start': self.ui.ui_rangeIn_textEdit.text()})
-        database.dump_cache({'frame_end': self.ui.ui_rangeOut_textEdit.text()})
+        self.settings.set('frame_start', self.ui.ui_rangeIn_textEdit.text())
+        self.settings.set('frame_end', self.ui.ui_rangeOut_textEdit.text())
 
 
     def open_upload_to_url(self):
@@ -975,8 +977,22 @@ class MenuWindow(SyncSketch_Window):
     def playblast(self):
         # store current preset since subsequent calls will use that data exclusively
         # savedata
+        if syncsketchGUI.is_recording():
+            self.ui.ui_status_label.update('A recording is still running.', color=warning_color)
+            return
         self.save_ui_state()
-        recordData = syncsketchGUI.record()
+        # the encode and upload run in the background, don't take a second click meanwhile
+        self.ui.ui_record_pushButton.setEnabled(False)
+        try:
+            syncsketchGUI.record(on_encode_progress=self.update_encode_progress,
+                                 on_upload_progress=self.update_upload_progress,
+                                 on_finished=self.on_recorded)
+        except Exception:
+            self.ui.ui_record_pushButton.setEnabled(True)
+            raise
+
+    def on_recorded(self, recordData):
+        self.ui.ui_record_pushButton.setEnabled(True)
         playblast_file = recordData["playblast_file"]
         if not playblast_file:
             self.ui.ui_status_label.update('Playblast failed.' , color=error_color)
@@ -1002,6 +1018,26 @@ class MenuWindow(SyncSketch_Window):
         self.update_last_recorded()
 
 
+    def update_encode_progress(self, progress):
+        if progress.get('percent') is not None:
+            message = 'Encoding playblast ... {:.0f}%'.format(progress['percent'])
+        else:
+            message = 'Encoding playblast ... frame {}'.format(progress.get('frame') or 0)
+        if progress.get('fps'):
+            message += ' ({:.1f} fps)'.format(progress['fps'])
+        self.ui.ui_status_label.update(message)
+
+    def update_upload_progress(self, progress):
+        megabytes = (progress.get('bytes_sent') or 0) / (1024.0 * 1024.0)
+        if progress.get('percent') is not None:
+            message = 'Uploading playblast ... {:.0f}%'.format(progress['percent'])
+        else:
+            message = 'Uploading playblast ... {:.1f} MB'.format(megabytes)
+        if progress.get('rate'):
+            message += ' ({:.1f} MB/s)'.format(progress['rate'] / (1024.0 * 1024.0))
+        self.ui.ui_status_label.update(message)
+
+
     def set_active_camera(self):
         self.populate_camera_comboBox()
         self.ui.ui_cameraPreset_comboBox.set_combobox_index(selection=maya_scene.get_current_camera())
@@ -1107,12 +1143,65 @@ class MenuWindow(SyncSketch_Window):
         logger.info("Upload only function")
         self.save_ui_state()
 
-        uploaded_item = syncsketchGUI.upload()
-
-        if not uploaded_item:
+        task = syncsketchGUI.queue_upload()
+        if not task:
             self.ui.ui_status_label.update('Upload Failed, please check log', color=error_color)
             return
 
+        if task in upload_queue.get_upload_queue().held_tasks:
+            self.ui.ui_status_label.update('Offline, {} will be uploaded once SyncSketch is reachable'.format(task.name), color=warning_color)
+            return
+        self.ui.ui_status_label.update('Queued {} for upload'.format(task.name))
+
+    def connect_upload_queue(self):
+        signals = upload_queue.get_upload_queue().signals
+        signals.progress.connect(self.update_upload_task_progress)
+        signals.finished.connect(self.upload_finished)
+        signals.batch_finished.connect(self.upload_batch_finished)
+        signals.error.connect(self.upload_failed)
+
+    def disconnect_upload_queue(self):
+        # the queue outlives the window, uploads keep going after it is closed
+        signals = upload_queue.get_upload_queue().signals
+        for signal, slot in [(signals.progress, self.update_upload_task_progress),
+                             (signals.finished, self.upload_finished),
+                             (signals.batch_finished, self.upload_batch_finished),
+                             (signals.error, self.upload_failed)]:
+            try:
+                signal.disconnect(slot)
+            except (RuntimeError, TypeError):
+                pass
+
+    def update_upload_task_progress(self, task, progress):
+        pending = len(upload_queue.get_upload_queue().active_tasks)
+        message = 'Uploading {} ... {:.0f}%'.format(task.name, progress.get('percent') or 0)
+        if progress.get('rate'):
+            message += ' ({:.1f} MB/s)'.format(progress['rate'] / (1024.0 * 1024.0))
+        if pending > 1:
+            message += ' - {} uploads running'.format(pending)
+        self.ui.ui_status_label.update(message)
+
+    def upload_failed(self, task, message):
+        logger.info('Upload of {} failed: {}'.format(task.filepath, message))
+        self.ui.ui_status_label.update('Upload of {} failed, please check log'.format(task.name), color=error_color)
+
+    def upload_finished(self, task):
+        self.ui.ui_status_label.update('Upload of {} finished'.format(task.name))
+        self.show_upload(task.uploaded_item)
+
+    def upload_batch_finished(self, batch):
+        # e.g. the shots of record_batch, the review is shown once for all of them
+        message = 'Uploaded {} of {} files'.format(len(batch.uploaded_items), len(batch.tasks))
+        if batch.failed_tasks:
+            self.ui.ui_status_label.update(message, color=error_color)
+        else:
+            self.ui.ui_status_label.update(message)
+        if batch.uploaded_items:
+            self.show_upload(batch.uploaded_items[-1])
+
+    def show_upload(self, uploaded_item):
+        syncsketchGUI.show_uploaded_item(uploaded_item)
+
         self.update_target_from_upload(uploaded_item['reviewURL'])
 
         #Upload done let's set url from that
@@ -1173,17 +1262,16 @@ class MenuWindow(SyncSketch_Window):
     # Tree Function
     def retrievePanelData(self):
         begin = time.time()
-        if not is_connected():
-            self.ui.ui_status_label.update(message_is_not_connected, color=error_color)
-            self.isloggedIn(loggedIn=False)
-            logger.info("\nNot connected to SyncSketch ...")
-            return
+        # cached by the connectivity monitor, offline the tree of the last sync is shown
+        self._tree_is_stale = not is_connected()
+        if self._tree_is_stale:
+            logger.info("\nNot connected to SyncSketch, using the last synced tree ...")
 
-        self.current_user = user.SyncSketchUser()
+        self.current_user = user.get_current_user()
         logger.info("CurrentUser: {}".format(self.current_user))
         logger.info("isLoggedin: {}".format(self.current_user.is_logged_in()))
         # Always refresh Tree View
-        self.ui.browser_treeWidget.clear()
+        self.clear_browser()
 
         if self.current_user.is_logged_in():
             logger.info("User is logged in")
@@ -1202,7 +1290,11 @@ class MenuWindow(SyncSketch_Window):
             logger.info("err: {}".format(err))
 
         finally:
-            if self.account_data:
+            if self.account_data and self._tree_is_stale:
+                account_is_connected = False
+                message = 'Offline, showing reviews as of the last sync. Uploads start once SyncSketch is reachable.'
+                color = warning_color
+            elif self.account_data:
                 account_is_connected = True
                 message='Connected and authorized with syncsketchGUI as "{}"'.format(self.current_user.get_name())
                 color = success_color
@@ -1223,74 +1315,168 @@ class MenuWindow(SyncSketch_Window):
         logger.info("Account preperation took: {0}".format(time.time() - begin))
         return self.account_data
 
+    def connect_connectivity(self):
+        # the monitor calls its observers from its own thread, the signal brings them to the ui thread
+        self._connectivity_signals = ConnectivitySignals()
+        self._connectivity_signals.changed.connect(self.connectivity_changed)
+        self._connectivity_observer = self._connectivity_signals.changed.emit
+        connection.get_monitor().add_observer(self._connectivity_observer)
+
+    def disconnect_connectivity(self):
+        connection.get_monitor().remove_observer(self._connectivity_observer)
+
+    def connectivity_changed(self, online):
+        if online:
+            logger.info("SyncSketch is reachable again, refreshing")
+            self.ui.ui_status_label.update('Connected to SyncSketch again', color=success_color)
+            if self.current_user.is_logged_in():
+                self.populateTree()
+        else:
+            self.ui.ui_status_label.update(message_is_not_connected, color=error_color)
+
     def populate_review_panel(self, account_data=None, item_to_add = None, force = False):
+        '''
+        Fill the browser from account_data, TREE_BATCH_SIZE items per event
+        loop iteration so the first rows show up right away
+        '''
         if not account_data:
             logger.info("No account_data found")
             return
 
-        logger.info("account_data: {}".format(account_data))
-        for account in account_data:
-            account_treeWidgetItem = self._build_widget_item(parent = self.ui.browser_treeWidget,
-                                                            item_name = account.get('name'),
-                                                            item_type='account',
-                                                            item_icon = account_icon,
-                                                            item_data = account)
-            # Add projects
-            projects = account.get('projects')
-            for project in projects:
-                project_treeWidgetItem = self._build_widget_item(parent = account_treeWidgetItem,
-                                                                item_name = project.get('name'),
-                                                                item_type='project',
-                                                                item_icon = project_icon,
-                                                                item_data = project)
-                # Add reviews
-                reviews = project.get('reviews')
-
-                for review in reviews:
-                    review_treeWidgetItem = self._build_widget_item(parent = project_treeWidgetItem,
-                                                                item_name = review.get('name'),
-                                                                item_type='review',
-                                                                item_icon = review_icon,
-                                                                item_data = review)
-                    # Add items
-                    items = review.get('items')
-                    # * If there are no reviews, create still a dumy element to get an arrow icon
-                    # * to visualize that the item needs to be expanded
-                    for media in items or [{'uuid':'', 'type':'video'}]:
-                        #add UUID of the review container to the media, so we can use it in itemdata
-                        media['uuid'] = review['uuid']
-                        if not media.get('type'):
-                            specified_media_icon = media_unknown_icon
-                        elif 'video' in media.get('type').lower():
-                            specified_media_icon = media_video_icon
-                        elif 'image' in media.get('type').lower():
-                            specified_media_icon = media_image_icon
-                        elif 'sketchfab' in media.get('type').lower():
-                            specified_media_icon = media_sketchfab_icon
-                        else:
-                            specified_media_icon = media_unknown_icon
-
-                        media_treeWidgetItem = self._build_widget_item(parent = review_treeWidgetItem,
-                                                                    item_name = media.get('name'),
-                                                                    item_type='media',
-                                                                    item_icon = specified_media_icon,
-                                                                    item_data = media)
-
-                        media_treeWidgetItem.sizeHint(80)
+        logger.info("Populating browser with {} accounts".format(len(account_data)))
+        self.stop_tree_population()
+        self.ui.browser_treeWidget.setHeaderLabel('refresh (offline)' if self._tree_is_stale else 'refresh')
+        self._tree_nodes = tree_stream.iter_nodes(account_data)
+        self._populate_begin = time.time()
+        self._populate_timer.start()
+
+        USER_ACCOUNT_DATA = account_data
+        return account_data
+
+    def clear_browser(self):
+        self.stop_tree_population()
+        self._search_index.clear()
+        self._hidden_items = set()
+        self.ui.browser_treeWidget.clear()
+
+    def apply_search_filter(self, text = None):
+        '''
+        Show only the items matching the search box and their parents
+        '''
+        if text is None:
+            text = self.ui.search_lineEdit.text()
+        matches = self._search_index.search(text)
+
+        if matches is None:
+            hidden = set()
+        else:
+            visible = set()
+            for item in matches:
+                parent = item.parent()
+                while parent is not None and parent not in visible:
+                    visible.add(parent)
+                    parent.setExpanded(True)
+                    parent = parent.parent()
+            visible.update(matches)
+            hidden = set(self._search_index.keys()) - visible
+
+        # only touch the items whose state changes
+        for item in hidden - self._hidden_items:
+            item.setHidden(True)
+        for item in self._hidden_items - hidden:
+            item.setHidden(False)
+        self._hidden_items = hidden
+
+    def is_populating_tree(self):
+        return self._tree_nodes is not None
+
+    def stop_tree_population(self):
+        self._populate_timer.stop()
+        self._tree_nodes = None
+        self._tree_items = {}
+
+    def _populate_tree_batch(self):
+        count = 0
+        for node in self._tree_nodes:
+            self._add_tree_node(node)
+            count += 1
+            if count == TREE_BATCH_SIZE:
+                break
+        else:
+            self._finish_tree_population()
+        if self.ui.search_lineEdit.text():
+            self.apply_search_filter()
+
+    def _add_tree_node(self, node):
+        if node.parent is None:
+            parent = self.ui.browser_treeWidget
+        else:
+            parent = self._tree_items[id(node.parent)][1]
+
+        if node.kind == 'media':
+            self._add_media_item(parent, node.data, node.parent.data)
+            return
+
+        icon = {'account': account_icon, 'project': project_icon, 'review': review_icon}[node.kind]
+        treeWidgetItem = self._build_widget_item(parent = parent,
+                                                 item_name = node.data.get('name'),
+                                                 item_type = node.kind,
+                                                 item_icon = icon,
+                                                 item_data = node.data)
+        self._search_index.add(treeWidgetItem, node.data)
+        # the node is kept with its item, so its id isn't reused while children refer to it
+        self._tree_items[id(node)] = (node, treeWidgetItem)
+
+        # * If there are no items, create still a dumy element to get an arrow icon
+        # * to visualize that the item needs to be expanded
+        if node.kind == 'review' and not node.child_count:
+            self._add_media_item(treeWidgetItem, nodes.Media(uuid = node.data.uuid, type = 'video'), node.data)
+
+    def _add_media_item(self, parent, media, review):
+        #the media record carries the UUID of the review container, so we can use it in itemdata
+        media = nodes.Media.from_payload(media, review)
+        if not media.get('type'):
+            specified_media_icon = media_unknown_icon
+        elif 'video' in media.get('type').lower():
+            specified_media_icon = media_video_icon
+        elif 'image' in media.get('type').lower():
+            specified_media_icon = media_image_icon
+        elif 'sketchfab' in media.get('type').lower():
+            specified_media_icon = media_sketchfab_icon
+        else:
+            specified_media_icon = media_unknown_icon
+
+        media_treeWidgetItem = self._build_widget_item(parent = parent,
+                                                    item_name = media.get('name'),
+                                                    item_type='media',
+                                                    item_icon = specified_media_icon,
+                                                    item_data = media)
+        if media.get('name'):
+            self._search_index.add(media_treeWidgetItem, media)
+
+        media_treeWidgetItem.sizeHint(80)
+        return media_treeWidgetItem
+
+    def _finish_tree_population(self):
+        self.stop_tree_population()
+        logger.info("Populating browser took: {0}".format(time.time() - self._populate_begin))
 
         logger.info("uploaded_to_value: {}".format(database.read_cache('upload_to_value')))
-        url_payload = parse_url_data(database.read_cache('upload_to_value'))
+        url_payload = urls.parse_review_url(database.read_cache('upload_to_value'))
         logger.info("url_payload: {}".format(url_payload))
         get_current_item_from_ids(self.ui.browser_treeWidget, url_payload, setCurrentItem=True)
 
-        USER_ACCOUNT_DATA = account_data
-
         self.populate_upload_settings()
-        return account_data
+        if self._restore_review_pending:
+            self._restore_review_pending = False
+            self.restore_review_selection()
 
     def _build_widget_item(self, parent, item_name, item_type, item_icon, item_data):
         treewidget_item = QtWidgets.QTreeWidgetItem(parent, [item_name])
         treewidget_item.setData(1, QtCore.Qt.EditRole, item_data)
         treewidget_item.setData(2, QtCore.Qt.EditRole, item_type)
         treewidget_item.setIcon(0, item_icon)
+        if self._tree_is_stale:
+            treewidget_item.setForeground(0, QtGui.QBrush(stale_color))
+            treewidget_item.setToolTip(0, 'Offline, this may have changed since the last sync')
         return treewidget_item
\ No newline at end of file
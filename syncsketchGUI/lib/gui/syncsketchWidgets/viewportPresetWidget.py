@@ -5,6 +5,7 @@ from syncsketchGUI.lib.gui.icons import _get_qicon
 from syncsketchGUI.lib.gui.qt_widgets import *
 from syncsketchGUI.lib.gui.syncsketchWidgets.mainWidget import DEFAULT_PRESET, VIEWPORT_YAML, PRESET_YAML
 from syncsketchGUI.lib.maya import scene as maya_scene
+from syncsketchGUI.vendor.capture import capture
 
 
 class ViewportPresetWindow(SyncSketch_Window):
@@ -16,6 +17,8 @@ class ViewportPresetWindow(SyncSketch_Window):
 
     def __init__(self, parent=None):
         super(ViewportPresetWindow, self).__init__(parent=parent)
+        # previews reuse one capture panel until the window closes
+        self.capture_pool = capture.CapturePanelPool()
         self.decorate_ui()
         self.build_connections()
         self.populate_ui()
@@ -174,7 +177,7 @@ class ViewportPresetWindow(SyncSketch_Window):
         preset_file = path.get_config_yaml(VIEWPORT_YAML)
 
         current_camera = database.read_cache('selected_camera')
-        fname = maya_scene.screenshot_current_editor( preset_file, preset_name, camera = current_camera)
+        fname = maya_scene.screenshot_current_editor( preset_file, preset_name, camera = current_camera, pool = self.capture_pool)
         self.ui.ui_status_label.update(preset_name)
         if not fname:
             self.ui.screenshot_pushButton.setIcon(logo_icon)
@@ -212,6 +215,7 @@ class ViewportPresetWindow(SyncSketch_Window):
 
     def closeEvent(self, event):
         self.setParent_preset()
+        self.capture_pool.close()
         event.accept()
 
 
@@ -24,7 +24,7 @@ class WebLoginWindow(QWebView):
         super(WebLoginWindow, self).__init__(parent)
 
         self.parent = parent
-        self.current_user = user.SyncSketchUser()
+        self.current_user = user.get_current_user()
 
         self.setMaximumSize(650, 600)
 
@@ -54,9 +54,7 @@ class WebLoginWindow(QWebView):
                 if isinstance(jsonData, unicode):
                     tokenData = json.loads(jsonData)
                     logger.info("tokenData: {0}".format(tokenData))
-                    self.current_user.set_name(tokenData["email"])
-                    self.current_user.set_token(tokenData["token"])
-                    self.current_user.set_api_key(tokenData["token"])
+                    self.current_user.set_credentials(tokenData["email"], tokenData["token"], tokenData["token"])
                     self.current_user.auto_login()
                     break
 
@@ -129,10 +129,8 @@ class LoginView(QtWebEngineWidgets.QWebEngineView):
         token_data = self.page().qt_object.token_data
         if token_data:
             token_dict = json.loads(token_data)
-            current_user = user.SyncSketchUser()
-            current_user.set_name(token_dict["email"])
-            current_user.set_token(token_dict["token"])
-            current_user.set_api_key(token_dict["token"])
+            current_user = user.get_current_user()
+            current_user.set_credentials(token_dict["email"], token_dict["token"], token_dict["token"])
             current_user.auto_login()
             #self.loggedIn.emit()
             logger.info("User: {} logged id".format(token_dict["email"]))
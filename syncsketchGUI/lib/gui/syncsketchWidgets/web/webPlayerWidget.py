@@ -15,7 +15,7 @@ class OpenPlayer(QWebView):
         super(OpenPlayer, self).__init__(parent)
 
         self.parent = parent
-        self.current_user = user.SyncSketchUser()
+        self.current_user = user.get_current_user()
 
         self.setWindowTitle(self.window_label)
         self.setObjectName(self.window_name)
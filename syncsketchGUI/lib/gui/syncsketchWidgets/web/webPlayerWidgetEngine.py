@@ -14,7 +14,7 @@ class OpenPlayerView(QtWebEngineWidgets.QWebEngineView):
         super(PlayerView, self).__init__(parent)
 
         self.parent = parent
-        self.current_user = user.SyncSketchUser()
+        self.current_user = user.get_current_user()
 
         self.setWindowTitle(self.window_label)
         self.setObjectName(self.window_name)
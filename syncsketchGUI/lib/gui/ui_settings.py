@@ -0,0 +1,178 @@
+'''
+Window settings kept in the cache yaml.
+
+A SettingsModel reads all keys with one parse of the file and only parses it
+again when it changed on disk. Widgets bound to a key update the model when
+they are edited; changed keys are marked dirty and written together with one
+dump_cache, on save() or SAVE_DELAY ms after the last edit. flush_all() writes
+the edits of all models right away, e.g. before recording reads the cache.
+'''
+import collections
+import os
+import weakref
+
+from syncsketchGUI.vendor.Qt import QtCore, QtWidgets
+from syncsketchGUI.lib import database
+from syncsketchGUI.lib import path
+
+import logging
+logger = logging.getLogger("syncsketchGUI")
+
+# ======================================================================
+# Global Variables
+
+# ms without edits before dirty settings are written
+SAVE_DELAY = 2000
+
+# models of the open windows, for flush_all
+_models = weakref.WeakSet()
+
+# ======================================================================
+# Module Utilities
+
+def bool_to_str(value):
+    return 'true' if value else 'false'
+
+
+def str_to_bool(value):
+    return value == 'true'
+
+
+def flush_all():
+    '''
+    Write the edits of all models that are still waiting for SAVE_DELAY
+    '''
+    for model in list(_models):
+        try:
+            model.save()
+        except RuntimeError:
+            # its window was deleted on the C++ side
+            _models.discard(model)
+
+
+# ======================================================================
+# Module Classes
+
+class _Binding(object):
+    '''
+    How a key is read from and written to its widget
+    '''
+    def __init__(self, widget, read, write, default = None, restore = True):
+        self.widget = widget
+        self.read = read
+        self.write = write
+        self.default = default
+        self.restore = restore
+
+
+class SettingsModel(QtCore.QObject):
+    '''
+    Values of the cache yaml with dirty tracking, bound to the widgets of a window
+    '''
+    def __init__(self, yaml_file = database.CACHE_YAML, save_delay = SAVE_DELAY, parent = None):
+        super(SettingsModel, self).__init__(parent)
+        self.yaml_file = yaml_file
+        self._values = {}
+        self._dirty = set()
+        self._bindings = collections.OrderedDict()
+        self._mtime = None
+        self._applying = False
+
+        self._save_timer = QtCore.QTimer(self)
+        self._save_timer.setSingleShot(True)
+        self._save_timer.setInterval(save_delay)
+        self._save_timer.timeout.connect(self.save)
+        _models.add(self)
+
+    @property
+    def cache_file(self):
+        return path.get_config_yaml(self.yaml_file)
+
+    @property
+    def is_dirty(self):
+        return bool(self._dirty)
+
+    def load(self):
+        '''
+        Read all keys, nothing is read when the file didn't change since the last load
+        '''
+        try:
+            mtime = os.path.getmtime(self.cache_file)
+        except OSError:
+            mtime = None
+        if mtime is not None and mtime == self._mtime:
+            return
+        data = database._parse_yaml(self.cache_file) if mtime is not None else None
+        values = data if isinstance(data, dict) else {}
+        # edits that aren't written yet win over the file
+        values.update((key, self._values[key]) for key in self._dirty)
+        self._values = values
+        self._mtime = mtime
+
+    def get(self, key, default = None):
+        value = self._values.get(key)
+        return default if value is None else value
+
+    def set(self, key, value):
+        if self._values.get(key) == value and key not in self._dirty:
+            return
+        self._values[key] = value
+        self._dirty.add(key)
+        self._save_timer.start()
+
+    def save(self):
+        '''
+        Write the dirty keys, the widgets are read first in case they changed without a signal
+        '''
+        self.update_from_widgets()
+        self._save_timer.stop()
+        if not self._dirty:
+            return
+        database.dump_cache(dict((key, self._values.get(key)) for key in self._dirty), self.yaml_file)
+        self._dirty.clear()
+        try:
+            self._mtime = os.path.getmtime(self.cache_file)
+        except OSError:
+            self._mtime = None
+
+    def bind(self, key, widget, default = None, restore = True, clean = None):
+        '''
+        Keep key in sync with a line edit, check box or combo box.
+        restore False only saves the widget's state, apply() leaves it alone.
+        '''
+        if isinstance(widget, QtWidgets.QCheckBox):
+            read = lambda: bool_to_str(widget.isChecked())
+            write = lambda value: widget.setChecked(str_to_bool(value))
+            signal = widget.toggled
+        elif isinstance(widget, QtWidgets.QComboBox):
+            read = widget.currentText
+            write = lambda value: widget.set_combobox_index(selection = value)
+            signal = widget.currentIndexChanged
+        else:
+            clean = clean or (lambda value: value)
+            read = lambda: clean(widget.text())
+            write = lambda value: widget.setText(clean(value or ''))
+            signal = widget.textChanged
+
+        self._bindings[key] = _Binding(widget, read, write, default, restore)
+        signal.connect(lambda *args: self._widget_changed(key))
+
+    def apply(self):
+        '''
+        Show the values in their widgets
+        '''
+        self._applying = True
+        try:
+            for key, binding in self._bindings.items():
+                if binding.restore:
+                    binding.write(self.get(key, binding.default))
+        finally:
+            self._applying = False
+
+    def update_from_widgets(self):
+        for key, binding in self._bindings.items():
+            self.set(key, binding.read())
+
+    def _widget_changed(self, key):
+        if not self._applying:
+            self.set(key, self._bindings[key].read())
@@ -0,0 +1,458 @@
+import collections
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import logging
+logger = logging.getLogger("syncsketchGUI")
+
+# ======================================================================
+# Global Variables
+
+MAX_CONCURRENT_JOBS = 2
+
+# seconds a cancelled process gets to exit before it is killed
+TERMINATE_GRACE = 3.0
+
+# amount of stderr lines kept around for error reporting
+OUTPUT_TAIL = 50
+
+PENDING = 'pending'
+RUNNING = 'running'
+FINISHED = 'finished'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+TIMED_OUT = 'timed_out'
+
+DONE_STATES = (FINISHED, FAILED, CANCELLED, TIMED_OUT)
+
+# ======================================================================
+# Module Utilities
+
+def _decode(line):
+    if isinstance(line, bytes):
+        return line.decode('utf-8', 'replace')
+    return line
+
+
+def parse_out_time(value):
+    '''
+    Convert an ffmpeg out_time value (HH:MM:SS.micro) into seconds
+    '''
+    try:
+        hours, minutes, seconds = value.strip().split(':')
+        return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    except (ValueError, AttributeError):
+        return None
+
+
+def parse_progress_line(line):
+    '''
+    Split a single "key=value" line written by ffmpeg -progress
+    '''
+    line = _decode(line).strip()
+    if '=' not in line:
+        return None, None
+    key, value = line.split('=', 1)
+    return key.strip(), value.strip()
+
+
+# ======================================================================
+# Module Classes
+
+class Job(object):
+    '''
+    Base class for work that runs without blocking the caller.
+
+    Callbacks are called from the job's thread, they get the job as
+    first argument:
+        on_output(job, line)
+        on_progress(job, progress)
+        on_finished(job)
+        on_error(job, message)
+    '''
+    def __init__(self, name = None, timeout = None,
+                 on_output = None, on_progress = None,
+                 on_finished = None, on_error = None):
+        self.name = name or self.__class__.__name__
+        self.timeout = timeout
+        self.on_output = on_output
+        self.on_progress = on_progress
+        self.on_finished = on_finished
+        self.on_error = on_error
+
+        self.state = PENDING
+        self.error = None
+        self.progress = {}
+        self.output = collections.deque(maxlen = OUTPUT_TAIL)
+        self.started_at = None
+        self.finished_at = None
+
+        self._thread = None
+        self._cancel_requested = False
+        self._timed_out = False
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    def __repr__(self):
+        return '<{} {} [{}]>'.format(self.__class__.__name__, self.name, self.state)
+
+    @property
+    def is_done(self):
+        return self.state in DONE_STATES
+
+    @property
+    def cancel_requested(self):
+        return self._cancel_requested
+
+    @property
+    def elapsed(self):
+        if not self.started_at:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def start(self):
+        '''
+        Run the job on its own thread and return right away
+        '''
+        self._thread = threading.Thread(target = self.run, name = str(self.name))
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def run(self):
+        raise NotImplementedError
+
+    def cancel(self):
+        with self._lock:
+            self._cancel_requested = True
+
+    def wait(self, timeout = None):
+        '''
+        Block until the job is done, returns False if timeout expired first
+        '''
+        return self._done.wait(timeout)
+
+    def set_progress(self, **progress):
+        self.progress = progress
+        if self.on_progress:
+            self.on_progress(self, progress)
+
+    def _finish(self, state):
+        self.state = state
+        self.finished_at = time.time()
+        logger.info('{} done in {:.2f}s'.format(self, self.elapsed))
+        try:
+            if state == FINISHED:
+                if self.on_finished:
+                    self.on_finished(self)
+            elif self.on_error:
+                self.on_error(self, self.error or state)
+        finally:
+            self._done.set()
+
+
+class FunctionJob(Job):
+    '''
+    Run a python callable as a job. The callable gets the job as first
+    argument so it can report progress and check job.cancel_requested,
+    its return value ends up in job.result.
+    '''
+    def __init__(self, fn, args = (), kwargs = None, **job_kwargs):
+        job_kwargs.setdefault('name', getattr(fn, '__name__', None))
+        super(FunctionJob, self).__init__(**job_kwargs)
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.result = None
+
+    def run(self):
+        if self._cancel_requested:
+            self._finish(CANCELLED)
+            return self.state
+
+        self.state = RUNNING
+        self.started_at = time.time()
+        try:
+            self.result = self.fn(self, *self.args, **self.kwargs)
+        except Exception as err:
+            logger.error('{} raised: {}'.format(self, err))
+            self.error = u'{}'.format(err)
+            self._finish(CANCELLED if self._cancel_requested else FAILED)
+        else:
+            self._finish(CANCELLED if self._cancel_requested else FINISHED)
+        return self.state
+
+
+class ProcessJob(Job):
+    '''
+    Run a subprocess as a job, stdout lines are passed to on_output
+    '''
+    def __init__(self, command, env = None, **job_kwargs):
+        self.command = list(command)
+        self.env = env
+        job_kwargs.setdefault('name', self.command[0])
+        super(ProcessJob, self).__init__(**job_kwargs)
+        self.returncode = None
+        self._process = None
+
+    def run(self):
+        '''
+        Run the job on the calling thread, returns the final state
+        '''
+        with self._lock:
+            cancelled = self._cancel_requested
+            if not cancelled:
+                self.state = RUNNING
+                self.started_at = time.time()
+                try:
+                    self._process = self._popen()
+                except (OSError, ValueError) as err:
+                    self.error = u'{}'.format(err)
+
+        if cancelled:
+            self._finish(CANCELLED)
+            return self.state
+        if not self._process:
+            self._finish(FAILED)
+            return self.state
+
+        watchdog = None
+        if self.timeout:
+            watchdog = threading.Timer(self.timeout, self._on_timeout)
+            watchdog.daemon = True
+            watchdog.start()
+
+        stderr_reader = threading.Thread(target = self._read_stderr)
+        stderr_reader.daemon = True
+        stderr_reader.start()
+
+        try:
+            for line in iter(self._process.stdout.readline, b''):
+                self._handle_line(_decode(line).rstrip('\r\n'))
+            self.returncode = self._process.wait()
+            stderr_reader.join()
+        finally:
+            if watchdog:
+                watchdog.cancel()
+
+        if self._timed_out:
+            self.error = 'Timed out after {} seconds'.format(self.timeout)
+            self._finish(TIMED_OUT)
+        elif self._cancel_requested:
+            self._finish(CANCELLED)
+        elif self.returncode != 0:
+            self.error = 'Exit code {}: {}'.format(self.returncode, '\n'.join(self.output))
+            self._finish(FAILED)
+        else:
+            self._finish(FINISHED)
+        return self.state
+
+    def cancel(self):
+        '''
+        Ask the process to stop, kill it if it doesn't within TERMINATE_GRACE
+        '''
+        with self._lock:
+            self._cancel_requested = True
+            process = self._process
+        if process:
+            self._terminate(process)
+
+    def _popen(self):
+        kwargs = {}
+        if sys.platform == 'win32':
+            # don't flash a console window for every job
+            kwargs['creationflags'] = 0x08000000
+        # nothing is ever written to the process, a prompt (e.g. ffmpeg asking to overwrite) gets eof
+        if hasattr(subprocess, 'DEVNULL'):
+            return subprocess.Popen(self.command, stdout = subprocess.PIPE, stderr = subprocess.PIPE,
+                                    stdin = subprocess.DEVNULL, env = self.env, **kwargs)
+        with open(os.devnull, 'rb') as devnull:
+            return subprocess.Popen(self.command, stdout = subprocess.PIPE, stderr = subprocess.PIPE,
+                                    stdin = devnull, env = self.env, **kwargs)
+
+    def _read_stderr(self):
+        for line in iter(self._process.stderr.readline, b''):
+            self.output.append(_decode(line).rstrip('\r\n'))
+
+    def _handle_line(self, line):
+        self.output.append(line)
+        if self.on_output:
+            self.on_output(self, line)
+
+    def _on_timeout(self):
+        self._timed_out = True
+        logger.warning('{} timed out after {} seconds'.format(self, self.timeout))
+        self._terminate(self._process)
+
+    def _terminate(self, process):
+        if process.poll() is not None:
+            return
+        try:
+            process.terminate()
+        except OSError:
+            return
+        deadline = time.time() + TERMINATE_GRACE
+        while process.poll() is None and time.time() < deadline:
+            time.sleep(0.05)
+        if process.poll() is None:
+            try:
+                process.kill()
+            except OSError:
+                pass
+
+
+class FFmpegJob(ProcessJob):
+    '''
+    ProcessJob for ffmpeg, reads the machine readable -progress output
+    and reports frame, fps, out_time and percent through on_progress
+    '''
+    def __init__(self, command, total_frames = None, **kwargs):
+        command = list(command)
+        # progress goes to stdout, the regular log stays on stderr
+        command[1:1] = ['-nostats', '-progress', 'pipe:1']
+        super(FFmpegJob, self).__init__(command, **kwargs)
+        self.total_frames = total_frames
+        self._block = {}
+
+    def _read_stderr(self):
+        for line in iter(self._process.stderr.readline, b''):
+            line = _decode(line).rstrip('\r\n')
+            self.output.append(line)
+            if self.on_output:
+                self.on_output(self, line)
+
+    def _handle_line(self, line):
+        key, value = parse_progress_line(line)
+        if not key:
+            return
+        self._block[key] = value
+
+        # every block of values written by ffmpeg ends with progress=continue|end
+        if key != 'progress':
+            return
+
+        block, self._block = self._block, {}
+        progress = {
+            'frame': self._to_number(block.get('frame'), int),
+            'fps': self._to_number(block.get('fps'), float),
+            'out_time': parse_out_time(block.get('out_time', '')),
+            'speed': block.get('speed'),
+            'percent': None,
+            'end': value == 'end',
+        }
+        if self.total_frames and progress['frame'] is not None:
+            percent = 100.0 * progress['frame'] / self.total_frames
+            progress['percent'] = min(100.0, percent)
+        if progress['end']:
+            progress['percent'] = 100.0
+
+        self.set_progress(**progress)
+
+    def _to_number(self, value, cast):
+        try:
+            return cast(value)
+        except (TypeError, ValueError):
+            return None
+
+
+class JobRunner(object):
+    '''
+    Start jobs in the background, never more than max_concurrent at once
+    '''
+    def __init__(self, max_concurrent = MAX_CONCURRENT_JOBS):
+        self._max_concurrent = max(1, int(max_concurrent))
+        self._pending = collections.deque()
+        self._running = []
+        self._lock = threading.Lock()
+
+    @property
+    def max_concurrent(self):
+        return self._max_concurrent
+
+    def set_max_concurrent(self, value):
+        with self._lock:
+            self._max_concurrent = max(1, int(value))
+        self._dispatch()
+
+    @property
+    def jobs(self):
+        with self._lock:
+            return list(self._running) + list(self._pending)
+
+    def submit(self, job):
+        '''
+        Queue a job, it is started as soon as a slot is free
+        '''
+        with self._lock:
+            self._pending.append(job)
+        self._dispatch()
+        return job
+
+    def cancel(self, job):
+        with self._lock:
+            pending = job in self._pending
+            if pending:
+                self._pending.remove(job)
+        job.cancel()
+        if pending:
+            # outside the lock, the job's callbacks may submit or cancel jobs
+            job._finish(CANCELLED)
+
+    def cancel_all(self):
+        for job in self.jobs:
+            self.cancel(job)
+
+    def wait_all(self, timeout = None):
+        '''
+        Block until all queued and running jobs are done
+        '''
+        deadline = None if timeout is None else time.time() + timeout
+        jobs = self.jobs
+        while jobs:
+            remaining = None if deadline is None else max(0.0, deadline - time.time())
+            if not jobs[0].wait(remaining):
+                return False
+            jobs = [job for job in self.jobs if not job.is_done]
+        return True
+
+    def _dispatch(self):
+        to_start = []
+        with self._lock:
+            while self._pending and len(self._running) < self._max_concurrent:
+                job = self._pending.popleft()
+                self._running.append(job)
+                to_start.append(job)
+
+        for job in to_start:
+            thread = threading.Thread(target = self._run_job, args = (job,), name = str(job.name))
+            thread.daemon = True
+            thread.start()
+
+    def _run_job(self, job):
+        try:
+            job.run()
+        except Exception as err:
+            logger.error('Job {} raised: {}'.format(job, err))
+            if not job.is_done:
+                job.error = u'{}'.format(err)
+                job._finish(FAILED)
+        finally:
+            with self._lock:
+                if job in self._running:
+                    self._running.remove(job)
+            self._dispatch()
+
+
+_runner = None
+
+def get_runner():
+    '''
+    Shared runner used for all encodes of the session
+    '''
+    global _runner
+    if _runner is None:
+        _runner = JobRunner()
+    return _runner
@@ -0,0 +1,269 @@
+'''
+What the running Maya can playblast to.
+
+The formats and the compressions of each format only change when Maya or its
+codecs change, PlayblastCapabilities asks Maya once per session and format and
+answers from memory afterwards. The answers are also stored per Maya version
+in CAPABILITIES_JSON so a new session doesn't ask again for CAPABILITIES_TTL.
+A format or encoding missing from stored answers is asked for again before
+it is reported as unavailable, refresh() forgets everything.
+
+Cameras depend on the scene, they are listed again only after a camera was
+created, deleted or renamed or another scene was opened. reset_capabilities()
+removes the scene callbacks, e.g. before the modules are reloaded.
+'''
+import json
+import os
+import sys
+import threading
+import time
+
+from maya import OpenMaya as om
+from maya import cmds
+from maya import mel
+
+from syncsketchGUI.lib import path
+
+import logging
+logger = logging.getLogger("syncsketchGUI")
+
+# ======================================================================
+# Global Variables
+
+CAPABILITIES_JSON = 'syncsketch_capabilities.json'
+
+# seconds stored answers are used, codecs installed meanwhile show up after it
+CAPABILITIES_TTL = 7 * 24 * 60 * 60
+
+# ======================================================================
+# Module Utilities
+
+def get_default_format():
+    '''
+    Format the compressions are listed for when no format is given
+    '''
+    if sys.platform == 'darwin':
+        return 'qt'
+    elif sys.platform == 'win32':
+        return 'avi'
+    return 'movie'
+
+
+def _as_list(value):
+    if not value:
+        return []
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [value]
+
+
+def _is_camera(node):
+    '''
+    True for a camera shape or a transform with one, listCameras lists the transforms
+    '''
+    if node.hasFn(om.MFn.kCamera):
+        return True
+    if not node.hasFn(om.MFn.kTransform):
+        return False
+    dag_node = om.MFnDagNode(node)
+    return any(dag_node.child(index).hasFn(om.MFn.kCamera) for index in range(dag_node.childCount()))
+
+
+# ======================================================================
+# Module Classes
+
+class PlayblastCapabilities(object):
+    '''
+    Memoized playblast formats, compressions and scene cameras
+    '''
+    def __init__(self, cache_file = None, persist = True, ttl = CAPABILITIES_TTL):
+        self.cache_file = cache_file or path.get_config_yaml(CAPABILITIES_JSON)
+        self.persist = persist
+        self.ttl = ttl
+        self._maya_version = None
+        self._formats = None
+        self._compressions = {}
+        self._cameras = None
+        self._callbacks = []
+        self._loaded = False
+        self._checked_at = None
+        # what was asked from Maya in this session rather than read from the cache file
+        self._queried = set()
+        self._lock = threading.RLock()
+
+    @property
+    def maya_version(self):
+        if self._maya_version is None:
+            self._maya_version = str(cmds.about(version = True))
+        return self._maya_version
+
+    def formats(self):
+        with self._lock:
+            self._load()
+            if self._formats is None:
+                self._formats = _as_list(cmds.playblast(query = True, format = True))
+                self._queried.add(None)
+                self._save()
+            return list(self._formats)
+
+    def compressions(self, format = None):
+        '''
+        Compressions of a format, the platform's default format if None
+        '''
+        format = format or get_default_format()
+        with self._lock:
+            self._load()
+            if format not in self._compressions:
+                mel_command = 'playblast -format "{}" -query -compression'.format(format)
+                try:
+                    self._compressions[format] = _as_list(mel.eval(mel_command))
+                except RuntimeError as err:
+                    logger.warning("Can't list the compressions of {}: {}".format(format, err))
+                    self._compressions[format] = []
+                self._queried.add(format)
+                self._save()
+            return list(self._compressions[format])
+
+    def cameras(self):
+        with self._lock:
+            if self._cameras is None:
+                self._watch_cameras()
+                self._cameras = _as_list(cmds.listCameras())
+            return list(self._cameras)
+
+    def validate_preset(self, preset):
+        '''
+        Reasons the format preset can't be recorded in this Maya, empty if it can
+        '''
+        format, encoding = preset.get('format'), preset.get('encoding')
+        formats = self.formats()
+        if format not in formats and self._requery(None):
+            formats = self.formats()
+        if format not in formats:
+            return ["format {} is not available".format(format)]
+
+        compressions = self.compressions(format)
+        if encoding not in compressions and self._requery(format):
+            compressions = self.compressions(format)
+        if encoding not in compressions:
+            return ["encoding {} is not available for {}".format(encoding, format)]
+        return []
+
+    def _requery(self, format):
+        '''
+        Drop the stored formats (None) or compressions of a format that came from
+        the cache file, returns True if Maya will be asked again
+        '''
+        with self._lock:
+            if format in self._queried:
+                return False
+            if format is None:
+                self._formats = None
+            else:
+                self._compressions.pop(format, None)
+            return True
+
+    def refresh(self):
+        '''
+        Forget everything, the next queries ask Maya again
+        '''
+        with self._lock:
+            self._formats = None
+            self._compressions = {}
+            self._cameras = None
+            self._queried = set()
+            self._loaded = True
+            self._checked_at = None
+            self._save()
+
+    def invalidate_cameras(self, *args):
+        self._cameras = None
+
+    def stop(self):
+        for callback_id in self._callbacks:
+            om.MMessage.removeCallback(callback_id)
+        self._callbacks = []
+
+    def _watch_cameras(self):
+        if self._callbacks:
+            return
+        try:
+            self._callbacks = [
+                om.MDGMessage.addNodeAddedCallback(self.invalidate_cameras, 'camera'),
+                om.MDGMessage.addNodeRemovedCallback(self.invalidate_cameras, 'camera'),
+                # a null MObject watches the renames of all nodes, only cameras matter
+                om.MNodeMessage.addNameChangedCallback(om.MObject(), self._name_changed),
+                om.MSceneMessage.addCallback(om.MSceneMessage.kAfterOpen, self.invalidate_cameras),
+                om.MSceneMessage.addCallback(om.MSceneMessage.kAfterNew, self.invalidate_cameras),
+            ]
+        except RuntimeError as err:
+            # without callbacks the cameras can't be trusted to stay the same
+            logger.warning("Can't watch the scene cameras: {}".format(err))
+            self.stop()
+
+    def _name_changed(self, node, previous_name, *args):
+        if self._cameras is not None and _is_camera(node):
+            self.invalidate_cameras()
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.persist:
+            return
+        try:
+            with open(self.cache_file) as f:
+                cached = json.load(f).get(self.maya_version)
+        except (IOError, ValueError, AttributeError):
+            return
+        if not cached or time.time() - (cached.get('checked_at') or 0) > self.ttl:
+            return
+        self._checked_at = cached['checked_at']
+        if cached.get('formats'):
+            self._formats = cached['formats']
+        self._compressions.update(cached.get('compressions') or {})
+
+    def _save(self):
+        if not self.persist:
+            return
+        try:
+            with open(self.cache_file) as f:
+                data = json.load(f)
+        except (IOError, ValueError):
+            data = {}
+        if not isinstance(data, dict):
+            data = {}
+        # formats that failed are asked again next session
+        compressions = dict((format, values) for format, values in self._compressions.items() if values)
+        if self._checked_at is None:
+            # the ttl runs from the first answer, later ones are added to it
+            self._checked_at = time.time()
+        data[self.maya_version] = {'formats': self._formats, 'compressions': compressions,
+                                   'checked_at': self._checked_at}
+
+        try:
+            path.write_atomic(self.cache_file, lambda f: json.dump(data, f))
+        except (IOError, OSError) as err:
+            logger.info("Could not store the playblast capabilities: {}".format(err))
+
+
+_capabilities = None
+
+def get_capabilities():
+    '''
+    PlayblastCapabilities of the session
+    '''
+    global _capabilities
+    if _capabilities is None:
+        _capabilities = PlayblastCapabilities()
+    return _capabilities
+
+
+def reset_capabilities():
+    '''
+    Remove the scene callbacks of the session's PlayblastCapabilities and drop it
+    '''
+    global _capabilities
+    if _capabilities is not None:
+        _capabilities.stop()
+        _capabilities = None
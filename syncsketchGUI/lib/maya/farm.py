@@ -0,0 +1,473 @@
+'''
+Headless batch capture with background mayapy workers.
+
+The scene is saved once, every camera or frame range is captured by its own
+mayapy process and the movies are joined afterwards. Workers report their
+output the same way the capture wedge subprocesses do, with a
+"__maya_capture_output: <file>" line on stdout.
+
+Command line, run with mayapy:
+    mayapy -m syncsketchGUI.lib.maya.farm capture scene.mb --cameras shot010 shot020 --output /playblasts/seq --concat
+    mayapy -m syncsketchGUI.lib.maya.farm capture scene.mb --camera persp --ranges 1-100 101-200 --workers 2
+    mayapy -m syncsketchGUI.lib.maya.farm capture scene.mb --camera shot010 --start-frame 1001 --end-frame 1400 --shards 4 --output /playblasts/shot010
+
+With --shards a single range is split into shards that are captured as png
+sequences with their raw frame numbers and encoded to one movie afterwards.
+'''
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+
+from syncsketchGUI.lib import jobs
+from syncsketchGUI.lib import path
+
+import logging
+logger = logging.getLogger("syncsketchGUI")
+
+# ======================================================================
+# Global Variables
+
+OUTPUT_MARKER = '__maya_capture_output: '
+DEFAULT_WORKERS = max(1, multiprocessing.cpu_count() // 2)
+
+# shards are captured as images and encoded once all are done
+SHARD_DEFAULTS = {
+    'format': 'image',
+    'compression': 'png',
+    'raw_frame_numbers': True,
+}
+
+# run by path, importing it through the package would start the GUI in every worker
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'farm_worker.py')
+
+# capture arguments every worker uses, the playblast can't be shown from a worker
+WORKER_DEFAULTS = {
+    'off_screen': True,
+    'viewer': False,
+    'show_ornaments': False,
+    'overwrite': True,
+}
+
+# ======================================================================
+# Module Utilities
+
+def get_mayapy():
+    '''
+    Path of the mayapy executable of the running maya
+    '''
+    executable = 'mayapy.exe' if sys.platform == 'win32' else 'mayapy'
+    if os.path.basename(sys.executable).lower().startswith('mayapy'):
+        return sys.executable
+    mayapy = os.path.join(os.path.dirname(sys.executable), executable)
+    if not os.path.isfile(mayapy):
+        raise RuntimeError('mayapy not found next to {}'.format(sys.executable))
+    return mayapy
+
+
+def get_worker_env():
+    '''
+    Environment for the workers, with syncsketchGUI importable
+    '''
+    package_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([package_root] + [p for p in [env.get('PYTHONPATH')] if p])
+    return env
+
+
+def save_scene(directory):
+    '''
+    Export the open scene once for all workers and return its path
+    '''
+    from maya import cmds
+    scene = os.path.join(directory, 'capture_farm.mb')
+    cmds.file(scene, exportAll = True, type = 'mayaBinary', preserveReferences = True, force = True)
+    return path.sanitize(scene)
+
+
+def parse_frame_range(value):
+    '''
+    Turn "1001-1100" into (1001, 1100)
+    '''
+    # the first character may be the sign of a negative start frame
+    separator = value.find('-', 1)
+    try:
+        start, end = (value[:separator], value[separator + 1:]) if separator > 0 else (value, value)
+        return int(start), int(end)
+    except ValueError:
+        raise argparse.ArgumentTypeError('Expected a frame range like 1001-1100, got {}'.format(value))
+
+
+def split_frame_range(start_frame, end_frame, shards):
+    '''
+    Split start_frame..end_frame into up to `shards` consecutive (start, end)
+    ranges of about the same length
+    '''
+    start_frame, end_frame = int(start_frame), int(end_frame)
+    if end_frame < start_frame:
+        raise ValueError('Frame range {}-{} ends before it starts'.format(start_frame, end_frame))
+
+    frame_count = end_frame - start_frame + 1
+    shards = max(1, min(int(shards), frame_count))
+    size, rest = divmod(frame_count, shards)
+    ranges = []
+    start = start_frame
+    for index in range(shards):
+        # the first shards take one frame more when the range doesn't split evenly
+        end = start + size - 1 + (1 if index < rest else 0)
+        ranges.append((start, end))
+        start = end + 1
+    return ranges
+
+
+def collect_sequence(outputs, filename):
+    '''
+    Move the frames of all shard outputs (name.####.png) into a single
+    filename.####.ext sequence and return its path
+    '''
+    sequence = None
+    for output in outputs:
+        head, ext = output.split('####', 1)
+        if sequence is None:
+            sequence = '{}.####{}'.format(filename, ext)
+        for frame_file in glob.glob('{}*{}'.format(head, ext)):
+            frame = frame_file[len(head):len(frame_file) - len(ext)]
+            if frame.isdigit():
+                shutil.move(frame_file, sequence.replace('####', frame))
+    return sequence
+
+
+def build_worker_command(mayapy, scene, item_file):
+    return [mayapy, WORKER_SCRIPT, scene, item_file]
+
+
+# ======================================================================
+# Module Classes
+
+class CaptureWorkerJob(jobs.ProcessJob):
+    '''
+    mayapy process capturing a single item, output_file is set from its
+    OUTPUT_MARKER line
+    '''
+    def __init__(self, command, item, index = 0, **job_kwargs):
+        super(CaptureWorkerJob, self).__init__(command, **job_kwargs)
+        self.item = item
+        self.index = index
+        self.output_file = None
+
+    def _handle_line(self, line):
+        super(CaptureWorkerJob, self)._handle_line(line)
+        if line.startswith('out: '):
+            logger.info('[{}] {}'.format(self.name, line[5:]))
+        if OUTPUT_MARKER in line:
+            output_file = line.split(OUTPUT_MARKER, 1)[-1].strip()
+            # capture returns None when the playblast failed
+            self.output_file = output_file if output_file != 'None' else None
+            self.set_progress(output_file = self.output_file)
+
+
+class CaptureFarm(object):
+    '''
+    Capture items on up to `workers` mayapy processes at once.
+
+    items is a list of capture() keyword dicts, each needs at least a camera
+    and a filename, preset holds the arguments shared by all items.
+    on_item_finished(job) is called for every finished worker and
+    on_finished(farm) once all are done, both from background threads.
+    '''
+    def __init__(self, items, preset = None, scene = None, workers = DEFAULT_WORKERS,
+                 mayapy = None, on_item_finished = None, on_finished = None):
+        self.items = list(items)
+        self.preset = preset or {}
+        self.scene = scene
+        self.mayapy = mayapy
+        self.on_item_finished = on_item_finished
+        self.on_finished = on_finished
+
+        self.jobs = []
+        self.tempdir = None
+        self._runner = jobs.JobRunner(workers)
+        self._remaining = len(self.items)
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    @property
+    def outputs(self):
+        '''
+        Captured files in the order of the items, None for failed items
+        '''
+        return [job.output_file if job.state == jobs.FINISHED else None for job in self.jobs]
+
+    @property
+    def failed_jobs(self):
+        return [job for job in self.jobs if job.is_done and job.state != jobs.FINISHED]
+
+    def start(self):
+        '''
+        Save the scene (if none was given) and start the workers, returns right away
+        '''
+        self.tempdir = tempfile.mkdtemp(prefix = 'syncsketch_farm_')
+        if not self.scene:
+            logger.info('Saving scene..')
+            self.scene = save_scene(self.tempdir)
+
+        mayapy = self.mayapy or get_mayapy()
+        env = get_worker_env()
+        for index, item in enumerate(self.items):
+            options = dict(self.preset)
+            options.update(item)
+            item_file = os.path.join(self.tempdir, 'item_{:04d}.json'.format(index))
+            with open(item_file, 'w') as f:
+                json.dump(options, f)
+
+            job = CaptureWorkerJob(build_worker_command(mayapy, self.scene, item_file), options, index = index, env = env,
+                                   name = '{} {}'.format(options.get('camera'), os.path.basename(options.get('filename') or '')),
+                                   on_finished = self._on_job_done,
+                                   on_error = lambda job, message: self._on_job_done(job))
+            self.jobs.append(job)
+
+        if not self.jobs:
+            self._finish()
+        for job in self.jobs:
+            self._runner.submit(job)
+        return self
+
+    def cancel(self):
+        self._runner.cancel_all()
+
+    def wait(self, timeout = None):
+        return self._done.wait(timeout)
+
+    def _on_job_done(self, job):
+        if job.state != jobs.FINISHED:
+            logger.error('Capture {} failed: {}'.format(job.name, job.error))
+        elif not job.output_file:
+            logger.error('Capture {} did not report its output'.format(job.name))
+        if self.on_item_finished:
+            self.on_item_finished(job)
+
+        with self._lock:
+            self._remaining -= 1
+            last = self._remaining == 0
+        if last:
+            self._finish()
+
+    def _finish(self):
+        # item files and the saved scene, a scene given by the caller lives elsewhere
+        if self.tempdir:
+            shutil.rmtree(self.tempdir, ignore_errors = True)
+        logger.info('Captured {} of {} items'.format(len([o for o in self.outputs if o]), len(self.items)))
+        try:
+            if self.on_finished:
+                self.on_finished(self)
+        finally:
+            self._done.set()
+
+
+class ShardedCapture(object):
+    '''
+    Capture one camera's frame range split into shards, every shard on its
+    own mayapy worker, and encode the frames into a single movie.
+
+    The frames keep their scene numbers, the movie starts at start_frame so
+    first_frame and last_frame of the upload match the scene.
+    on_finished(sharded) is called from a background thread once the movie
+    is written or the capture failed, output_file is None in that case and
+    error holds the reason.
+    '''
+    def __init__(self, camera, start_frame, end_frame, filename, shards = DEFAULT_WORKERS,
+                 preset = None, scene = None, workers = None, mayapy = None,
+                 framerate = None, on_finished = None):
+        self.camera = camera
+        self.start_frame = int(start_frame)
+        self.end_frame = int(end_frame)
+        self.filename = filename
+        self.ranges = split_frame_range(start_frame, end_frame, shards)
+        self.preset = dict(preset or {})
+        self.scene = scene
+        self.workers = workers or len(self.ranges)
+        self.mayapy = mayapy
+        self.framerate = framerate
+        self.on_finished = on_finished
+
+        self.farm = None
+        self.encode_job = None
+        self.output_file = None
+        self.error = None
+        self.framedir = None
+        self._done = threading.Event()
+
+    def start(self):
+        '''
+        Start capturing the shards, returns right away
+        '''
+        # next to the movie, so the frames are moved and not copied
+        directory = os.path.dirname(os.path.abspath(self.filename))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.framedir = tempfile.mkdtemp(prefix = 'syncsketch_shards_', dir = directory)
+
+        name = os.path.basename(self.filename)
+        items = []
+        for index, (start_frame, end_frame) in enumerate(self.ranges):
+            items.append({
+                'camera': self.camera,
+                'start_frame': start_frame,
+                'end_frame': end_frame,
+                'filename': path.sanitize(os.path.join(self.framedir, 'shard_{:03d}'.format(index), name)),
+            })
+
+        preset = dict(self.preset)
+        preset.update(SHARD_DEFAULTS)
+        logger.info('Capturing {}-{} of {} in {} shards'.format(self.start_frame, self.end_frame, self.camera, len(items)))
+        self.farm = CaptureFarm(items, preset = preset, scene = self.scene, workers = self.workers,
+                                mayapy = self.mayapy, on_finished = self._encode)
+        self.farm.start()
+        return self
+
+    def cancel(self):
+        if self.farm:
+            self.farm.cancel()
+        if self.encode_job:
+            self.encode_job.cancel()
+
+    def wait(self, timeout = None):
+        return self._done.wait(timeout)
+
+    def _encode(self, farm):
+        outputs = farm.outputs
+        if not outputs or not all(outputs):
+            self._finish('{} of {} shards failed'.format(len([o for o in outputs if not o]), len(outputs)))
+            return
+
+        from syncsketchGUI.lib import video
+        sequence = collect_sequence(outputs, os.path.join(self.framedir, os.path.basename(self.filename)))
+        frame_count = video.count_sequence_frames(sequence)
+        expected = self.end_frame - self.start_frame + 1
+        if frame_count != expected:
+            # image2 stops at the first missing frame
+            self._finish('Expected {} frames, the shards wrote {}'.format(expected, frame_count))
+            return
+
+        output_file = '{}.mov'.format(self.filename)
+        self.encode_job = video.encodeToH264MovAsync(
+            sequence, output_file, start_number = self.start_frame, framerate = self.framerate,
+            on_finished = lambda job: self._finish(output_file = video.get_encoded_file(job, sequence, output_file)),
+            on_error = lambda job, message: self._finish('Encoding failed: {}'.format(message)))
+
+    def _finish(self, error = None, output_file = None):
+        self.error = error
+        self.output_file = output_file
+        if error:
+            logger.error('Sharded capture of {} failed: {}'.format(self.camera, error))
+        # a failed capture keeps the frames around to look into
+        if self.framedir and not error:
+            shutil.rmtree(self.framedir, ignore_errors = True)
+        try:
+            if self.on_finished:
+                self.on_finished(self)
+        finally:
+            self._done.set()
+
+
+# ======================================================================
+# Command Line
+
+def _build_items(args):
+    cameras = args.cameras or [args.camera]
+    ranges = args.ranges or [(args.start_frame, args.end_frame)]
+    items = []
+    for camera in cameras:
+        for start_frame, end_frame in ranges:
+            name = camera.split('|')[-1].split(':')[-1]
+            if len(ranges) > 1:
+                name = '{}_{}-{}'.format(name, start_frame, end_frame)
+            item = {'camera': camera, 'filename': '{}_{}'.format(args.output, name)}
+            if start_frame is not None:
+                item['start_frame'] = start_frame
+            if end_frame is not None:
+                item['end_frame'] = end_frame
+            items.append(item)
+    return items
+
+
+def _sharded_command(args, preset):
+    if args.cameras or args.ranges or args.start_frame is None or args.end_frame is None:
+        print('--shards needs a single --camera and --start-frame/--end-frame')
+        return 1
+
+    sharded = ShardedCapture(args.camera, args.start_frame, args.end_frame, args.output, shards = args.shards,
+                             preset = preset, scene = path.sanitize(os.path.abspath(args.scene)),
+                             workers = args.workers, mayapy = args.mayapy or sys.executable,
+                             framerate = args.framerate)
+    sharded.start().wait()
+    print('{}: {}'.format(args.camera, sharded.output_file or 'FAILED'))
+    return 0 if sharded.output_file else 1
+
+
+def _capture_command(args):
+    preset = {'format': args.format, 'compression': args.compression}
+    if args.width:
+        preset['width'] = args.width
+    if args.height:
+        preset['height'] = args.height
+
+    if args.shards:
+        return _sharded_command(args, preset)
+
+    farm = CaptureFarm(_build_items(args), preset = preset, scene = path.sanitize(os.path.abspath(args.scene)),
+                       workers = args.workers, mayapy = args.mayapy or sys.executable)
+    farm.start().wait()
+
+    outputs = farm.outputs
+    for item, output in zip(farm.items, outputs):
+        print('{}: {}'.format(item['camera'], output or 'FAILED'))
+
+    if args.concat and all(outputs):
+        from syncsketchGUI.lib import video
+        output_file = '{}.mov'.format(args.output)
+        job = video.concatMoviesAsync(outputs, output_file)
+        job.wait()
+        print('joined: {}'.format(video.get_encoded_file(job, outputs[0], output_file)))
+
+    return 1 if farm.failed_jobs or not all(outputs) else 0
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(prog = 'syncsketchGUI.lib.maya.farm',
+                                     description = 'Capture playblasts with background mayapy workers')
+    subparsers = parser.add_subparsers(dest = 'command')
+
+    capture_parser = subparsers.add_parser('capture', help = 'capture cameras or frame ranges of a saved scene')
+    capture_parser.add_argument('scene', help = 'maya scene to capture')
+    capture_parser.add_argument('--output', required = True, help = 'output path without extension, camera names are appended')
+    capture_parser.add_argument('--camera', default = 'persp', help = 'camera used with --ranges')
+    capture_parser.add_argument('--cameras', nargs = '+', help = 'capture every camera on its own worker')
+    capture_parser.add_argument('--ranges', nargs = '+', type = parse_frame_range, help = 'frame ranges like 1001-1100')
+    capture_parser.add_argument('--start-frame', type = int)
+    capture_parser.add_argument('--end-frame', type = int)
+    capture_parser.add_argument('--workers', type = int, default = DEFAULT_WORKERS)
+    capture_parser.add_argument('--width', type = int)
+    capture_parser.add_argument('--height', type = int)
+    capture_parser.add_argument('--format', default = 'qt')
+    capture_parser.add_argument('--compression', default = 'H.264')
+    capture_parser.add_argument('--concat', action = 'store_true', help = 'join all outputs into <output>.mov')
+    capture_parser.add_argument('--shards', type = int, help = 'split the frame range into shards encoded to <output>.mov')
+    capture_parser.add_argument('--framerate', type = float, help = 'frame rate of the sharded movie')
+    capture_parser.add_argument('--mayapy', help = 'mayapy used for the workers, defaults to the running one')
+
+    args = parser.parse_args(argv)
+    if args.command == 'capture':
+        logging.basicConfig(level = logging.INFO)
+        return _capture_command(args)
+    parser.print_help()
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
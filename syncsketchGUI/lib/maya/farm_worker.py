@@ -0,0 +1,65 @@
+'''
+Entry point of a capture farm worker, started by path with mayapy:
+    mayapy farm_worker.py <scene> <item_file>
+
+The worker doesn't import the syncsketchGUI package the usual way, its
+__init__ sets up the GUI (login, shelf, menu) which a headless mayapy has no
+use for and which must not run before maya.standalone is initialized. The
+package is registered bare instead, only the modules the capture needs are
+imported once Maya is up.
+'''
+import json
+import os
+import sys
+import types
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+
+def _register_package():
+    '''
+    Make syncsketchGUI importable without running its __init__
+    '''
+    # python puts the script's folder first, its modules must not shadow anything
+    script_folder = os.path.dirname(os.path.abspath(__file__))
+    sys.path[:] = [p for p in sys.path if os.path.abspath(p or os.curdir) != script_folder]
+    if PACKAGE_ROOT not in sys.path:
+        sys.path.insert(0, PACKAGE_ROOT)
+
+    if 'syncsketchGUI' not in sys.modules:
+        package = types.ModuleType('syncsketchGUI')
+        package.__path__ = [os.path.join(PACKAGE_ROOT, 'syncsketchGUI')]
+        sys.modules['syncsketchGUI'] = package
+
+
+def run_worker(scene, item_file):
+    '''
+    Capture a single item
+    '''
+    from maya import standalone
+    standalone.initialize()
+
+    _register_package()
+    from maya import cmds
+    from syncsketchGUI.lib.maya import farm
+    from syncsketchGUI.vendor.capture import capture
+
+    with open(item_file) as f:
+        item = json.load(f)
+
+    print('out: Opening {}'.format(scene))
+    cmds.file(scene, open = True, force = True)
+
+    options = dict(item)
+    options.update(farm.WORKER_DEFAULTS)
+    output = capture.capture(**options)
+
+    print('{}{}'.format(farm.OUTPUT_MARKER, output))
+    sys.stdout.flush()
+    standalone.uninitialize()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        sys.exit('usage: mayapy farm_worker.py <scene> <item_file>')
+    run_worker(sys.argv[1], sys.argv[2])
@@ -312,7 +312,7 @@ def refresh_menu_state():
     If before_login is the given state, some parts of the menu will be greyed out.
     If after_login, all parts of the menu will be enabled and accessible.
     '''
-    current_user = user.SyncSketchUser()
+    current_user = user.get_current_user()
     username = current_user.get_name()
 
     login_info = 'Currently not logged in'
@@ -19,6 +19,8 @@ from maya import mel
 
 from syncsketchGUI.lib import database
 from syncsketchGUI.lib import path
+from syncsketchGUI.lib import presets
+from syncsketchGUI.lib.maya import capabilities
 from syncsketchGUI.vendor.capture import capture
 
 import logging
@@ -28,31 +30,50 @@ logger = logging.getLogger("syncsketchGUI")
 
 GREASE_PENCIL_XML = 'greasePencil.xml'
 
+# capture panels reused by the recordings of the session
+_capture_pool = None
+
 # ======================================================================
 # Module Functions
 
+def get_capture_pool():
+    '''
+    CapturePanelPool the recordings of the session take their capture panel from,
+    consecutive recordings reuse the panel instead of building a new window each time
+    '''
+    global _capture_pool
+    if _capture_pool is None:
+        _capture_pool = capture.CapturePanelPool()
+    return _capture_pool
+
+
+def close_capture_pool():
+    '''
+    Delete the pooled capture panels, e.g. before a reload
+    '''
+    global _capture_pool
+    if _capture_pool is not None:
+        _capture_pool.close()
+        _capture_pool = None
+
+
 def get_available_compressions(format = None):
     '''
     Get currently available compression formats in maya
     '''
-    if not format:
-        if sys.platform == 'darwin':
-            format = 'qt'
-        elif sys.platform == 'linux2':
-            format = 'movie'
-        elif sys.platform == 'win32':
-            format = 'avi'
-        else:
-            format = 'movie'
-
-    mel_command = 'playblast -format "{}" -query -compression'.format(format)
-    return mel.eval(mel_command)
+    return capabilities.get_capabilities().compressions(format)
 
 def get_available_formats():
-    return cmds.playblast(query=True, format=True)
+    return capabilities.get_capabilities().formats()
 
 def get_available_cameras():
-    return cmds.listCameras()
+    return capabilities.get_capabilities().cameras()
+
+def validate_format_preset(preset):
+    '''
+    Reasons the format preset can't be recorded, empty if it can
+    '''
+    return capabilities.get_capabilities().validate_preset(preset)
 
 def confirm_overwrite_dialogue(message):
     result = cmds.confirmDialog(title='Confirm Overwrite',
@@ -362,12 +383,7 @@ def playblast_with_settings( viewport_preset = None, viewport_preset_yaml = None
     '''
 
     # get default viewport preset config
-    if viewport_preset and viewport_preset_yaml:
-        cache_file = path.get_config_yaml(viewport_preset_yaml)
-        viewportArgs = database.read_cache(viewport_preset, cache_file)
-    else:
-        viewportArgs = {}
-
+    viewportArgs = get_viewport_args(viewport_preset, viewport_preset_yaml)
 
     # process filenames
     filepath = recArgs["filename"]
@@ -391,7 +407,8 @@ def playblast_with_settings( viewport_preset = None, viewport_preset_yaml = None
 
     logger.info("viewport_options: {}".format(viewport_options))
 
-    playblast_file = capture.capture(**viewport_options)
+    with get_capture_pool().activated():
+        playblast_file = capture.capture(**viewport_options)
 
     if playblast_file:
         playblast_file = add_extension(playblast_file, recArgs)
@@ -404,6 +421,107 @@ def playblast_with_settings( viewport_preset = None, viewport_preset_yaml = None
         logger.info("playblast_with_settings failed")
 
 
+def get_viewport_args(viewport_preset = None, viewport_preset_yaml = None):
+    if viewport_preset and viewport_preset_yaml:
+        preset = presets.get_viewport_presets(viewport_preset_yaml).get(viewport_preset)
+        return preset.to_dict() if preset else {}
+    return {}
+
+
+def get_sequencer_shots():
+    '''
+    Get the shots of the camera sequencer as a list of dicts with
+    name, camera, start_frame and end_frame, ordered by start frame
+    '''
+    shots = []
+    for shot in cmds.ls(type='shot') or []:
+        shots.append({
+            'name': shot,
+            'camera': cmds.shot(shot, query=True, currentCamera=True),
+            'start_frame': cmds.shot(shot, query=True, startTime=True),
+            'end_frame': cmds.shot(shot, query=True, endTime=True),
+        })
+    return sorted(shots, key=lambda shot: shot['start_frame'])
+
+
+def get_shot_filepath(filepath, shot):
+    '''
+    Filepath (without extension) of a single shot of a batch playblast
+    '''
+    if shot.get('filename'):
+        return path.sanitize(shot['filename'])
+    name = shot.get('name') or shot['camera'].split('|')[-1].split(':')[-1]
+    return path.sanitize('{}_{}'.format(filepath, name))
+
+
+def playblast_batch(shots, viewport_preset = None, viewport_preset_yaml = None, on_captured = None, **recArgs):
+    '''
+    Playblast several cameras/shots in turn.
+    shots is a list of dicts with camera and optionally name, filename, start_frame
+    and end_frame, missing frames fall back to the ones in recArgs.
+    The capture panel is created and the viewport preset applied once for all shots.
+    on_captured(shot, playblast_file) is called after every shot, so encodes and
+    uploads can run while the next shot is captured.
+    Returns a list of (shot, playblast_file) for the shots that were recorded.
+    '''
+    viewportArgs = get_viewport_args(viewport_preset, viewport_preset_yaml)
+
+    filepath = recArgs.get("filename")
+    if not filepath:
+        filepath = path.get_default_playblast_folder()
+    filepath = path.sanitize(filepath)
+
+    shot_filepaths = [get_shot_filepath(filepath, shot) for shot in shots]
+    existing = [f for f in shot_filepaths if is_file_on_disk(add_extension(f, recArgs))]
+    if existing and not recArgs.get("force_overwrite"):
+        message = '{} of the {} playblasts already exist.\nDo you want to replace them?'.format(len(existing), len(shots))
+        if not confirm_overwrite_dialogue(message) == 'yes':
+            return []
+
+    recArgs["show_ornaments"] = False
+    recArgs["viewer"] = False
+
+    # panel wide options are applied once by the capture session
+    session_keys = ['display_options', 'viewport_options', 'viewport2_options']
+    session_options = dict((key, viewportArgs.get(key)) for key in session_keys)
+    shot_options = dict((key, value) for key, value in viewportArgs.items() if key not in session_keys)
+    shot_options.update(recArgs)
+
+    recorded = []
+    with get_capture_pool().activated(), \
+            capture.capture_session(width = recArgs.get('width'),
+                                    height = recArgs.get('height'),
+                                    off_screen = recArgs.get('off_screen', False),
+                                    **session_options) as panel:
+        for shot, shot_filepath in zip(shots, shot_filepaths):
+            options = dict(shot_options)
+            options["camera"] = shot['camera']
+            options["start_frame"] = shot.get('start_frame', recArgs.get('start_frame'))
+            options["end_frame"] = shot.get('end_frame', recArgs.get('end_frame'))
+            options["filename"] = shot_filepath
+            logger.info("Recording {} from {} to {}".format(shot['camera'], options["start_frame"], options["end_frame"]))
+
+            playblast_file = capture.capture(panel = panel, **options)
+            if not playblast_file:
+                logger.info("Recording {} failed".format(shot['camera']))
+                continue
+
+            playblast_file = add_extension(playblast_file, recArgs)
+            recorded.append((shot, playblast_file))
+            if on_captured:
+                on_captured(shot, playblast_file)
+
+    if recorded:
+        shot, playblast_file = recorded[-1]
+        last_recorded = dict(recArgs, filename = playblast_file,
+                             start_frame = shot.get('start_frame', recArgs.get('start_frame')),
+                             end_frame = shot.get('end_frame', recArgs.get('end_frame')))
+        database.save_last_recorded(last_recorded)
+        database.dump_cache({"last_recorded_selection": playblast_file})
+    logger.info('Recorded {} of {} shots'.format(len(recorded), len(shots)))
+    return recorded
+
+
 def playblast(filepath = None, width = 1280, height = 720, start_frame = 0, end_frame = 0, view_afterward = False, force_overwrite=False):
     '''
     Playblast with the pre-defined settings based on the user's OS
@@ -539,7 +657,8 @@ def new_viewport_preset(cache_file, preset_name=None, source_preset=None, panel=
 
 # apply preset to panel
 def apply_viewport_preset(cache_file, presetName, panels=[]):
-    options = database.read_cache(presetName, cache_file)
+    preset = presets.get_viewport_presets(cache_file).get(presetName)
+    options = preset.to_dict() if preset else None
     if not options:
         logger.info("No preset found")
         return
@@ -550,12 +669,14 @@ def apply_viewport_preset(cache_file, presetName, panels=[]):
         logger.info("Applies preset %s to modelpanel %s"%(presetName,panel))
 
 
-def screenshot_current_editor(cache_file, presetName, panel=None, camera=None):
+def screenshot_current_editor(cache_file, presetName, panel=None, camera=None, pool=None):
     # Nice little screentshot function from BigRoy
+    # pool is a capture.CapturePanelPool to take the capture panel from
     if not panel:
         panel = get_active_editor()
 
-    options = database.read_cache(presetName, cache_file)
+    preset = presets.get_viewport_presets(cache_file).get(presetName)
+    options = preset.to_dict() if preset else None
     if not options:
         logger.info("No preset found")
         return
@@ -581,7 +702,11 @@ def screenshot_current_editor(cache_file, presetName, panel=None, camera=None):
         if camera:
             options['camera'] = camera
 
-        fname = capture.snap(**options)
+        if pool:
+            with pool.activated():
+                fname = capture.snap(**options)
+        else:
+            fname = capture.snap(**options)
 
         if not fname:
             logger.warning("Preview failed")
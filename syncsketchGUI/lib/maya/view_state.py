@@ -0,0 +1,500 @@
+'''
+Diff based application of viewport presets.
+
+Applying a preset the plain way sends one displayPref, setAttr or modelEditor
+command per option, well over a hundred commands even when the panel already
+looks like the preset. A ViewState reads the current value of every option of
+the preset once, compares and only sends what differs: the display
+preferences in one displayPref call, all model editor flags in one modelEditor
+call and one setAttr per changed camera or viewport 2.0 attribute.
+
+apply() returns the previous values of what it changed, applying those again
+restores the panel, which is what applied() does when its context ends.
+
+Reading is batched too. The queries of a set of options are compiled into
+one MEL procedure, defined once per set, so a snapshot of a panel is a single
+mel.eval instead of one command per option. Snapshots are immutable
+ViewSnapshot mappings that compare and hash by their option values. The list
+of plugin display filters is kept until a plugin is loaded or unloaded.
+
+The cmds module is passed in, tests can hand a fake one.
+'''
+import contextlib
+import itertools
+import numbers
+import re
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+import logging
+logger = logging.getLogger("syncsketchGUI")
+
+# ======================================================================
+# Global Variables
+
+DISPLAY_OPTIONS = 'display_options'
+CAMERA_OPTIONS = 'camera_options'
+VIEWPORT_OPTIONS = 'viewport_options'
+VIEWPORT2_OPTIONS = 'viewport2_options'
+
+CATEGORIES = (DISPLAY_OPTIONS, CAMERA_OPTIONS, VIEWPORT_OPTIONS, VIEWPORT2_OPTIONS)
+
+# display options set with displayRGBColor instead of displayPref
+DISPLAY_RGB_OPTIONS = frozenset(['background', 'backgroundTop', 'backgroundBottom'])
+
+VIEWPORT2_NODE = 'hardwareRenderingGlobals'
+
+# floats read back from maya differ from the preset in the last digits
+FLOAT_TOLERANCE = 1e-5
+# decimals floats are rounded to when snapshots are compared and hashed
+FLOAT_DIGITS = 5
+
+# what a batched query returns for an option it couldn't read
+UNAVAILABLE = '<unavailable>'
+
+FLAG_PATTERN = re.compile(r'^\w+$')
+
+# ======================================================================
+# Module Utilities
+
+def values_equal(a, b):
+    '''
+    Compare option values the way maya stores them, lists equal tuples and floats are rounded
+    '''
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        # colors are queried as a list holding one tuple, e.g. [(0.5, 0.5, 0.5)]
+        if len(a) == 1 and isinstance(a[0], (list, tuple)):
+            a = a[0]
+        if len(b) == 1 and isinstance(b[0], (list, tuple)):
+            b = b[0]
+        return len(a) == len(b) and all(values_equal(x, y) for x, y in zip(a, b))
+    if isinstance(a, numbers.Number) and isinstance(b, numbers.Number):
+        return abs(a - b) <= FLOAT_TOLERANCE
+    return a == b
+
+
+def diff(current, target):
+    '''
+    Options of target whose value differs from current, options current
+    couldn't read are left out
+    '''
+    changes = {}
+    for category in CATEGORIES:
+        values = current.get(category) or {}
+        changed = dict((key, value) for key, value in (target.get(category) or {}).items()
+                       if key in values and not values_equal(values[key], value))
+        if changed:
+            changes[category] = changed
+    return changes
+
+
+def count_changes(changes):
+    return sum(len(changes.get(category) or {}) for category in CATEGORIES)
+
+
+def freeze_value(value):
+    '''
+    Hashable form of an option value, lists become tuples and floats are rounded
+    '''
+    if isinstance(value, (list, tuple)):
+        if len(value) == 1 and isinstance(value[0], (list, tuple)):
+            value = value[0]
+        return tuple(freeze_value(item) for item in value)
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, numbers.Number):
+        return round(float(value), FLOAT_DIGITS)
+    return value
+
+
+def value_kind(value):
+    '''
+    How an option like value is queried in MEL, None if it can't be batched
+    '''
+    if isinstance(value, bool):
+        return 'bool'
+    if isinstance(value, numbers.Number):
+        return 'number'
+    if isinstance(value, str) or isinstance(value, type(u'')):
+        return 'string'
+    if isinstance(value, (list, tuple)):
+        return 'array'
+    return None
+
+
+def _mel_string(value):
+    return '"{}"'.format(value.replace('\\', '\\\\').replace('"', '\\"'))
+
+
+def _parse_mel_value(result, kind, template):
+    if kind == 'string':
+        return result
+    if kind == 'array':
+        return [float(item) for item in result.split()]
+    number = float(result)
+    if kind == 'bool':
+        return bool(number)
+    if isinstance(template, int) and number.is_integer():
+        return int(number)
+    return number
+
+
+# ======================================================================
+# Module Classes
+
+class FrozenOptions(Mapping):
+    '''
+    Read-only options of one category
+    '''
+    __slots__ = ('_values', '_key')
+
+    def __init__(self, values = None):
+        self._values = dict((key, tuple(value) if isinstance(value, list) else value)
+                            for key, value in (values or {}).items())
+        self._key = frozenset((key, freeze_value(value)) for key, value in self._values.items())
+
+    def __getitem__(self, key):
+        value = self._values[key]
+        return list(value) if isinstance(value, tuple) else value
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __eq__(self, other):
+        if isinstance(other, FrozenOptions):
+            return self._key == other._key
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self):
+        return hash(self._key)
+
+    def to_dict(self):
+        return dict((key, list(value) if isinstance(value, (list, tuple)) else value)
+                    for key, value in self._values.items())
+
+
+class ViewSnapshot(Mapping):
+    '''
+    Immutable state of a panel, shaped like the dict of capture.parse_view.
+    Snapshots are equal when their options are, the camera isn't compared.
+    '''
+    __slots__ = ('camera', '_categories')
+
+    def __init__(self, camera = None, **options):
+        object.__setattr__(self, 'camera', camera)
+        object.__setattr__(self, '_categories', dict((category, FrozenOptions(options.get(category)))
+                                                     for category in CATEGORIES))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ViewSnapshot is immutable")
+
+    def __getattr__(self, name):
+        if name in CATEGORIES:
+            return self._categories[name]
+        raise AttributeError(name)
+
+    def __getitem__(self, key):
+        if key == 'camera':
+            return self.camera
+        return self._categories[key]
+
+    def __iter__(self):
+        return itertools.chain(['camera'], CATEGORIES)
+
+    def __len__(self):
+        return len(CATEGORIES) + 1
+
+    def __eq__(self, other):
+        if isinstance(other, ViewSnapshot):
+            return self._categories == other._categories
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self):
+        return hash(tuple(self._categories[category] for category in CATEGORIES))
+
+    def __repr__(self):
+        return '<ViewSnapshot {} {} options>'.format(self.camera, sum(len(values) for values in self._categories.values()))
+
+    def diff(self, target):
+        '''
+        Options of target that differ from this snapshot
+        '''
+        return diff(self, target)
+
+    def to_dict(self):
+        data = dict((category, values.to_dict()) for category, values in self._categories.items())
+        data['camera'] = self.camera
+        return data
+
+
+class ViewState(object):
+    '''
+    Reads, compares and applies the view options of model panels
+    '''
+    def __init__(self, cmds = None, mel = None):
+        # plugin loads are only watched in maya, a fake cmds gets invalidate_plugin_filters()
+        self.watch_plugins = cmds is None
+        if cmds is None:
+            from maya import cmds, mel
+        self.cmds = cmds
+        # without mel every option is queried with its own command
+        self.mel = mel
+        self._plugins = None
+        self._callbacks = []
+        self._procedures = {}
+
+    def plugin_filters(self):
+        '''
+        Names of the plugin display filters, listed again after a plugin was loaded or unloaded
+        '''
+        plugins = self._plugins
+        if plugins is None:
+            plugins = frozenset(str(name) for name in self.cmds.pluginDisplayFilter(query = True, listFilters = True) or [])
+            if self._watch_plugins():
+                self._plugins = plugins
+        return plugins
+
+    def invalidate_plugin_filters(self, *args):
+        self._plugins = None
+
+    def stop(self):
+        from maya import OpenMaya as om
+        for callback_id in self._callbacks:
+            om.MMessage.removeCallback(callback_id)
+        self._callbacks = []
+
+    def snapshot(self, panel, templates, plugins = None):
+        '''
+        ViewSnapshot of the options in templates, e.g. the capture defaults,
+        and of all plugin display filters
+        '''
+        plugins = self.plugin_filters() if plugins is None else plugins
+        options = dict(templates)
+        # built-in flags win over plugin display filters named like them
+        viewport = dict((name, False) for name in plugins)
+        viewport.update(templates.get(VIEWPORT_OPTIONS) or {})
+        options[VIEWPORT_OPTIONS] = viewport
+        return self.read(panel, options, plugins)
+
+    def read(self, panel, options, plugins = None):
+        '''
+        ViewSnapshot of the current values of the options named in options
+        '''
+        plugins = self.plugin_filters() if plugins is None else plugins
+        camera = self.cmds.modelPanel(panel, query = True, camera = True)
+
+        queries = []
+        for category in CATEGORIES:
+            for key, template in (options.get(category) or {}).items():
+                plugin = category == VIEWPORT_OPTIONS and key in plugins
+                queries.append((category, key, value_kind(template), plugin, template))
+
+        # options of unknown type or with odd names are queried on their own
+        batched, unread = [], []
+        for query in queries:
+            category, key, kind, plugin, template = query
+            (batched if kind and (plugin or FLAG_PATTERN.match(key)) else unread).append(query)
+
+        values = dict((category, {}) for category in CATEGORIES)
+        if batched and self.mel:
+            unread += self._read_batch(panel, camera, batched, values)
+        else:
+            unread += batched
+
+        for category, key, kind, plugin, template in unread:
+            try:
+                values[category][key] = self._read_value(panel, camera, category, key, plugin)
+            except (RuntimeError, TypeError, ValueError) as err:
+                logger.debug("Skipping {} {}: {}".format(category, key, err))
+        return ViewSnapshot(camera, **values)
+
+    def _read_value(self, panel, camera, category, key, plugin):
+        cmds = self.cmds
+        if category == DISPLAY_OPTIONS:
+            if key in DISPLAY_RGB_OPTIONS:
+                return cmds.displayRGBColor(key, query = True)
+            return cmds.displayPref(query = True, **{key: True})
+        if category == CAMERA_OPTIONS:
+            return cmds.getAttr('{}.{}'.format(camera, key))
+        if category == VIEWPORT_OPTIONS:
+            if plugin:
+                return cmds.modelEditor(panel, query = True, queryPluginObjects = key)
+            return cmds.modelEditor(panel, query = True, **{key: True})
+        return cmds.getAttr('{}.{}'.format(VIEWPORT2_NODE, key))
+
+    def _read_batch(self, panel, camera, queries, values):
+        '''
+        Read queries with one MEL call into values, returns the queries that couldn't be read
+        '''
+        try:
+            procedure = self._procedure(queries)
+            results = self.mel.eval('{}({}, {})'.format(procedure, _mel_string(panel), _mel_string(camera or '')))
+        except RuntimeError as err:
+            logger.debug("Batched view query failed: {}".format(err))
+            return queries
+        if not results or len(results) != len(queries):
+            return queries
+
+        unread = []
+        for query, result in zip(queries, results):
+            category, key, kind, plugin, template = query
+            try:
+                if result == UNAVAILABLE:
+                    raise ValueError(result)
+                values[category][key] = _parse_mel_value(result, kind, template)
+            except ValueError:
+                unread.append(query)
+        return unread
+
+    def _procedure(self, queries):
+        '''
+        Name of the MEL procedure reading queries, defined on first use
+        '''
+        signature = tuple(query[:4] for query in queries)
+        if signature in self._procedures:
+            return self._procedures[signature]
+
+        name = 'syncsketchQueryView{}'.format(next(_procedure_ids))
+        lines = ['global proc string[] {}(string $panel, string $camera)'.format(name),
+                 '{',
+                 '    string $r[]; float $f; string $s; float $a[]; float $x; string $j;']
+        for index, (category, key, kind, plugin) in enumerate(signature):
+            if category == DISPLAY_OPTIONS:
+                command = ('displayRGBColor -q {}'.format(_mel_string(key)) if key in DISPLAY_RGB_OPTIONS
+                           else 'displayPref -q -{}'.format(key))
+            elif category == CAMERA_OPTIONS:
+                command = 'getAttr ($camera + ".{}")'.format(key)
+            elif category == VIEWPORT_OPTIONS:
+                command = ('modelEditor -q -queryPluginObjects {} $panel'.format(_mel_string(key)) if plugin
+                           else 'modelEditor -q -{} $panel'.format(key))
+            else:
+                command = 'getAttr "{}.{}"'.format(VIEWPORT2_NODE, key)
+
+            if kind == 'array':
+                lines.append('    if (catchQuiet($a = `{}`)) $r[{}] = "{}"; '
+                             'else {{ $j = ""; for ($x in $a) $j += $x + " "; $r[{}] = $j; }}'.format(
+                                 command, index, UNAVAILABLE, index))
+            else:
+                variable = '$s' if kind == 'string' else '$f'
+                lines.append('    if (catchQuiet({} = `{}`)) $r[{}] = "{}"; else $r[{}] = {};'.format(
+                    variable, command, index, UNAVAILABLE, index, variable))
+        lines += ['    return $r;', '}']
+
+        self.mel.eval('\n'.join(lines))
+        self._procedures[signature] = name
+        return name
+
+    def _watch_plugins(self):
+        '''
+        True while plugin loads are watched and the filters may be cached
+        '''
+        if not self.watch_plugins:
+            return True
+        if self._callbacks:
+            return True
+        from maya import OpenMaya as om
+        try:
+            self._callbacks = [
+                om.MSceneMessage.addStringArrayCallback(om.MSceneMessage.kAfterPluginLoad, self.invalidate_plugin_filters),
+                om.MSceneMessage.addStringArrayCallback(om.MSceneMessage.kAfterPluginUnload, self.invalidate_plugin_filters),
+            ]
+        except RuntimeError as err:
+            logger.warning("Can't watch plugin loads: {}".format(err))
+            self.stop()
+        return bool(self._callbacks)
+
+    def write(self, panel, changes, camera = None, plugins = None):
+        '''
+        Set the changed options with as few commands as possible
+        '''
+        cmds = self.cmds
+        display = changes.get(DISPLAY_OPTIONS) or {}
+        for key, value in display.items():
+            if key in DISPLAY_RGB_OPTIONS:
+                if len(value) == 1 and isinstance(value[0], (list, tuple)):
+                    value = value[0]
+                cmds.displayRGBColor(key, *value)
+        preferences = dict((key, value) for key, value in display.items() if key not in DISPLAY_RGB_OPTIONS)
+        if preferences:
+            cmds.displayPref(**preferences)
+
+        camera_options = changes.get(CAMERA_OPTIONS) or {}
+        if camera_options:
+            camera = camera or cmds.modelPanel(panel, query = True, camera = True)
+            for key, value in camera_options.items():
+                cmds.setAttr('{}.{}'.format(camera, key), value)
+
+        viewport = changes.get(VIEWPORT_OPTIONS) or {}
+        if viewport:
+            plugins = self.plugin_filters() if plugins is None else plugins
+            flags = dict((key, value) for key, value in viewport.items() if key not in plugins)
+            if flags:
+                cmds.modelEditor(panel, edit = True, **flags)
+            # plugin display filters share the multi-use pluginObjects flag
+            plugin_objects = [(key, value) for key, value in viewport.items() if key in plugins]
+            if plugin_objects:
+                cmds.modelEditor(panel, edit = True, pluginObjects = plugin_objects)
+
+        for key, value in (changes.get(VIEWPORT2_OPTIONS) or {}).items():
+            cmds.setAttr('{}.{}'.format(VIEWPORT2_NODE, key), value)
+
+    def apply(self, panel, options):
+        '''
+        Apply what differs from options, returns the previous values of the changed options
+        '''
+        plugins = self.plugin_filters() if options.get(VIEWPORT_OPTIONS) else frozenset()
+        current = self.read(panel, options, plugins)
+        changes = diff(current, options)
+        self.write(panel, changes, current['camera'], plugins)
+        logger.debug("Changed {} view options of {}".format(count_changes(changes), panel))
+        return dict((category, dict((key, current[category][key]) for key in changed))
+                    for category, changed in changes.items())
+
+    @contextlib.contextmanager
+    def applied(self, panel, restore = CATEGORIES, **options):
+        '''
+        Apply options during the context, the categories in restore are set
+        back afterwards, e.g. not the model editor of a panel about to be deleted
+        '''
+        previous = self.apply(panel, options)
+        try:
+            yield
+        finally:
+            self.write(panel, dict((category, values) for category, values in previous.items() if category in restore))
+
+
+_procedure_ids = itertools.count(1)
+_view_state = None
+
+def get_view_state():
+    '''
+    ViewState of the maya session
+    '''
+    global _view_state
+    if _view_state is None:
+        _view_state = ViewState()
+    return _view_state
+
+
+def reset_view_state():
+    '''
+    Remove the plugin callbacks of the session's ViewState and drop it
+    '''
+    global _view_state
+    if _view_state is not None:
+        _view_state.stop()
+        _view_state = None
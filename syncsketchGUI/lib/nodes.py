@@ -0,0 +1,125 @@
+'''
+Compact records for the accounts, projects, reviews and media of the browser.
+
+Only the fields the plugin reads are kept, in __slots__, and strings that
+repeat a lot (types, uuids) are interned. The records answer get() and []
+like the server dicts they replace, so code reading tree item data keeps
+working with either.
+'''
+import sys
+
+# ======================================================================
+# Module Utilities
+
+if sys.version_info[0] >= 3:
+    _intern = sys.intern
+else:
+    _intern = intern
+
+
+def intern_string(value):
+    '''
+    Shared copy of a string, other values are returned as they are
+    '''
+    if isinstance(value, str):
+        return _intern(value)
+    return value
+
+
+# ======================================================================
+# Module Classes
+
+class Node(object):
+    '''
+    Base record, subclasses list their fields in __slots__
+    '''
+    __slots__ = ('id', 'name', 'description')
+    kind = None
+
+    # fields whose values repeat across many nodes
+    INTERNED = ()
+
+    # all slots of the class, set for every class below
+    FIELDS = ()
+    FIELD_SET = frozenset()
+
+    def __init__(self, **fields):
+        for field in self.FIELDS:
+            value = fields.get(field)
+            setattr(self, field, intern_string(value) if field in self.INTERNED else value)
+
+    @classmethod
+    def from_payload(cls, payload, parent = None):
+        '''
+        Record of an api dict, a record is returned as it is
+        '''
+        if isinstance(payload, Node):
+            return payload
+        return cls(**dict((field, payload.get(field)) for field in cls.FIELDS))
+
+    def get(self, key, default = None):
+        value = getattr(self, key) if key in self.FIELD_SET else None
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        if key not in self.FIELD_SET:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in self.FIELD_SET
+
+    def to_dict(self):
+        return dict((field, getattr(self, field)) for field in self.FIELDS)
+
+    def __repr__(self):
+        return '<{} {} {}>'.format(self.__class__.__name__, self.id, self.name)
+
+
+class Account(Node):
+    __slots__ = ()
+    kind = 'account'
+
+
+class Project(Node):
+    __slots__ = ()
+    kind = 'project'
+
+
+class Review(Node):
+    __slots__ = ('uuid', 'reviewURL')
+    kind = 'review'
+    INTERNED = ('uuid',)
+
+
+class Media(Node):
+    '''
+    uuid is the uuid of the review the media belongs to, links to media
+    are made of the review uuid and the media id
+    '''
+    __slots__ = ('uuid', 'type')
+    kind = 'media'
+    INTERNED = ('uuid', 'type')
+
+    @classmethod
+    def from_payload(cls, payload, parent = None):
+        if isinstance(payload, Node):
+            return payload
+        fields = dict((field, payload.get(field)) for field in cls.FIELDS)
+        if parent is not None:
+            fields['uuid'] = parent.get('uuid')
+        return cls(**fields)
+
+
+NODE_CLASSES = dict((cls.kind, cls) for cls in (Account, Project, Review, Media))
+
+for _cls in (Node,) + tuple(NODE_CLASSES.values()):
+    _cls.FIELDS = tuple(field for klass in reversed(_cls.__mro__) for field in getattr(klass, '__slots__', ()))
+    _cls.FIELD_SET = frozenset(_cls.FIELDS)
+
+
+def from_payload(kind, payload, parent = None):
+    '''
+    Record of the given kind for an api dict
+    '''
+    return NODE_CLASSES[kind].from_payload(payload, parent)
@@ -1,5 +1,7 @@
 import email
 import os
+import sys
+import tempfile
 import logging
 logger = logging.getLogger("syncsketchGUI")
 
@@ -41,6 +43,34 @@ def make_windows_style(raw_path):
     windows_style = raw_path.replace('/', '\\')
     return windows_style
 
+def replace_file(source, destination):
+    '''
+    Move source over destination in one step
+    '''
+    if hasattr(os, 'replace'):
+        os.replace(source, destination)
+        return
+    # python 2 can't rename over an existing file on windows
+    if sys.platform == 'win32' and os.path.isfile(destination):
+        os.remove(destination)
+    os.rename(source, destination)
+
+def write_atomic(filepath, write, mode = 'w'):
+    '''
+    Call write with a temp file next to filepath and move it over filepath,
+    readers never see half a file and a failed write leaves the old one
+    '''
+    fd, temp_path = tempfile.mkstemp(prefix = '.{}.'.format(os.path.basename(filepath)),
+                                     dir = os.path.dirname(os.path.abspath(filepath)))
+    try:
+        with os.fdopen(fd, mode) as f:
+            write(f)
+        replace_file(temp_path, filepath)
+    except Exception:
+        if os.path.isfile(temp_path):
+            os.remove(temp_path)
+        raise
+
 def make_safe(raw_path):
     norm_path = os.path.normpath(raw_path)
     path_components = norm_path.split(os.sep)
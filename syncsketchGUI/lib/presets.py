@@ -0,0 +1,175 @@
+'''
+Format and viewport presets.
+
+A PresetRepository parses its preset yaml once and again only when the file
+changed on disk, so recording or switching presets doesn't read the yaml for
+every lookup. Presets are read-only mappings checked when the file is loaded,
+an invalid preset is left out with a warning instead of failing a playblast
+halfway. Code that hands a preset to capture gets a copy with to_dict().
+'''
+import copy
+import os
+import threading
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+from syncsketchGUI.lib import database
+from syncsketchGUI.lib import path
+
+import logging
+logger = logging.getLogger("syncsketchGUI")
+
+# ======================================================================
+# Global Variables
+
+FORMAT_PRESET_YAML = 'syncsketch_preset.yaml'
+VIEWPORT_PRESET_YAML = 'syncsketch_viewport.yaml'
+
+# ======================================================================
+# Module Classes
+
+class PresetError(ValueError):
+    pass
+
+
+class Preset(Mapping):
+    '''
+    Read-only preset, nested dicts and lists are returned as copies
+    '''
+    def __init__(self, name, data):
+        if not isinstance(data, dict):
+            raise PresetError('Preset {} is not a mapping'.format(name))
+        self.name = name
+        self._data = data
+        self.validate()
+
+    def validate(self):
+        pass
+
+    def __getitem__(self, key):
+        value = self._data[key]
+        return copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return '<{} {}>'.format(self.__class__.__name__, self.name)
+
+    def to_dict(self):
+        return copy.deepcopy(self._data)
+
+
+class FormatPreset(Preset):
+    '''
+    Encoding, container and resolution of a playblast
+    '''
+    REQUIRED = ('encoding', 'format', 'width', 'height')
+
+    def validate(self):
+        missing = [key for key in self.REQUIRED if key not in self._data]
+        if missing:
+            raise PresetError('Format preset {} misses {}'.format(self.name, ', '.join(missing)))
+        for key in ('width', 'height'):
+            if not isinstance(self._data[key], int) or self._data[key] <= 0:
+                raise PresetError('Format preset {} has an invalid {}: {}'.format(self.name, key, self._data[key]))
+
+    @property
+    def description(self):
+        return "{} | {} | {}x{}".format(self['encoding'], self['format'], self['width'], self['height'])
+
+
+class ViewportPreset(Preset):
+    '''
+    Options of capture.capture and capture.apply_view
+    '''
+    def validate(self):
+        for key, value in self._data.items():
+            if key.endswith('_options') and value is not None and not isinstance(value, dict):
+                raise PresetError('Viewport preset {} has an invalid {}'.format(self.name, key))
+
+
+class PresetRepository(object):
+    '''
+    Presets of one yaml file, parsed again only when the file changes
+    '''
+    def __init__(self, yaml_file, preset_class = Preset):
+        self.yaml_file = yaml_file
+        self.preset_class = preset_class
+        self._presets = {}
+        self._signature = None
+        self._lock = threading.Lock()
+
+    @property
+    def cache_file(self):
+        if os.path.isabs(self.yaml_file):
+            return path.sanitize(self.yaml_file)
+        return path.get_config_yaml(self.yaml_file)
+
+    def get(self, name, default = None):
+        return self._load().get(name, default)
+
+    def names(self):
+        return sorted(self._load())
+
+    def items(self):
+        presets = self._load()
+        return [(name, presets[name]) for name in sorted(presets)]
+
+    def __contains__(self, name):
+        return name in self._load()
+
+    def invalidate(self):
+        with self._lock:
+            self._signature = None
+
+    def _load(self):
+        cache_file = self.cache_file
+        try:
+            stat = os.stat(cache_file)
+            signature = (stat.st_mtime, stat.st_size)
+        except OSError:
+            signature = None
+
+        with self._lock:
+            if signature is not None and signature == self._signature:
+                return self._presets
+
+            data = database._parse_yaml(cache_file) if signature is not None else None
+            presets = {}
+            for name, preset_data in (data or {}).items():
+                try:
+                    presets[name] = self.preset_class(name, preset_data)
+                except PresetError as err:
+                    logger.warning('Skipping preset: {}'.format(err))
+            self._presets = presets
+            self._signature = signature
+            return presets
+
+
+_repositories = {}
+_repositories_lock = threading.Lock()
+
+def get_repository(yaml_file, preset_class = Preset):
+    '''
+    Shared repository of a preset file, yaml_file is a config file name or a full path
+    '''
+    key = (yaml_file, preset_class)
+    with _repositories_lock:
+        if key not in _repositories:
+            _repositories[key] = PresetRepository(yaml_file, preset_class)
+        return _repositories[key]
+
+
+def get_format_presets(yaml_file = FORMAT_PRESET_YAML):
+    return get_repository(yaml_file, FormatPreset)
+
+
+def get_viewport_presets(yaml_file = VIEWPORT_PRESET_YAML):
+    return get_repository(yaml_file, ViewportPreset)
@@ -0,0 +1,145 @@
+'''
+In-memory search over the items of the review browser.
+
+Every item is indexed by the words of its name, its id and its uuid. A prefix
+trie keeps, for every prefix of every word, the keys of the items having such
+a word, so looking up what the user typed so far costs one step per letter no
+matter how many items there are. The inverted index maps the whole words to
+their keys and is what remove() uses to find the trie paths of an item.
+'''
+import re
+
+# ======================================================================
+# Global Variables
+
+# fields of a record that are searched
+SEARCH_FIELDS = ('name', 'id', 'uuid')
+
+TOKEN_PATTERN = re.compile(r'[^\W_]+', re.UNICODE)
+
+# ======================================================================
+# Module Utilities
+
+def tokenize(text):
+    '''
+    Lower case words of text, "Shot_010 v2" gives shot, 010 and v2
+    '''
+    if text is None:
+        return []
+    if not isinstance(text, type(u'')):
+        text = u'{}'.format(text) if not isinstance(text, bytes) else text.decode('utf-8', 'replace')
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def record_tokens(record):
+    tokens = set()
+    for field in SEARCH_FIELDS:
+        tokens.update(tokenize(record.get(field)))
+    return tokens
+
+
+# ======================================================================
+# Module Classes
+
+class _TrieNode(object):
+    __slots__ = ('children', 'keys')
+
+    def __init__(self):
+        self.children = {}
+        self.keys = set()
+
+
+class SearchIndex(object):
+    '''
+    Prefix search over records, keys are whatever the caller identifies its
+    records with, e.g. the tree widget items
+    '''
+    def __init__(self):
+        self._root = _TrieNode()
+        # word: keys of the records containing it
+        self._words = {}
+        # key: words of its record
+        self._keys = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def keys(self):
+        return self._keys.keys()
+
+    def add(self, key, record):
+        '''
+        Index record under key, replaces what key was indexed with before
+        '''
+        if key in self._keys:
+            self.remove(key)
+        words = record_tokens(record)
+        self._keys[key] = words
+        for word in words:
+            self._words.setdefault(word, set()).add(key)
+            node = self._root
+            for char in word:
+                node = node.children.setdefault(char, _TrieNode())
+                node.keys.add(key)
+
+    def remove(self, key):
+        for word in self._keys.pop(key, ()):
+            keys = self._words.get(word)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._words[word]
+            self._remove_path(word, key)
+
+    def clear(self):
+        self._root = _TrieNode()
+        self._words = {}
+        self._keys = {}
+
+    def find(self, word):
+        '''
+        Keys of the records containing the whole word, e.g. an id or uuid
+        '''
+        words = tokenize(word)
+        return set(self._words.get(words[0], ())) if len(words) == 1 else set()
+
+    def search(self, query):
+        '''
+        Keys of the records having a word starting with each word of query,
+        None for an empty query
+        '''
+        prefixes = tokenize(query)
+        if not prefixes:
+            return None
+
+        found = []
+        for prefix in set(prefixes):
+            node = self._root
+            for char in prefix:
+                node = node.children.get(char)
+                if node is None:
+                    return set()
+            found.append(node.keys)
+        # intersect starting with the smallest set
+        found.sort(key = len)
+        result = set(found[0])
+        for keys in found[1:]:
+            result.intersection_update(keys)
+        return result
+
+    def _remove_path(self, word, key):
+        path = [self._root]
+        for char in word:
+            node = path[-1].children.get(char)
+            if node is None:
+                break
+            node.keys.discard(key)
+            path.append(node)
+        # drop the nodes no record passes through anymore
+        for depth in range(len(path) - 1, 0, -1):
+            if path[depth].keys:
+                break
+            del path[depth - 1].children[word[depth - 1]]
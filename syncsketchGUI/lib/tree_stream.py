@@ -0,0 +1,144 @@
+'''
+Incremental handling of the account tree.
+
+The getTree response is written to disk as it arrives and parsed from there,
+with ijson when it is installed, so the whole response text never sits in
+memory next to the parsed tree. Only the plain fields of the nodes are kept,
+nested objects the browser doesn't show are skipped.
+
+iter_nodes() walks a tree and yields one TreeNode per account, project, review
+and media without copying the child lists, the browser adds them to the tree
+widget a batch at a time. Each TreeNode carries a compact nodes record instead
+of the node's dict.
+'''
+import collections
+import json
+import os
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+from syncsketchGUI.lib import nodes
+from syncsketchGUI.lib import path
+
+import logging
+logger = logging.getLogger("syncsketchGUI")
+
+# ======================================================================
+# Global Variables
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# kind of node and the key of its children
+NODE_LEVELS = (
+    ('account', 'projects'),
+    ('project', 'reviews'),
+    ('review', 'items'),
+    ('media', None),
+)
+
+SCALAR_EVENTS = ('string', 'number', 'boolean', 'null')
+
+# kind is account, project, review or media, data is its nodes record,
+# parent is the TreeNode it belongs to and child_count the number of its children
+TreeNode = collections.namedtuple('TreeNode', 'kind data parent child_count')
+
+# ======================================================================
+# Module Utilities
+
+def iter_nodes(tree, level = 0, parent = None):
+    '''
+    Yield the TreeNodes of tree depth first, parents before their children
+    '''
+    kind, child_key = NODE_LEVELS[level]
+    for node in tree or []:
+        children = node.get(child_key) if child_key else None
+        record = nodes.from_payload(kind, node, parent.data if parent else None)
+        tree_node = TreeNode(kind, record, parent, len(children or []))
+        yield tree_node
+        if children:
+            for child in iter_nodes(children, level + 1, tree_node):
+                yield child
+
+
+def download_tree(host_data, filepath, with_items = False):
+    '''
+    Write the getTree response to filepath without holding it in memory
+    '''
+    params = dict(host_data.api_params)
+    if with_items:
+        params['fetchItems'] = 1
+    response = host_data.session.get(host_data.get_api_base_url() + 'person/tree/', params = params,
+                                     headers = host_data.headers, stream = True)
+    response.raise_for_status()
+
+    def write(f):
+        for chunk in response.iter_content(chunk_size = DOWNLOAD_CHUNK_SIZE):
+            if chunk:
+                f.write(chunk)
+
+    path.write_atomic(filepath, write, mode = 'wb')
+    return filepath
+
+
+def load_tree(filepath):
+    '''
+    Parse a getTree response file into a tree of plain fields
+    '''
+    with open(filepath, 'rb') as f:
+        if ijson is None:
+            return _compact(json.loads(f.read().decode('utf-8')))
+        return _parse_events(ijson.parse(f))
+
+
+def _compact(tree, level = 0):
+    '''
+    Drop the nested objects of the nodes, keep fields and children
+    '''
+    if not isinstance(tree, list):
+        return tree
+    kind, child_key = NODE_LEVELS[level]
+    nodes = []
+    for node in tree:
+        compact = dict((key, value) for key, value in node.items() if not isinstance(value, (dict, list)))
+        if child_key:
+            compact[child_key] = _compact(node.get(child_key) or [], level + 1)
+        nodes.append(compact)
+    return nodes
+
+
+def _parse_events(events):
+    '''
+    Build the compact tree from ijson parse events, only the prefixes of the
+    node levels are looked at, everything below them is skipped
+    '''
+    # prefix of the nodes of each level: item, item.projects.item, ...
+    node_prefixes = {'item': 0}
+    prefix = 'item'
+    for level, (kind, child_key) in enumerate(NODE_LEVELS[:-1]):
+        prefix = '{}.{}.item'.format(prefix, child_key)
+        node_prefixes[prefix] = level + 1
+
+    tree = []
+    stack = []
+    for prefix, event, value in events:
+        if event == 'start_map' and prefix in node_prefixes:
+            level = node_prefixes[prefix]
+            node = {}
+            child_key = NODE_LEVELS[level][1]
+            if child_key:
+                node[child_key] = []
+            siblings = tree if not stack else stack[-1][1][NODE_LEVELS[len(stack) - 1][1]]
+            siblings.append(node)
+            stack.append((prefix, node))
+        elif event == 'end_map' and stack and prefix == stack[-1][0]:
+            stack.pop()
+        elif event in SCALAR_EVENTS and stack:
+            node_prefix, node = stack[-1]
+            key = prefix[len(node_prefix) + 1:]
+            # only the node's own fields, nothing of nested objects
+            if prefix.startswith(node_prefix + '.') and '.' not in key:
+                node[key] = float(value) if value.__class__.__name__ == 'Decimal' else value
+    return tree
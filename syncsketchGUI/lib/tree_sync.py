@@ -0,0 +1,413 @@
+'''
+Delta sync of the account tree.
+
+The last full getTree result is kept on disk. A refresh only asks the server
+for reviews modified since the last sync and merges them into the snapshot.
+Servers that don't filter reviews by modification date are handled by
+comparing the project list with the one from the last sync, only the reviews
+of projects that changed are fetched again. Anything the snapshot can't
+place, e.g. a project of an account it doesn't know, triggers a full sync.
+A snapshot synced with items gets the items of new and changed reviews again.
+The review list leaves out deleted reviews, a delta never sees them go, so
+every FULL_SYNC_INTERVAL the tree is synced in full again to drop them.
+Offline, cached_tree() serves the snapshot as it is.
+'''
+import datetime
+import hashlib
+import json
+import os
+import re
+import threading
+
+import requests
+
+from syncsketchGUI.lib import client
+from syncsketchGUI.lib import path
+from syncsketchGUI.lib import tree_stream
+
+import logging
+logger = logging.getLogger("syncsketchGUI")
+
+# ======================================================================
+# Global Variables
+
+TREE_SNAPSHOT_JSON = 'syncsketch_tree.json'
+SNAPSHOT_VERSION = 1
+
+# seconds the delta window reaches back before the last sync, covers clock skew with the server
+SYNC_OVERLAP = 120
+
+# more changed reviews than this and a full sync is cheaper
+DELTA_LIMIT = 200
+
+# seconds after which a refresh syncs in full, to drop the reviews deleted meanwhile
+FULL_SYNC_INTERVAL = 60 * 60
+
+# fields of a project that change when the project or its reviews change
+PROJECT_SUMMARY_FIELDS = ('name', 'modified', 'is_archived', 'active', 'review_count', 'reviews_count')
+
+FULL = 'full'
+DELTA = 'delta'
+SUMMARY = 'summary'
+# served from the snapshot without asking the server, possibly outdated
+CACHED = 'cached'
+
+# ======================================================================
+# Module Utilities
+
+def get_id(value):
+    '''
+    Id of a related object, the api gives either the id or its resource uri
+    '''
+    if isinstance(value, dict):
+        value = value.get('id')
+    if isinstance(value, int):
+        return value
+    match = re.search(r'(\d+)/?$', '{}'.format(value or ''))
+    return int(match.group(1)) if match else None
+
+
+def get_project_summary(project):
+    '''
+    Short fingerprint of a project entry of the project list
+    '''
+    fields = dict((key, project.get(key)) for key in PROJECT_SUMMARY_FIELDS if key in project)
+    if not fields.get('modified'):
+        # nothing tells us when it changed, compare all of it
+        fields = project
+    data = json.dumps(fields, sort_keys = True, default = str)
+    return hashlib.md5(data.encode('utf-8')).hexdigest()
+
+
+def review_node(review, previous = None):
+    '''
+    Tree node for a review of the api, keeps the items of the previous node
+    '''
+    node = dict(previous or {})
+    for key in ('id', 'uuid', 'name', 'reviewURL', 'modified'):
+        if key in review:
+            node[key] = review[key]
+    node.setdefault('items', [])
+    return node
+
+
+def _utc_now():
+    return datetime.datetime.utcnow().replace(microsecond = 0)
+
+
+def _parse_time(value):
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m-%dT%H:%M:%S')
+    except (TypeError, ValueError):
+        return None
+
+
+def _objects(response):
+    '''
+    objects of a list response, None when the server refused the request
+    '''
+    if not isinstance(response, dict) or 'error' in response or 'objects' not in response:
+        return None
+    return response['objects']
+
+
+# ======================================================================
+# Module Classes
+
+class TreeSync(object):
+    '''
+    Account tree of one user, kept up to date with as little traffic as possible.
+    refresh() returns the tree in the getTree format, last_mode tells how it was synced.
+    '''
+    def __init__(self, host_data, snapshot_file = None):
+        self.host_data = host_data
+        self.snapshot_file = snapshot_file or path.get_config_yaml(TREE_SNAPSHOT_JSON)
+        self.snapshot = None
+        self.last_mode = None
+        # set to False once the server refused the modified filter, it isn't asked again
+        self.delta_supported = None
+        self._lock = threading.Lock()
+
+    @property
+    def owner(self):
+        return '{}@{}'.format(self.host_data.user_auth, self.host_data.HOST)
+
+    @property
+    def tree(self):
+        return self.snapshot['tree'] if self.snapshot else None
+
+    @property
+    def is_stale(self):
+        return self.last_mode == CACHED
+
+    @property
+    def synced_at(self):
+        return _parse_time(self.snapshot.get('synced_at')) if self.snapshot else None
+
+    def cached_tree(self):
+        '''
+        Tree of the last sync without asking the server, None if there never was one
+        '''
+        with self._lock:
+            if self.snapshot is None:
+                self.snapshot = self._load()
+            self.last_mode = CACHED
+            return self.tree
+
+    def cached_review_items(self, review_id):
+        '''
+        Items of a review from the last sync, empty if it was synced without items
+        '''
+        with self._lock:
+            if self.snapshot is None:
+                self.snapshot = self._load()
+            for account in self.tree or []:
+                for project in account.get('projects') or []:
+                    for review in project.get('reviews') or []:
+                        if '{}'.format(review.get('id')) == '{}'.format(review_id):
+                            return list(review.get('items') or [])
+            return []
+
+    def refresh(self, with_items = False, full = False):
+        with self._lock:
+            # the response cache would answer with what we synced last time
+            client.invalidate_cache('review', 'project')
+            if self.snapshot is None:
+                self.snapshot = self._load()
+
+            snapshot = self.snapshot
+            if full or not snapshot or snapshot.get('with_items') != with_items or self._full_sync_due(snapshot):
+                return self._full_sync(with_items)
+
+            synced_at = _utc_now()
+            projects = self._get_projects()
+            changed = self._sync_projects(snapshot, projects) if projects is not None else None
+            if changed is None:
+                return self._full_sync(with_items)
+
+            new_projects, modified_projects = changed
+            changed_reviews = []
+            if self._delta_sync(snapshot, changed_reviews):
+                # reviews of projects new to us can be older than the last sync
+                self.last_mode = DELTA
+                to_fetch = new_projects
+            else:
+                self.last_mode = SUMMARY
+                to_fetch = new_projects | modified_projects
+
+            if not self._fetch_reviews(snapshot, to_fetch, changed_reviews):
+                return self._full_sync(with_items)
+            if with_items and not self._fetch_items(changed_reviews):
+                return self._full_sync(with_items)
+            snapshot['project_summaries'] = dict(('{}'.format(project.get('id')), get_project_summary(project))
+                                                 for project in projects)
+            snapshot['synced_at'] = synced_at.isoformat()
+            self._save()
+            logger.info('Synced account tree ({}, {} projects fetched)'.format(self.last_mode, len(to_fetch)))
+            return snapshot['tree']
+
+    def clear(self):
+        with self._lock:
+            self.snapshot = None
+            if os.path.isfile(self.snapshot_file):
+                os.remove(self.snapshot_file)
+
+    def _full_sync_due(self, snapshot):
+        full_synced_at = _parse_time(snapshot.get('full_synced_at'))
+        if not full_synced_at:
+            return True
+        return (_utc_now() - full_synced_at).total_seconds() > FULL_SYNC_INTERVAL
+
+    def _full_sync(self, with_items):
+        synced_at = _utc_now()
+        tree = self._get_tree(with_items)
+        if not isinstance(tree, list):
+            logger.warning('Fail to obtain tree data from the server.')
+            return tree
+
+        self.snapshot = {
+            'version': SNAPSHOT_VERSION,
+            'owner': self.owner,
+            'with_items': with_items,
+            'synced_at': synced_at.isoformat(),
+            'full_synced_at': synced_at.isoformat(),
+            'tree': tree,
+            'project_summaries': self._get_project_summaries(),
+        }
+        self.last_mode = FULL
+        self._save()
+        logger.info('Synced account tree ({})'.format(self.last_mode))
+        return tree
+
+    def _get_tree(self, with_items):
+        if not hasattr(self.host_data, 'session'):
+            return self.host_data.getTree(withItems = with_items)
+
+        # parsed from disk, the response text and the tree are never in memory together
+        tree_file = '{}.response'.format(self.snapshot_file)
+        try:
+            tree_stream.download_tree(self.host_data, tree_file, with_items = with_items)
+            return tree_stream.load_tree(tree_file)
+        except (requests.exceptions.RequestException, ValueError, IOError) as err:
+            logger.warning('Could not download the account tree: {}'.format(err))
+        finally:
+            if os.path.isfile(tree_file):
+                os.remove(tree_file)
+
+    def _sync_projects(self, snapshot, projects):
+        '''
+        Add, rename and drop projects to match the project list.
+        Returns the ids of the new projects and of the ones whose summary
+        changed, None if a new project belongs to an account we don't know.
+        '''
+        accounts = dict((account.get('id'), account) for account in snapshot['tree'])
+        known = self._projects_by_id(snapshot['tree'])
+        summaries = snapshot.get('project_summaries') or {}
+        new_projects = set()
+        modified_projects = set()
+
+        for project in projects:
+            project_id = project.get('id')
+            node = known.get(project_id)
+            if node is None:
+                account = accounts.get(get_id(project.get('account')))
+                if account is None:
+                    return None
+                node = {'id': project_id, 'reviews': []}
+                account.setdefault('projects', []).append(node)
+                new_projects.add(project_id)
+            elif summaries.get('{}'.format(project_id)) != get_project_summary(project):
+                modified_projects.add(project_id)
+            node['name'] = project.get('name', node.get('name'))
+
+        # projects that were deleted, archived or we lost access to
+        current_ids = set(project.get('id') for project in projects)
+        for account in snapshot['tree']:
+            account['projects'] = [project for project in account.get('projects') or []
+                                   if project.get('id') in current_ids]
+        return new_projects, modified_projects
+
+    def _delta_sync(self, snapshot, changed_reviews):
+        '''
+        Merge the reviews modified since the last sync, False if the server can't filter by date.
+        The nodes of new and changed reviews are added to changed_reviews.
+        '''
+        synced_at = _parse_time(snapshot.get('synced_at'))
+        if not synced_at or self.delta_supported is False:
+            return False
+
+        since = synced_at - datetime.timedelta(seconds = SYNC_OVERLAP)
+        response = self.host_data.get_reviews(modified__gte = since.isoformat(), project__active = 1,
+                                              limit = DELTA_LIMIT)
+        reviews = _objects(response)
+        if reviews is None:
+            logger.info('No delta sync on {}, comparing projects instead'.format(self.host_data.HOST))
+            self.delta_supported = False
+            return False
+        self.delta_supported = True
+        if (response.get('meta') or {}).get('total_count', 0) > DELTA_LIMIT:
+            return False
+
+        projects = self._projects_by_id(snapshot['tree'])
+        for review in reviews:
+            project = projects.get(get_id(review.get('project')))
+            # reviews of projects we don't see anymore are dropped with their project
+            if project is not None:
+                node = self._merge_review(project, review)
+                if node is not None:
+                    changed_reviews.append(node)
+        return True
+
+    def _fetch_reviews(self, snapshot, project_ids, changed_reviews):
+        '''
+        Replace the reviews of the given projects with the ones on the server,
+        the nodes of new and changed reviews are added to changed_reviews
+        '''
+        projects = self._projects_by_id(snapshot['tree'])
+        for project_id in project_ids:
+            node = projects[project_id]
+            reviews = _objects(self.host_data.getReviewsByProjectId(project_id))
+            if reviews is None:
+                return False
+            previous = dict((review.get('id'), review) for review in node.get('reviews') or [])
+            node['reviews'] = []
+            for review in reviews:
+                existing = previous.get(review.get('id'))
+                node['reviews'].append(review_node(review, existing))
+                if existing is None or existing.get('modified') != review.get('modified'):
+                    changed_reviews.append(node['reviews'][-1])
+        return True
+
+    def _fetch_items(self, reviews):
+        '''
+        Replace the items of the given review nodes with the ones on the server
+        '''
+        for review in reviews:
+            items = _objects(self.host_data.getMediaByReviewId(review['id']))
+            if items is None:
+                return False
+            review['items'] = items
+        return True
+
+    def _merge_review(self, project, review):
+        '''
+        Add, update or drop the review, returns its node if it is new or changed
+        '''
+        reviews = project.setdefault('reviews', [])
+        for index, existing in enumerate(reviews):
+            if existing.get('id') == review.get('id'):
+                if review.get('active') is False:
+                    del reviews[index]
+                    return
+                reviews[index] = review_node(review, existing)
+                if existing.get('modified') != review.get('modified'):
+                    return reviews[index]
+                return
+        if review.get('active') is not False:
+            reviews.append(review_node(review))
+            return reviews[-1]
+
+    def _get_projects(self):
+        return _objects(self.host_data.getProjects())
+
+    def _get_project_summaries(self):
+        projects = self._get_projects() or []
+        return dict(('{}'.format(project.get('id')), get_project_summary(project)) for project in projects)
+
+    def _projects_by_id(self, tree):
+        return dict((project.get('id'), project)
+                    for account in tree for project in account.get('projects') or [])
+
+    def _load(self):
+        if not os.path.isfile(self.snapshot_file):
+            return
+        try:
+            with open(self.snapshot_file) as f:
+                snapshot = json.load(f)
+        except (IOError, ValueError) as err:
+            logger.info('Ignoring tree snapshot {}: {}'.format(self.snapshot_file, err))
+            return
+        if snapshot.get('version') != SNAPSHOT_VERSION or snapshot.get('owner') != self.owner:
+            return
+        return snapshot
+
+    def _save(self):
+        # the snapshot only spares the next session a full sync, failing to store it isn't an error
+        try:
+            path.write_atomic(self.snapshot_file, lambda f: json.dump(self.snapshot, f))
+        except (IOError, OSError) as err:
+            logger.warning('Could not store tree snapshot {}: {}'.format(self.snapshot_file, err))
+
+
+_syncs = {}
+
+def get_tree_sync(host_data):
+    '''
+    TreeSync of the client's user, one per user for the session
+    '''
+    key = (host_data.user_auth, host_data.HOST)
+    tree_sync = _syncs.get(key)
+    if tree_sync is None:
+        tree_sync = _syncs[key] = TreeSync(host_data)
+    tree_sync.host_data = host_data
+    return tree_sync
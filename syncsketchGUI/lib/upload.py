@@ -0,0 +1,226 @@
+import io
+import os
+import time
+import uuid
+
+try:
+    #python3
+    from urllib.parse import urlencode
+except ImportError:
+    #python2
+    from urllib import urlencode
+
+import requests
+
+import logging
+logger = logging.getLogger("syncsketchGUI")
+
+# ======================================================================
+# Global Variables
+
+CHUNK_SIZE = 1024 * 1024 # bytes
+
+# addMedia retries after a dropped connection
+MAX_RETRIES = 3
+BACKOFF = 1.0 # seconds, doubled on every retry
+MAX_BACKOFF = 30.0 # seconds
+REQUEST_TIMEOUT = (10, 120) # connect, read
+RATE_WINDOW = 5.0 # seconds of history used for the upload rate
+
+# ======================================================================
+# Module Utilities
+
+class UploadAborted(Exception):
+    '''
+    Raised when an upload is cancelled
+    '''
+
+
+class UploadError(Exception):
+    '''
+    Raised when an upload fails for good
+    '''
+
+
+RETRY_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+
+
+def get_upload_url(host_data, review_id, noConvertFlag = False, itemParentId = False):
+    '''
+    Build the same uploadToReview url the SyncSketchAPI.addMedia uses
+    '''
+    get_params = dict(host_data.api_params)
+
+    if noConvertFlag:
+        get_params.update({"noConvertFlag": 1})
+
+    if itemParentId:
+        get_params.update({"itemParentId": itemParentId})
+
+    return "%s/items/uploadToReview/%s/?%s" % (host_data.HOST, review_id, urlencode(get_params))
+
+
+# ======================================================================
+# Module Classes
+
+class MultipartBody(object):
+    '''
+    File-like multipart/form-data body of a file with one text field per
+    fields item. It has a length, so requests sends it with a Content-Length
+    (the upload view doesn't take chunked requests), and the file is read
+    CHUNK_SIZE at a time while it is sent. on_read gets the bytes sent so far.
+    '''
+    def __init__(self, fields, file_field, filepath, filename = None, on_read = None):
+        self.boundary = uuid.uuid4().hex
+        self.on_read = on_read
+        self.bytes_sent = 0
+
+        head = []
+        for name, value in fields.items():
+            head.append(u'--{}\r\nContent-Disposition: form-data; name="{}"\r\n\r\n{}\r\n'.format(
+                self.boundary, name, value))
+        head.append(u'--{}\r\nContent-Disposition: form-data; name="{}"; filename="{}"\r\n'
+                    u'Content-Type: application/octet-stream\r\n\r\n'.format(
+                        self.boundary, file_field, filename or os.path.basename(filepath)))
+        head = u''.join(head).encode('utf-8')
+        tail = u'\r\n--{}--\r\n'.format(self.boundary).encode('utf-8')
+
+        self.length = len(head) + os.path.getsize(filepath) + len(tail)
+        self._parts = [io.BytesIO(head), open(filepath, 'rb'), io.BytesIO(tail)]
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def content_type(self):
+        return 'multipart/form-data; boundary={}'.format(self.boundary)
+
+    def read(self, size = -1):
+        if size is None or size < 0:
+            size = self.length
+        data = b''
+        while self._parts and len(data) < size:
+            chunk = self._parts[0].read(min(size - len(data), CHUNK_SIZE))
+            if not chunk:
+                self._parts.pop(0).close()
+                continue
+            data += chunk
+        self.bytes_sent += len(data)
+        if data and self.on_read:
+            self.on_read(self.bytes_sent)
+        return data
+
+    def close(self):
+        for part in self._parts:
+            part.close()
+        self._parts = []
+
+
+class TransferRate(object):
+    '''
+    Keep track of the bytes sent and the upload rate over the last RATE_WINDOW seconds
+    '''
+    def __init__(self, total, bytes_sent = 0):
+        self.total = total
+        self.bytes_sent = bytes_sent
+        self.started_at = time.time()
+        self._samples = [(self.started_at, bytes_sent)]
+
+    def update(self, bytes_sent):
+        now = time.time()
+        self.bytes_sent = bytes_sent
+        self._samples.append((now, bytes_sent))
+        while len(self._samples) > 2 and now - self._samples[0][0] > RATE_WINDOW:
+            self._samples.pop(0)
+
+    @property
+    def rate(self):
+        '''
+        Bytes per second
+        '''
+        (first_time, first_bytes), (last_time, last_bytes) = self._samples[0], self._samples[-1]
+        if last_time <= first_time:
+            return 0.0
+        return (last_bytes - first_bytes) / (last_time - first_time)
+
+    def as_dict(self):
+        rate = self.rate
+        remaining = self.total - self.bytes_sent
+        return {
+            'bytes_sent': self.bytes_sent,
+            'total': self.total,
+            'percent': 100.0 * self.bytes_sent / self.total if self.total else 100.0,
+            'rate': rate,
+            'eta': remaining / rate if rate else None,
+        }
+
+
+def upload_media(host_data, review_id, filepath, noConvertFlag = False, itemParentId = False,
+                 on_progress = None, is_cancelled = None, max_retries = MAX_RETRIES):
+    '''
+    SyncSketchAPI.addMedia, tried again with a growing wait when the connection drops.
+    addMedia sends the file in one request, so on_progress gets the TransferRate dict
+    before and after it. is_cancelled is checked before every attempt.
+    '''
+    transfer = TransferRate(os.path.getsize(filepath))
+    if on_progress:
+        on_progress(transfer.as_dict())
+
+    attempt = 0
+    while True:
+        if is_cancelled and is_cancelled():
+            raise UploadAborted('Upload of {} was cancelled'.format(filepath))
+        try:
+            uploaded_item = host_data.addMedia(review_id, filepath, noConvertFlag = noConvertFlag,
+                                               itemParentId = itemParentId)
+        except RETRY_ERRORS as err:
+            attempt += 1
+            if attempt > max_retries:
+                raise UploadError('Giving up on {} after {} retries: {}'.format(filepath, max_retries, err))
+            wait = min(MAX_BACKOFF, BACKOFF * 2 ** (attempt - 1))
+            logger.warning('Uploading {} failed ({}), retry {}/{} in {:.1f}s'.format(
+                filepath, err, attempt, max_retries, wait))
+            time.sleep(wait)
+            continue
+
+        # addMedia returns None when the server didn't answer with json
+        if not uploaded_item or 'id' not in uploaded_item:
+            raise UploadError('Uploading {} failed: {}'.format(filepath, uploaded_item))
+        transfer.update(transfer.total)
+        if on_progress:
+            on_progress(transfer.as_dict())
+        return uploaded_item
+
+
+def send_media(host_data, review_id, filepath, noConvertFlag = False, itemParentId = False,
+               artist_name = '', session = None, on_progress = None, fallback = None):
+    '''
+    Post filepath to the review like SyncSketchAPI.addMedia, but as a sized
+    MultipartBody on session (e.g. client.get_session()) so on_progress gets
+    the TransferRate dict while the file goes out.
+    fallback() is returned instead when the request fails before any byte of
+    the body was sent, once the body went out a failure is raised, the file
+    is never sent twice.
+    '''
+    def on_read(bytes_sent):
+        transfer.update(bytes_sent)
+        if on_progress:
+            on_progress(transfer.as_dict())
+
+    body = MultipartBody({'artist': artist_name}, 'reviewFile', filepath, on_read = on_read)
+    transfer = TransferRate(len(body))
+    headers = dict(host_data.headers)
+    headers['Content-Type'] = body.content_type
+    upload_url = get_upload_url(host_data, review_id, noConvertFlag, itemParentId)
+    try:
+        r = (session or requests).post(upload_url, data = body, headers = headers, timeout = REQUEST_TIMEOUT)
+    except RETRY_ERRORS as err:
+        if body.bytes_sent or not fallback:
+            raise
+        logger.warning('Could not send {} ({}), uploading it with addMedia'.format(filepath, err))
+        return fallback()
+    finally:
+        body.close()
+
+    r.raise_for_status()
+    return r.json()
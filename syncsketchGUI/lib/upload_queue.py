@@ -0,0 +1,335 @@
+import os
+import threading
+
+from syncsketchGUI.lib import connection
+from syncsketchGUI.lib import jobs
+from syncsketchGUI.lib import user
+from syncsketchGUI.lib.a_sync import UploadQueueSignals
+
+import logging
+logger = logging.getLogger("syncsketchGUI")
+
+# ======================================================================
+# Global Variables
+
+MAX_CONCURRENT_UPLOADS = 2
+
+# ======================================================================
+# Module Utilities
+
+def get_media_url(review_url, item_id):
+    media_url = '{}#{}'.format(review_url, item_id)
+    if 'none' in media_url.lower():
+        return ""
+    return media_url
+
+
+def add_review_url(current_user, uploaded_item, review_id):
+    '''
+    Add the reviewURL pointing at the uploaded item
+    '''
+    review_data = current_user.get_review_data_from_id(review_id)
+    logger.info("review_data: {}".format(review_data))
+    uploaded_item['reviewURL'] = get_media_url(review_data.get('reviewURL'), uploaded_item['id'])
+    return uploaded_item
+
+
+def _run_upload(job, task):
+    '''
+    Upload the task's file, runs on a worker thread
+    '''
+    current_user = user.get_current_user()
+    item_parent_id = task.item_id if task.item_type == 'media' else False
+    logger.info('Uploading {} to {} with review_id {}'.format(task.filepath, task.item_name, task.review_id))
+
+    uploaded_item = current_user.upload_media_to_review(
+        task.review_id, task.filepath, noConvertFlag = True, itemParentId = item_parent_id,
+        data = task.post_data(),
+        on_progress = lambda progress: job.set_progress(**progress),
+        is_cancelled = lambda: job.cancel_requested)
+
+    if not uploaded_item:
+        raise RuntimeError('No Uploaded Item returned from Syncsketch')
+
+    if task.batch:
+        # the batch looks up the review urls of all its uploads at once
+        logger.info('Upload successful. Uploaded item {}'.format(task.filepath))
+        return uploaded_item
+
+    uploaded_item = add_review_url(current_user, uploaded_item, task.review_id)
+    logger.info('Upload successful. Uploaded item {} to {}'.format(task.filepath, uploaded_item['reviewURL']))
+    return uploaded_item
+
+
+def _resolve_batch_urls(job, batch):
+    '''
+    Add the reviewURL to every uploaded item of the batch with a single review lookup
+    '''
+    uploaded = [task for task in batch.tasks if task.uploaded_item]
+    if not uploaded:
+        return
+
+    current_user = user.get_current_user()
+    review_urls = current_user.get_review_urls([task.review_id for task in uploaded])
+    for task in uploaded:
+        review_url = review_urls.get(int(task.review_id))
+        task.uploaded_item['reviewURL'] = get_media_url(review_url, task.uploaded_item['id'])
+        logger.info('Uploaded item {} to {}'.format(task.filepath, task.uploaded_item['reviewURL']))
+
+
+# ======================================================================
+# Module Classes
+
+class UploadTask(object):
+    '''
+    A file to upload and the review or media item it goes to
+    '''
+    def __init__(self, filepath, review_id, item_type = 'review', item_id = None,
+                 item_name = None, first_frame = None, last_frame = None):
+        self.filepath = filepath
+        self.review_id = review_id
+        self.item_type = item_type
+        self.item_id = item_id
+        self.item_name = item_name
+        self.first_frame = first_frame
+        self.last_frame = last_frame
+
+        self.job = None
+        self.batch = None
+
+    def __repr__(self):
+        return '<UploadTask {} -> {}>'.format(os.path.basename(self.filepath), self.item_name or self.review_id)
+
+    @property
+    def name(self):
+        return os.path.basename(self.filepath)
+
+    @property
+    def state(self):
+        return self.job.state if self.job else jobs.PENDING
+
+    @property
+    def uploaded_item(self):
+        return self.job.result if self.job else None
+
+    @property
+    def error(self):
+        return self.job.error if self.job else None
+
+    def post_data(self):
+        return {
+            "first_frame": self.first_frame,
+            "last_frame": self.last_frame,
+        }
+
+
+class UploadBatch(object):
+    '''
+    Uploads that are submitted together, e.g. one playblast per shot.
+    Their review urls are looked up in one request once the last upload is done.
+    An open batch takes more tasks until it is closed, see UploadQueue.open_batch.
+    '''
+    def __init__(self, tasks = ()):
+        self.tasks = []
+        self._remaining = 0
+        self._closed = False
+        self._lock = threading.Lock()
+
+        for task in tasks:
+            self._add(task)
+
+    def __repr__(self):
+        return '<UploadBatch {} uploads>'.format(len(self.tasks))
+
+    @property
+    def is_done(self):
+        return self._remaining == 0
+
+    @property
+    def uploaded_items(self):
+        return [task.uploaded_item for task in self.tasks if task.uploaded_item]
+
+    @property
+    def failed_tasks(self):
+        return [task for task in self.tasks if task.state in jobs.DONE_STATES and task.state != jobs.FINISHED]
+
+    def _add(self, task):
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('{} is closed'.format(self))
+            task.batch = self
+            self.tasks.append(task)
+            self._remaining += 1
+
+    def _close(self):
+        '''
+        Take no more tasks, returns True if all uploads are already done
+        '''
+        with self._lock:
+            self._closed = True
+            return self._remaining == 0
+
+    def _task_done(self):
+        '''
+        Count a finished upload, returns True for the last one of a closed batch
+        '''
+        with self._lock:
+            self._remaining -= 1
+            return self._closed and self._remaining == 0
+
+
+class UploadQueue(object):
+    '''
+    Runs uploads on worker threads, never more than max_concurrent at once.
+
+    The queue is kept at module level so uploads carry on when the window
+    that queued them is closed, windows connect to queue.signals:
+        queued(task), progress(task, dict), finished(task), error(task, message),
+        batch_finished(batch)
+    Uploads of a batch don't emit finished, batch_finished is emitted once
+    their review urls are known.
+    Uploads queued while SyncSketch is unreachable are held, they start
+    when the ConnectivityMonitor reports the server back.
+    '''
+    def __init__(self, max_concurrent = MAX_CONCURRENT_UPLOADS):
+        self.signals = UploadQueueSignals()
+        self._runner = jobs.JobRunner(max_concurrent)
+        self._tasks = []
+        self._held = []
+        self._lock = threading.Lock()
+        connection.get_monitor().add_observer(self._connectivity_changed)
+
+    @property
+    def tasks(self):
+        with self._lock:
+            return list(self._tasks)
+
+    @property
+    def held_tasks(self):
+        with self._lock:
+            return list(self._held)
+
+    @property
+    def active_tasks(self):
+        return [task for task in self.tasks if task.state not in jobs.DONE_STATES]
+
+    @property
+    def max_concurrent(self):
+        return self._runner.max_concurrent
+
+    def set_max_concurrent(self, value):
+        self._runner.set_max_concurrent(value)
+
+    def submit(self, task, batch = None):
+        '''
+        Queue the task and return it, the upload starts as soon as a slot is free.
+        batch is an UploadBatch from open_batch the task is added to.
+        '''
+        if batch:
+            batch._add(task)
+        task.job = jobs.FunctionJob(_run_upload, args = (task,), name = task.name,
+            on_progress = lambda job, progress: self.signals.progress.emit(task, progress),
+            on_finished = lambda job: self._on_done(task),
+            on_error = lambda job, message: self._on_done(task, message))
+
+        with self._lock:
+            self._tasks.append(task)
+            held = connection.get_monitor().is_offline
+            if held:
+                self._held.append(task)
+        self.signals.queued.emit(task)
+        if held:
+            logger.info('Offline, holding {} until SyncSketch is reachable'.format(task))
+        else:
+            self._runner.submit(task.job)
+        return task
+
+    def submit_batch(self, tasks):
+        '''
+        Queue several uploads at once and return the UploadBatch
+        '''
+        batch = self.open_batch()
+        for task in tasks:
+            self.submit(task, batch)
+        self.close_batch(batch)
+        return batch
+
+    def open_batch(self):
+        '''
+        Start a batch for uploads that become ready one after the other, e.g. the shots
+        of a recording. Tasks are added with submit(task, batch), the uploads start right
+        away, batch_finished is emitted once the batch is closed and all its uploads are done.
+        '''
+        return UploadBatch()
+
+    def close_batch(self, batch):
+        '''
+        No more tasks will be added to the batch
+        '''
+        if batch._close() and batch.tasks:
+            self._finish_batch(batch)
+
+    def cancel(self, task):
+        with self._lock:
+            held = task in self._held
+            if held:
+                self._held.remove(task)
+        if held:
+            task.job.cancel()
+            task.job._finish(jobs.CANCELLED)
+        elif task.job:
+            self._runner.cancel(task.job)
+
+    def release_held(self):
+        '''
+        Start the uploads held while offline
+        '''
+        with self._lock:
+            held, self._held = self._held, []
+        for task in held:
+            self._runner.submit(task.job)
+        return held
+
+    def cancel_all(self):
+        for task in self.active_tasks:
+            self.cancel(task)
+
+    def wait_all(self, timeout = None):
+        return self._runner.wait_all(timeout)
+
+    def _connectivity_changed(self, online):
+        if online and self.held_tasks:
+            logger.info('SyncSketch is reachable, starting {} held uploads'.format(len(self.held_tasks)))
+            self.release_held()
+
+    def _on_done(self, task, message = None):
+        with self._lock:
+            if task in self._tasks:
+                self._tasks.remove(task)
+
+        if message is not None:
+            logger.info('ERROR: This Upload failed: {}'.format(message))
+            self.signals.error.emit(task, message)
+        elif not task.batch:
+            self.signals.finished.emit(task)
+
+        if task.batch and task.batch._task_done():
+            self._finish_batch(task.batch)
+
+    def _finish_batch(self, batch):
+        emit = lambda *args: self.signals.batch_finished.emit(batch)
+        self._runner.submit(jobs.FunctionJob(_resolve_batch_urls, args = (batch,),
+                                             on_finished = emit, on_error = emit))
+
+
+_queue = None
+
+def get_upload_queue():
+    '''
+    Shared queue used for all uploads of the session.
+    Create it from the UI thread, so the signals live there.
+    '''
+    global _queue
+    if _queue is None:
+        _queue = UploadQueue()
+    return _queue
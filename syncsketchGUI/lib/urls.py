@@ -0,0 +1,109 @@
+'''
+Parsing and building of SyncSketch review links.
+
+    https://syncsketch.com/sketch/bff609f9cbac                 review
+    https://www.syncsketch.com/sketch/bff609f9cbac/#711273     media of the review
+    https://syncsketch.com/sketch/bff609f9cbac#711273/637821   revision of the media
+
+parse_review_url() matches a link against one precompiled pattern and keeps
+the last URL_CACHE_SIZE results, the same links are parsed over and over when
+the browser is filled and after every upload.
+
+Run this module to time the parser: python urls.py [iterations]
+'''
+import collections
+import re
+import threading
+
+# ======================================================================
+# Global Variables
+
+REVIEW_BASE_URL = 'https://syncsketch.com/sketch/'
+
+URL_CACHE_SIZE = 256
+
+REVIEW_URL_PATTERN = re.compile(r'''
+    ^(?:https?://)?(?:www\.)?syncsketch\.com/sketch/
+    (?P<uuid>[a-f\d]{12})/?             # review
+    (?:\?[^\#]*)?                       # query, e.g. ?offlineMode=1
+    (?:\#/?(?P<id>\d+)?                 # media
+    (?:/(?P<revision_id>\d+))?)?/?$     # revision
+''', re.IGNORECASE | re.VERBOSE)
+
+# uuid of the review, id of the media and id of its revision, the ids are ints or None
+ReviewUrl = collections.namedtuple('ReviewUrl', 'uuid id revision_id')
+
+# ======================================================================
+# Module Utilities
+
+_cache = collections.OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _parse(link):
+    match = REVIEW_URL_PATTERN.match(link)
+    if not match:
+        return None
+    media_id, revision_id = match.group('id'), match.group('revision_id')
+    return ReviewUrl(match.group('uuid').lower(),
+                     int(media_id) if media_id else None,
+                     int(revision_id) if revision_id else None)
+
+
+def parse_review_url(link):
+    '''
+    ReviewUrl of a review link, None if link isn't one
+    '''
+    if not link:
+        return None
+    link = link.strip()
+    with _cache_lock:
+        if link in _cache:
+            result = _cache.pop(link)
+            _cache[link] = result
+            return result
+
+    result = _parse(link)
+    with _cache_lock:
+        _cache[link] = result
+        while len(_cache) > URL_CACHE_SIZE:
+            _cache.popitem(last = False)
+    return result
+
+
+def make_review_url(uuid, media_id = None, revision_id = None):
+    '''
+    Link to a review, its media or a revision of the media
+    '''
+    url = '{}{}'.format(REVIEW_BASE_URL, uuid)
+    if media_id:
+        url += '#{}'.format(media_id)
+        if revision_id:
+            url += '/{}'.format(revision_id)
+    return url
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def _benchmark(iterations = 100000):
+    import timeit
+
+    links = [
+        'https://syncsketch.com/sketch/bff609f9cbac',
+        'https://www.syncsketch.com/sketch/bff609f9cbac/#711273',
+        'https://syncsketch.com/sketch/bff609f9cbac?offlineMode=1#711273/637821',
+        'https://example.com/not/a/review',
+    ]
+    for link in links:
+        uncached = timeit.timeit(lambda: _parse(link), number = iterations)
+        cached = timeit.timeit(lambda: parse_review_url(link), number = iterations)
+        print('{}\n    {}\n    parse {:.3f} us, cached {:.3f} us'.format(
+            link, parse_review_url(link), uncached * 1e6 / iterations, cached * 1e6 / iterations))
+
+
+if __name__ == '__main__':
+    import sys
+    _benchmark(*[int(arg) for arg in sys.argv[1:2]])
@@ -1,12 +1,17 @@
+import contextlib
 import getpass
 import os
+import threading
 
 import yaml
-import syncsketch
 import requests
 
+from syncsketchGUI.lib import client
+from syncsketchGUI.lib import connection
 from syncsketchGUI.lib import database
 from syncsketchGUI.lib import path
+from syncsketchGUI.lib import tree_sync
+from syncsketchGUI.lib import upload
 from os.path import expanduser
 
 
@@ -27,6 +32,9 @@ except:
 
 yaml_file = 'syncsketch_user.yaml'
 
+# keys of the user file that make up the login, the api client is dropped when they change
+CREDENTIAL_KEYS = ('username', 'api_key', 'token')
+
 # ======================================================================
 # Module Utilities
 
@@ -42,40 +50,36 @@ def _merge_dictionaries(*dictionaries):
     return result_dictionary
 
 
-def _set_to_yaml_user(key, value):
-    '''
-    Set the given dictionary to the user's local yaml file
-    '''
-    yaml_path = path.get_config_yaml(yaml_file)
+def _invalidate_client(changed):
+    # the credentials changed, the next auto_login makes a new client
+    if any(key in changed for key in CREDENTIAL_KEYS):
+        client.invalidate()
 
-    if not os.path.isfile(yaml_path):
-        open(yaml_path, 'w')
 
-    existing_data = dict()
-    user_data = {str(key) : str(value)}
-    logger.info("yamlpath: {} ".format(yaml_path))
-    logger.info("userdata: {} ".format(user_data))
+_store = None
 
-    if os.path.isfile(yaml_path):
-        existing_data = database._parse_yaml(yaml_path)
+def get_credential_store():
+    '''
+    CredentialStore of the user yaml file shared by the session
+    '''
+    global _store
+    if _store is None:
+        _store = CredentialStore(path.get_config_yaml(yaml_file))
+        _store.add_observer(_invalidate_client)
+    return _store
 
-    if existing_data:
-        user_data = _merge_dictionaries(existing_data, user_data)
 
-    with open(yaml_path, 'w') as outfile:
-        new_data = yaml.dump(user_data, default_flow_style = False)
-        outfile.write(new_data)
+def _set_to_yaml_user(key, value):
+    '''
+    Set the given key to the user's local yaml file
+    '''
+    get_credential_store().set(**{key: value})
 
 def _get_from_yaml_user(key):
     '''
     Get the given key's value from the user's local yaml file
     '''
-    yaml_path = path.get_config_yaml(yaml_file)
-    if not os.path.isfile(yaml_path):
-        return
-
-    user_data = database._parse_yaml(yaml_path)
-    return user_data.get(key)
+    return get_credential_store().get(key)
 
 
     return response.json()
@@ -95,6 +99,147 @@ def download_file(url, fileName):
 # ======================================================================
 # Module Classes
 
+class CredentialStore(object):
+    '''
+    The user yaml file kept in memory.
+
+    get() answers from memory, the file is only parsed again when its mtime
+    changed, e.g. when another maya session logged in. set() writes through
+    right away, inside a batch() all changes are written once at the end.
+    Observers are called as observer(changed) with a dict of the changed keys.
+    '''
+    def __init__(self, yaml_path):
+        self.yaml_path = yaml_path
+        self._data = None
+        self._mtime = None
+        self._batch_depth = 0
+        self._dirty = {}
+        self._observers = []
+        self._lock = threading.RLock()
+
+    def get(self, key):
+        with self._lock:
+            self._reload_if_changed()
+            return self._data.get(key)
+
+    def set(self, **values):
+        values = dict((str(key), str(value)) for key, value in values.items())
+        with self._lock:
+            self._reload_if_changed()
+            changed = dict((key, value) for key, value in values.items() if self._data.get(key) != value)
+            self._data.update(values)
+            self._dirty.update(changed)
+            if not self._batch_depth:
+                self._flush()
+
+    @contextlib.contextmanager
+    def batch(self):
+        '''
+        Write all set() calls made inside the block to disk once
+        '''
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                if not self._batch_depth:
+                    self._flush()
+
+    def add_observer(self, observer):
+        if observer not in self._observers:
+            self._observers.append(observer)
+
+    def remove_observer(self, observer):
+        if observer in self._observers:
+            self._observers.remove(observer)
+
+    def _reload_if_changed(self):
+        try:
+            mtime = os.path.getmtime(self.yaml_path)
+        except OSError:
+            mtime = None
+        if self._data is not None and mtime == self._mtime:
+            return
+
+        previous = self._data
+        data = database._parse_yaml(self.yaml_path) if mtime is not None else None
+        self._data = data if isinstance(data, dict) else {}
+        self._mtime = mtime
+        if previous is not None:
+            changed = dict((key, self._data.get(key)) for key in set(previous) | set(self._data)
+                           if previous.get(key) != self._data.get(key))
+            self._notify(changed)
+
+    def _flush(self):
+        changed, self._dirty = self._dirty, {}
+        path.write_atomic(self.yaml_path, lambda f: yaml.dump(self._data, f, default_flow_style = False))
+        self._mtime = os.path.getmtime(self.yaml_path)
+        logger.info("Saved {} to {}".format(sorted(changed), self.yaml_path))
+        self._notify(changed)
+
+    def _notify(self, changed):
+        if not changed:
+            return
+        for observer in list(self._observers):
+            try:
+                observer(changed)
+            except Exception as err:
+                logger.error("Credential observer {} failed: {}".format(observer, err))
+
+
+class SingleFlight(object):
+    '''
+    Run a call only once for callers asking for the same key at the same time.
+
+    The first caller of do(key, fn) runs fn, callers arriving with the same
+    key while it runs wait for it and get the same result (or exception).
+    '''
+    class _Call(object):
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+            self.waiters = 0
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.shared = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+            else:
+                call.waiters += 1
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except Exception as err:
+            call.error = err
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+# identical api calls that are in flight share one request
+_in_flight = SingleFlight()
+
+
 class SyncSketchUser():
     '''
     Class to store all user data
@@ -131,6 +276,15 @@ class SyncSketchUser():
         self.password = password
         _set_to_yaml_user('password', self.password)
 
+    def set_credentials(self, name, token, api_key):
+        '''
+        Store name, token and api key with a single write
+        '''
+        with get_credential_store().batch():
+            self.set_name(name)
+            self.set_token(token)
+            self.set_api_key(api_key)
+
     # Get Functions
     def get_name(self):
         self.name = _get_from_yaml_user('username')
@@ -154,17 +308,9 @@ class SyncSketchUser():
 
     # Auto Login
     def auto_login(self):
-        # logger.warning(  " doing autologin: %s"%self.api_host)
-
-        if not self.host_data:
-            logger.info("self.get_name(): {} self.get_api_key() #### self.api_host {}".format(
-                 self.get_name(), self.api_host,))
-            self.host_data = syncsketch.SyncSketchAPI(self.get_name(),
-                                                       self.get_api_key(),
-                                                       useExpiringToken=True,
-                                                       host = self.api_host,
-                                                       debug=False)
-            return self.host_data
+        # the client is shared by all users and only made again after login/logout
+        self.host_data = client.get_client(self.get_name(), self.get_api_key(), self.api_host)
+        return self.host_data
 
     def is_logged_in(self):
         if self.get_name() and self.get_token():
@@ -175,13 +321,18 @@ class SyncSketchUser():
 
     def logout(self):
 
-        r = requests.get('%s/app/logmeout/' %(self.api_host))
+        r = client.get_session().get('%s/app/logmeout/' %(self.api_host))
         result = r.text
 
         # resetting the yaml file
-        self.set_name('')
-        self.set_api_key('')
-        self.set_token('')
+        self.set_credentials('', '', '')
+        self.host_data = None
+
+    def _fetch(self, key, fn, *args, **kwargs):
+        '''
+        Call the api through the single flight, requests with the same key share one call
+        '''
+        return _in_flight.do((id(self.host_data),) + key, fn, *args, **kwargs)
 
     def get_account_data(self, match_user_with_os = False, withItems=False):
         self.auto_login()
@@ -202,7 +353,13 @@ class SyncSketchUser():
         account_data['media'] = list()
 
 
-        tree_data = self.host_data.getTree(withItems = withItems)
+        sync = tree_sync.get_tree_sync(self.host_data)
+        if connection.get_monitor().is_offline:
+            logger.info('Offline, using the account tree of the last sync')
+            return sync.cached_tree()
+
+        # only what changed since the last refresh is fetched
+        tree_data = self._fetch(('tree', withItems), sync.refresh, with_items = withItems)
 
         #Return statement without indirection, pls remove
         return tree_data
@@ -227,13 +384,57 @@ class SyncSketchUser():
 
     def get_review_data_from_id(self, review_id):
         self.auto_login()
-        review_data = self.host_data.getReviewById(review_id)
+        review_data = self._fetch(('review', review_id), self.host_data.getReviewById, review_id)
         return review_data
 
+    def get_media_by_review_id(self, review_id):
+        self.auto_login()
+        if not self.host_data:
+            logger.warning('Please login first.')
+            return
+        if connection.get_monitor().is_offline:
+            logger.info('Offline, using the items of review {} from the last sync'.format(review_id))
+            return {'objects': tree_sync.get_tree_sync(self.host_data).cached_review_items(review_id)}
+        return self._fetch(('review_items', review_id), self.host_data.getMediaByReviewId, review_id)
+
+
+    def get_review_urls(self, review_ids):
+        '''
+        Get the reviewURL of several reviews with one request, returns {review_id: reviewURL}.
+        Reviews the bulk query didn't return are fetched one by one.
+        '''
+        self.auto_login()
+        if not self.host_data:
+            logger.warning('Please login first.')
+            return {}
+
+        review_ids = sorted(set(int(review_id) for review_id in review_ids))
+        if not review_ids:
+            return {}
+
+        params = dict(self.host_data.api_params)
+        params.update({'id__in': ','.join(str(review_id) for review_id in review_ids),
+                       'limit': len(review_ids)})
+        review_urls = {}
+        try:
+            r = client.get_session().get(self.host_data.get_api_base_url() + 'review/',
+                                         params = params, headers = self.host_data.headers)
+            r.raise_for_status()
+            for review in r.json().get('objects', []):
+                if review.get('id') in review_ids:
+                    review_urls[review['id']] = review.get('reviewURL')
+        except (requests.exceptions.RequestException, ValueError) as err:
+            logger.info('Bulk review lookup failed: {}'.format(err))
+
+        for review_id in review_ids:
+            if review_id not in review_urls:
+                review_data = self.get_review_data_from_id(review_id)
+                review_urls[review_id] = review_data.get('reviewURL') if review_data else None
+        return review_urls
 
     def get_media_data_from_id(self, media_id):
         self.auto_login()
-        media_data = self.host_data.getAnnotations(media_id)
+        media_data = self._fetch(('annotations', media_id), self.host_data.getAnnotations, media_id)
         return media_data
 
     def get_item_info(self, media_id):
@@ -244,16 +445,44 @@ class SyncSketchUser():
         if not self.host_data:
             logger.warning('Please login first.')
             return
-        return self.host_data.getMedia({'id': media_id})
+        return self._fetch(('item', media_id), self.host_data.getMedia, {'id': media_id})
 
 
-    def upload_media_to_review(self, review_id, filepath, noConvertFlag = False, itemParentId = False, data={}):
+    def upload_media_to_review(self, review_id, filepath, noConvertFlag = False, itemParentId = False, data={},
+                               on_progress = None, is_cancelled = None):
+        '''
+        Upload the whole file with addMedia, retried when the connection drops (see upload.upload_media)
+        '''
         self.auto_login()
         if not self.host_data:
             logger.warning('Please login first.')
             return
 
-        uploaded_item = self.host_data.addMedia(review_id, filepath, noConvertFlag=noConvertFlag, itemParentId=itemParentId)
+        uploaded_item = upload.upload_media(self.host_data, review_id, filepath, noConvertFlag=noConvertFlag,
+                                            itemParentId=itemParentId, on_progress=on_progress,
+                                            is_cancelled=is_cancelled)
+        # the review has a new item, cached review and item data is outdated
+        client.invalidate_cache('item')
+        uploaded_item = self.host_data.updateItem(uploaded_item["id"], data )
+        return uploaded_item
+
+    def send_media_to_review(self, review_id, filepath, noConvertFlag = False, itemParentId = False, data={},
+                             on_progress = None):
+        '''
+        Like upload_media_to_review, but reports the progress while the file is
+        sent (see upload.send_media), addMedia is only used if no byte got out
+        '''
+        self.auto_login()
+        if not self.host_data:
+            logger.warning('Please login first.')
+            return
+
+        fallback = lambda: upload.upload_media(self.host_data, review_id, filepath, noConvertFlag=noConvertFlag,
+                                               itemParentId=itemParentId, on_progress=on_progress)
+        uploaded_item = upload.send_media(self.host_data, review_id, filepath, noConvertFlag=noConvertFlag,
+                                          itemParentId=itemParentId, session=client.get_session(),
+                                          on_progress=on_progress, fallback=fallback)
+        client.invalidate_cache('item')
         uploaded_item = self.host_data.updateItem(uploaded_item["id"], data )
         return uploaded_item
 
@@ -324,7 +553,7 @@ class SyncSketchUser():
             logger.warning('Please login first.')
             return
 
-        media = self.host_data.getMedia({'id': itemId})
+        media = self._fetch(('item', itemId), self.host_data.getMedia, {'id': itemId})
 
         logger.info("itemId: {} ".format(itemId))
         logger.info("media: {} ".format(media))
@@ -336,7 +565,7 @@ class SyncSketchUser():
 
         baseDir = self.get_base_dir()        
         local_filename = os.path.join(baseDir, fileName)
-        r = requests.get(videoURL, stream=True)
+        r = client.get_session().get(videoURL, stream=True)
         with open(local_filename, 'wb') as f:
             for chunk in r.iter_content(chunk_size=1024):
                 if chunk:
@@ -344,3 +573,15 @@ class SyncSketchUser():
         return local_filename
 
 
+
+
+_current_user = None
+
+def get_current_user():
+    '''
+    SyncSketchUser shared by the whole session
+    '''
+    global _current_user
+    if _current_user is None:
+        _current_user = SyncSketchUser()
+    return _current_user
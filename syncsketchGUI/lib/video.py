@@ -1,10 +1,12 @@
 import datetime
+import glob
 import json
 import os
 import subprocess
 import sys
 from os.path import expanduser
 from syncsketchGUI.lib import path
+from syncsketchGUI.lib import jobs
 import logging
 logger = logging.getLogger("syncsketchGUI")
 
@@ -53,50 +55,149 @@ def probe(filename):
         print (u'%s' %(err))
         return
 
-def encodeToH264Mov(filepath = None, output_file = ""):
+def _get_ffmpeg_executable():
     ffmpeg_path = path.get_ffmpeg_bin() + '\\'
 
     if sys.platform == 'win32':
-        filepath = path.make_windows_style(filepath)
         ffmpeg_executable = 'ffmpeg.exe'
         ffmpeg_path = os.path.join(ffmpeg_path, ffmpeg_executable)
         ffmpeg_path = path.make_windows_style(ffmpeg_path)
-        output_file = path.make_windows_style(output_file)
     else:
-        filepath = path.sanitize(filepath)
         ffmpeg_executable = 'ffmpeg'
         ffmpeg_path = os.path.join(ffmpeg_path, ffmpeg_executable)
         ffmpeg_path = path.sanitize(ffmpeg_path)
-        output_file = path.sanitize(output_file)
-    
+
     if not os.path.isfile(ffmpeg_path):
         logger.error("FFMPEG executable missing. No File at: {}".format(ffmpeg_path))
         raise RuntimeError("FFMPEG executable missing")
 
-    filepath = filepath.replace("####", r"%04d")
+    return ffmpeg_path
+
+
+def _platform_path(filepath):
+    if sys.platform == 'win32':
+        return path.make_windows_style(filepath)
+    return path.sanitize(filepath)
+
+
+def count_sequence_frames(filepath):
+    '''
+    Number of frames on disk for a #### image sequence, None for movies
+    '''
+    if "####" not in filepath:
+        return None
+    frames = glob.glob(filepath.replace("####", "[0-9][0-9][0-9][0-9]"))
+    return len(frames) or None
+
+
+def build_h264_command(filepath, output_file, start_number = None, framerate = None):
+    '''
+    Return the ffmpeg command list that re-encodes filepath to a h264 mov.
+    start_number is the first frame of a #### sequence, ffmpeg only looks for
+    the first frame near 0 on its own, e.g. raw frame numbers like 1001 need it.
+    '''
+    ffmpeg_path = _get_ffmpeg_executable()
+    filepath = _platform_path(filepath).replace("####", r"%04d")
+    output_file = _platform_path(output_file)
 
     ffmpeg_command = [ffmpeg_path]
+    if framerate:
+        ffmpeg_command.extend(['-framerate', '{}'.format(framerate)])
+    if start_number is not None:
+        ffmpeg_command.extend(['-start_number', '{}'.format(int(start_number))])
     ffmpeg_command.extend(['-i', filepath])
     # ffmpeg_command += '-filter:v select="eq(n\,0)" -vframes 1'
     ffmpeg_command.extend(['-c:v', 'libx264', '-preset', 'fast', '-tune', 'animation'])
     ffmpeg_command.extend(['-y'])
     ffmpeg_command.extend([output_file])
+    return ffmpeg_command
+
+
+def encodeToH264MovAsync(filepath = None, output_file = "", on_progress = None,
+                         on_finished = None, on_error = None, timeout = None, runner = None,
+                         start_number = None, framerate = None):
+    '''
+    Queue the h264 re-encode on the job runner and return the FFmpegJob right away.
+    on_progress receives the job and a dict with frame, fps, out_time and percent.
+    '''
+    ffmpeg_command = build_h264_command(filepath, output_file, start_number = start_number, framerate = framerate)
+    logger.info('ffmpeg command: {}'.format(' '.join(ffmpeg_command)))
+
+    job = jobs.FFmpegJob(ffmpeg_command,
+                         total_frames = count_sequence_frames(path.sanitize(filepath)),
+                         name = os.path.basename(output_file),
+                         timeout = timeout,
+                         on_progress = on_progress,
+                         on_finished = on_finished,
+                         on_error = on_error)
+    job.output_file = path.sanitize(output_file)
+    return (runner or jobs.get_runner()).submit(job)
+
+
+def encodeToH264Mov(filepath = None, output_file = "", on_progress = None, timeout = None):
+    ffmpeg_command = build_h264_command(filepath, output_file)
     logger.info('ffmpeg command: {}'.format(' '.join(ffmpeg_command)))
-    try:
-        subprocess.check_output(ffmpeg_command, stderr=subprocess.STDOUT)
-    except subprocess.CalledProcessError as err:
-        logger.error("FFMPEG conversion non zero exit: {}".format(err.output))
-        raise err    
 
+    job = jobs.FFmpegJob(ffmpeg_command,
+                         total_frames = count_sequence_frames(path.sanitize(filepath)),
+                         timeout = timeout,
+                         on_progress = on_progress)
+    job.run()
+    return get_encoded_file(job, filepath, output_file)
 
+
+def get_encoded_file(job, filepath, output_file):
+    '''
+    Mirror the old check_output behaviour for a finished encode job
+    '''
+    if job.state != jobs.FINISHED:
+        output = '\n'.join(job.output)
+        logger.error("FFMPEG conversion non zero exit: {}".format(output))
+        raise subprocess.CalledProcessError(job.returncode or 1, job.command, output)
+
+    output_file = _platform_path(output_file)
     # print "Creating Thumb for %s >> %s"%(filepath,output_file)
     if not os.path.isfile(output_file):
-        logger.error("FFMPEG conversion from {} to {} not successful. Converted File missing. \n Command used: {}".format(filepath, output_file, ffmpeg_command))
+        logger.error("FFMPEG conversion from {} to {} not successful. Converted File missing. \n Command used: {}".format(filepath, output_file, job.command))
         return
     else:
         return path.sanitize(output_file)
 
 
+def build_concat_command(list_file, output_file):
+    '''
+    Return the ffmpeg command list that joins the movies listed in list_file
+    without re-encoding them, they need to share codec and resolution
+    '''
+    ffmpeg_command = [_get_ffmpeg_executable()]
+    ffmpeg_command.extend(['-f', 'concat', '-safe', '0', '-i', _platform_path(list_file)])
+    ffmpeg_command.extend(['-c', 'copy', '-y', _platform_path(output_file)])
+    return ffmpeg_command
+
+
+def concatMoviesAsync(filepaths, output_file, on_progress = None, on_finished = None,
+                      on_error = None, timeout = None, runner = None):
+    '''
+    Queue joining filepaths, in order, into output_file and return the FFmpegJob
+    '''
+    list_file = os.path.splitext(path.sanitize(output_file))[0] + '_concat.txt'
+    with open(list_file, 'w') as f:
+        for filepath in filepaths:
+            f.write("file '{}'\n".format(_platform_path(filepath).replace("'", "'\\''")))
+
+    ffmpeg_command = build_concat_command(list_file, output_file)
+    logger.info('ffmpeg command: {}'.format(' '.join(ffmpeg_command)))
+
+    job = jobs.FFmpegJob(ffmpeg_command,
+                         name = os.path.basename(output_file),
+                         timeout = timeout,
+                         on_progress = on_progress,
+                         on_finished = on_finished,
+                         on_error = on_error)
+    job.output_file = path.sanitize(output_file)
+    return (runner or jobs.get_runner()).submit(job)
+
+
 def get_thumb(filepath = None, output_file = ""):
     if not output_file:
         output_file = "{0}/Desktop/output_file.jpg".format(expanduser("~"))
@@ -0,0 +1,15 @@
+'''
+The package __init__ starts the Maya GUI, the library modules tested here only
+need their own package, so the packages are registered without running it.
+'''
+import os
+import sys
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+for name in ('syncsketchGUI', 'syncsketchGUI.lib', 'syncsketchGUI.lib.maya'):
+    if name not in sys.modules:
+        module = types.ModuleType(name)
+        module.__path__ = [os.path.join(ROOT, *name.split('.'))]
+        sys.modules[name] = module
@@ -0,0 +1,87 @@
+'''
+PlayblastCapabilities with a fake maya
+'''
+import importlib
+import sys
+import types
+
+import pytest
+
+
+class FakeCmds(object):
+    def __init__(self):
+        self.formats = ['qt', 'image']
+        self.queries = 0
+
+    def about(self, version = False):
+        return '2024'
+
+    def playblast(self, query = False, format = False):
+        self.queries += 1
+        return list(self.formats)
+
+
+class FakeMel(object):
+    def __init__(self):
+        self.compressions = {'qt': ['H.264'], 'image': ['png']}
+        self.queries = 0
+
+    def eval(self, command):
+        self.queries += 1
+        return list(self.compressions[command.split('"')[1]])
+
+
+@pytest.fixture
+def maya(monkeypatch):
+    maya = types.ModuleType('maya')
+    maya.OpenMaya = types.ModuleType('maya.OpenMaya')
+    maya.cmds = FakeCmds()
+    maya.mel = FakeMel()
+    monkeypatch.setitem(sys.modules, 'maya', maya)
+    monkeypatch.setitem(sys.modules, 'maya.OpenMaya', maya.OpenMaya)
+    monkeypatch.setitem(sys.modules, 'maya.cmds', maya.cmds)
+    monkeypatch.setitem(sys.modules, 'maya.mel', maya.mel)
+    monkeypatch.delitem(sys.modules, 'syncsketchGUI.lib.maya.capabilities', raising = False)
+    return maya
+
+
+@pytest.fixture
+def capabilities(maya):
+    return importlib.import_module('syncsketchGUI.lib.maya.capabilities')
+
+
+def test_answers_are_stored_until_they_expire(maya, capabilities, tmp_path, monkeypatch):
+    cache_file = str(tmp_path / 'capabilities.json')
+    first = capabilities.PlayblastCapabilities(cache_file)
+    assert first.compressions('qt') == ['H.264']
+    assert first.formats() == ['qt', 'image']
+
+    second = capabilities.PlayblastCapabilities(cache_file)
+    assert second.compressions('qt') == ['H.264']
+    assert second.formats() == ['qt', 'image']
+    assert (maya.mel.queries, maya.cmds.queries) == (1, 1)
+
+    later = capabilities.time.time() + capabilities.CAPABILITIES_TTL + 1
+    monkeypatch.setattr(capabilities.time, 'time', lambda: later)
+    expired = capabilities.PlayblastCapabilities(cache_file)
+    assert expired.compressions('qt') == ['H.264']
+    assert maya.mel.queries == 2
+
+
+def test_stored_answers_are_checked_again_before_a_preset_fails(maya, capabilities, tmp_path):
+    cache_file = str(tmp_path / 'capabilities.json')
+    capabilities.PlayblastCapabilities(cache_file).compressions('qt')
+
+    # a codec was installed since the answers were stored
+    maya.mel.compressions['qt'].append('ProRes')
+    maya.cmds.formats.append('avi')
+    maya.mel.compressions['avi'] = ['none']
+    session = capabilities.PlayblastCapabilities(cache_file)
+    assert session.validate_preset({'format': 'qt', 'encoding': 'ProRes'}) == []
+    assert session.validate_preset({'format': 'avi', 'encoding': 'none'}) == []
+
+    # answers of this session are not asked for again
+    queries = maya.mel.queries, maya.cmds.queries
+    assert session.validate_preset({'format': 'qt', 'encoding': 'DNxHD'}) == ['encoding DNxHD is not available for qt']
+    assert session.validate_preset({'format': 'mp4', 'encoding': 'H.264'}) == ['format mp4 is not available']
+    assert (maya.mel.queries, maya.cmds.queries) == queries
@@ -0,0 +1,128 @@
+'''
+SyncSketchClient against the installed syncsketch, requests go to a fake session
+'''
+import pytest
+
+syncsketch = pytest.importorskip('syncsketch')
+
+from syncsketchGUI.lib import client
+
+try:
+    from inspect import signature
+except ImportError:
+    signature = None
+
+
+class FakeResponse(object):
+    def __init__(self, data):
+        self.data = data
+        self.text = '{}'.format(data)
+
+    def json(self):
+        return self.data
+
+
+class FakeSession(object):
+    def __init__(self):
+        self.calls = []
+
+    def _call(self, verb, url, **kwargs):
+        self.calls.append((verb, url, kwargs.get('params')))
+        return FakeResponse({'objects': [{'id': len(self.calls)}]})
+
+    def get(self, url, **kwargs):
+        return self._call('get', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self._call('post', url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self._call('patch', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self._call('put', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self._call('delete', url, **kwargs)
+
+
+def _client(session):
+    return client.SyncSketchClient('artist@studio.com', 'key', host = 'https://syncsketch.invalid',
+                                   useExpiringToken = True, session = session)
+
+
+@pytest.mark.skipif(signature is None, reason = 'needs inspect.signature')
+def test_request_json_mirrors_the_installed_syncsketch():
+    # _request_json copies the private _get_json_response, a new syncsketch has to be checked by hand
+    parameters = list(signature(syncsketch.SyncSketchAPI._get_json_response).parameters)
+    assert parameters == list(signature(client.SyncSketchClient._get_json_response).parameters)
+
+
+def test_api_calls_go_through_the_session_with_absolute_urls():
+    session = FakeSession()
+    api = _client(session)
+
+    api.getTree()
+    api.updateItem(5, {'name': 'shot'})
+
+    assert [call[:2] for call in session.calls] == [
+        ('get', 'https://syncsketch.invalid/api/v1/person/tree/'),
+        ('patch', 'https://syncsketch.invalid/api/v1/item/5/'),
+    ]
+    assert session.calls[0][2]['email'] == 'artist@studio.com'
+
+
+def test_cache_keys_absolute_and_relative_paths_alike():
+    cache = client.ResponseCache()
+    assert cache.get_path('/api/v1/person/tree/') == 'person/tree'
+    assert cache.get_path('https://syncsketch.invalid/api/v1/review/3/') == 'review/3'
+    assert cache.get_path('review') == 'review'
+    assert cache.get_endpoint('/api/v1/review/3/') == 'review'
+    assert cache.get_endpoint('/api/v2/project/1/storage/') is None
+
+
+def test_reads_are_answered_from_the_cache_until_the_ttl_expires(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(client.time, 'time', lambda: now[0])
+    session = FakeSession()
+    api = _client(session)
+
+    first = api.getTree()
+    assert api.getTree() == first
+    assert len(session.calls) == 1
+    assert api.cache.stats()['hits'] == 1
+    assert api.cache.stats()['misses'] == 1
+
+    now[0] += client.ENDPOINT_TTLS['person/tree'] + 1
+    assert api.getTree() != first
+    assert len(session.calls) == 2
+    assert api.cache.stats()['misses'] == 2
+
+
+def test_writes_drop_their_endpoint_and_the_related_ones():
+    session = FakeSession()
+    api = _client(session)
+
+    api.getTree()
+    api.getReviewById(3)
+    api.getProjects()
+    assert api.cache.stats()['entries'] == 3
+
+    api.updateItem(5, {'name': 'shot'})
+    # an item changes its review and the tree, not the project list
+    assert api.cache.stats()['entries'] == 1
+    api.getProjects()
+    assert api.cache.stats()['hits'] == 1
+
+    api.cache.invalidate()
+    assert api.cache.stats()['entries'] == 0
+
+
+def test_raw_and_failed_responses_are_not_cached():
+    session = FakeSession()
+    api = _client(session)
+
+    api.getTree(raw_response = True)
+    session.get = lambda url, **kwargs: FakeResponse({'objects': []})
+    api.getTree()
+    assert api.cache.stats()['entries'] == 0
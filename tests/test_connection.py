@@ -0,0 +1,46 @@
+'''
+ConnectivityMonitor with the network probe replaced
+'''
+import threading
+
+from syncsketchGUI.lib import connection
+
+
+def _probe_threads():
+    return [thread for thread in threading.enumerate() if thread.name == 'SyncSketchConnectivity']
+
+
+def test_restart_leaves_one_probe_thread(monkeypatch):
+    probes = []
+    monkeypatch.setattr(connection, 'probe', lambda host, port, timeout: probes.append(port) or True)
+    monkeypatch.delenv('SS_OFFLINE', raising = False)
+    monitor = connection.ConnectivityMonitor(timeout = 1)
+
+    assert monitor.is_online()
+    monitor.stop()
+    assert _probe_threads() == []
+
+    monitor.start()
+    monitor.stop()
+    monitor.start()
+    assert monitor.is_online()
+    assert len(_probe_threads()) == 1
+    monitor.stop()
+    assert _probe_threads() == []
+    assert set(probes) == {443}
+
+
+def test_forced_offline_stops_probing(monkeypatch):
+    monkeypatch.setattr(connection, 'probe', lambda host, port, timeout: True)
+    monkeypatch.delenv('SS_OFFLINE', raising = False)
+    monitor = connection.ConnectivityMonitor(timeout = 1)
+    states = []
+    monitor.add_observer(states.append)
+
+    monitor.start()
+    monitor.set_forced_offline(True)
+
+    assert monitor.is_offline
+    assert not monitor.is_online()
+    assert _probe_threads() == []
+    assert states == [False]
@@ -0,0 +1,114 @@
+'''
+CredentialStore keeps the user yaml file in memory
+'''
+import os
+
+import pytest
+import yaml
+
+pytest.importorskip('syncsketch')
+
+from syncsketchGUI.lib import user
+
+
+@pytest.fixture
+def yaml_path(tmp_path):
+    yaml_path = tmp_path / 'syncsketch_user.yaml'
+    yaml_path.write_text(u'username: artist@studio.com\napi_key: first\n')
+    return str(yaml_path)
+
+
+def _read(yaml_path):
+    with open(yaml_path) as f:
+        return yaml.safe_load(f)
+
+
+def _touch_later(yaml_path):
+    # make sure the mtime moves even on filesystems with a coarse clock
+    mtime = os.path.getmtime(yaml_path) + 10
+    os.utime(yaml_path, (mtime, mtime))
+
+
+def test_reloads_only_when_the_file_changed(yaml_path, monkeypatch):
+    store = user.CredentialStore(yaml_path)
+    assert store.get('api_key') == 'first'
+
+    parsed = []
+    parse_yaml = user.database._parse_yaml
+    monkeypatch.setattr(user.database, '_parse_yaml', lambda filepath: parsed.append(filepath) or parse_yaml(filepath))
+    assert store.get('username') == 'artist@studio.com'
+    assert parsed == []
+
+    # another maya session logs in
+    with open(yaml_path, 'w') as f:
+        f.write('username: artist@studio.com\napi_key: second\n')
+    _touch_later(yaml_path)
+
+    assert store.get('api_key') == 'second'
+    assert parsed == [yaml_path]
+
+
+def test_set_writes_atomically(yaml_path, monkeypatch):
+    store = user.CredentialStore(yaml_path)
+    store.set(api_key = 'second')
+
+    assert _read(yaml_path) == {'username': 'artist@studio.com', 'api_key': 'second'}
+    assert os.listdir(os.path.dirname(yaml_path)) == ['syncsketch_user.yaml']
+
+    def fail_rename(source, target):
+        raise OSError('disk full')
+    monkeypatch.setattr(user.path, 'replace_file', fail_rename)
+    with pytest.raises(OSError):
+        store.set(api_key = 'third')
+    # a failed write never leaves half a file behind
+    assert _read(yaml_path)['api_key'] == 'second'
+
+
+def test_batch_writes_once(yaml_path, monkeypatch):
+    store = user.CredentialStore(yaml_path)
+    writes = []
+    write_atomic = user.path.write_atomic
+    monkeypatch.setattr(user.path, 'write_atomic', lambda filepath, write: writes.append(filepath) or write_atomic(filepath, write))
+
+    with store.batch():
+        store.set(username = 'other@studio.com')
+        store.set(api_key = 'second', token = 'abc')
+        with store.batch():
+            store.set(token = 'def')
+        assert writes == []
+
+    assert writes == [yaml_path]
+    assert _read(yaml_path) == {'username': 'other@studio.com', 'api_key': 'second', 'token': 'def'}
+
+
+def test_observers_get_the_changed_keys(yaml_path):
+    store = user.CredentialStore(yaml_path)
+    changes = []
+    store.add_observer(changes.append)
+    store.add_observer(changes.append)
+
+    with store.batch():
+        store.set(api_key = 'first', token = 'abc')
+    assert changes == [{'token': 'abc'}]
+
+    with open(yaml_path, 'w') as f:
+        f.write('username: other@studio.com\napi_key: first\ntoken: abc\n')
+    _touch_later(yaml_path)
+    store.get('username')
+    assert changes[-1] == {'username': 'other@studio.com'}
+
+    store.remove_observer(changes.append)
+    store.set(api_key = 'second')
+    assert len(changes) == 2
+
+
+def test_failing_observer_does_not_stop_the_others(yaml_path):
+    store = user.CredentialStore(yaml_path)
+    changes = []
+    def broken(changed):
+        raise ValueError('broken observer')
+    store.add_observer(broken)
+    store.add_observer(changes.append)
+
+    store.set(token = 'abc')
+    assert changes == [{'token': 'abc'}]
@@ -0,0 +1,112 @@
+'''
+Frame range sharding and CaptureFarm with a stand-in for mayapy
+'''
+import argparse
+import os
+import stat
+import sys
+
+import pytest
+
+from syncsketchGUI.lib.maya import farm
+
+
+FAKE_MAYAPY = '''#!{executable}
+import json
+import sys
+
+worker, scene, item_file = sys.argv[1:]
+with open(item_file) as f:
+    item = json.load(f)
+if item.get('start_frame') == 13:
+    sys.exit('capture failed')
+print('out: capturing ' + item['camera'])
+print({marker!r} + item['filename'] + '.####.png')
+'''
+
+
+@pytest.fixture
+def mayapy(tmp_path):
+    '''
+    Reports the capture output of its item like the worker script does
+    '''
+    mayapy = tmp_path / 'mayapy'
+    mayapy.write_text(FAKE_MAYAPY.format(executable = sys.executable, marker = farm.OUTPUT_MARKER))
+    mayapy.chmod(mayapy.stat().st_mode | stat.S_IEXEC)
+    return str(mayapy)
+
+
+@pytest.mark.parametrize('shards, ranges', [
+    (1, [(1001, 1010)]),
+    (3, [(1001, 1004), (1005, 1007), (1008, 1010)]),
+    (5, [(1001, 1002), (1003, 1004), (1005, 1006), (1007, 1008), (1009, 1010)]),
+    # never more shards than frames
+    (20, [(frame, frame) for frame in range(1001, 1011)]),
+])
+def test_frame_range_is_split_into_consecutive_shards(shards, ranges):
+    assert farm.split_frame_range(1001, 1010, shards) == ranges
+
+
+def test_split_rejects_reversed_ranges():
+    with pytest.raises(ValueError):
+        farm.split_frame_range(1010, 1001, 2)
+
+
+def test_frame_ranges_are_parsed():
+    assert farm.parse_frame_range('1001-1100') == (1001, 1100)
+    assert farm.parse_frame_range('1001') == (1001, 1001)
+    assert farm.parse_frame_range('-5-10') == (-5, 10)
+    assert farm.parse_frame_range('-5') == (-5, -5)
+    with pytest.raises(argparse.ArgumentTypeError):
+        farm.parse_frame_range('first-last')
+
+
+def test_shard_frames_are_collected_into_one_sequence(tmp_path):
+    outputs = []
+    for index, frames in enumerate(((1001, 1002), (1003, 1004))):
+        shard = tmp_path / 'shard_{:03d}'.format(index)
+        shard.mkdir()
+        for frame in frames:
+            (shard / 'shot.{}.png'.format(frame)).write_bytes(b'png')
+        outputs.append(str(shard / 'shot.####.png'))
+
+    sequence = farm.collect_sequence(outputs, str(tmp_path / 'shot'))
+
+    assert sequence == str(tmp_path / 'shot.####.png')
+    assert sorted(os.listdir(str(tmp_path))) == ['shard_000', 'shard_001', 'shot.1001.png', 'shot.1002.png',
+                                                 'shot.1003.png', 'shot.1004.png']
+
+
+def test_farm_reports_outputs_in_item_order(mayapy, tmp_path):
+    items = [{'camera': 'shot{}'.format(index), 'filename': str(tmp_path / 'shot{}'.format(index)),
+              'start_frame': start_frame} for index, start_frame in enumerate((1, 13, 25))]
+    finished = []
+
+    capture_farm = farm.CaptureFarm(items, scene = 'scene.mb', workers = 2, mayapy = mayapy,
+                                    on_item_finished = finished.append)
+    capture_farm.start()
+
+    assert capture_farm.wait(30)
+    assert capture_farm.outputs == [str(tmp_path / 'shot0.####.png'), None, str(tmp_path / 'shot2.####.png')]
+    assert capture_farm.failed_jobs == [capture_farm.jobs[1]]
+    assert sorted(job.index for job in finished) == [0, 1, 2]
+    # the item files are gone, the scene was the caller's
+    assert not os.path.exists(capture_farm.tempdir)
+
+
+def test_failed_shard_fails_the_capture(mayapy, tmp_path):
+    finished = []
+    sharded = farm.ShardedCapture('shot010', 1, 24, str(tmp_path / 'shot010'), shards = 2,
+                                  scene = 'scene.mb', mayapy = mayapy, on_finished = finished.append)
+
+    assert sharded.ranges == [(1, 12), (13, 24)]
+    sharded.start()
+
+    assert sharded.wait(30)
+    assert finished == [sharded]
+    assert sharded.output_file is None
+    assert sharded.error == '1 of 2 shards failed'
+    # the frames are kept to look into
+    assert os.path.isdir(sharded.framedir)
+    assert [(job.item['start_frame'], job.item['end_frame'], job.item['format']) for job in sharded.farm.jobs] == [
+        (1, 12, 'image'), (13, 24, 'image')]
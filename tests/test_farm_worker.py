@@ -0,0 +1,31 @@
+'''
+The farm worker must reach its modules without running the syncsketchGUI __init__
+'''
+import os
+import subprocess
+import sys
+
+from syncsketchGUI.lib.maya import farm
+
+
+def test_worker_is_started_by_path():
+    command = farm.build_worker_command('mayapy', 'scene.mb', 'item.json')
+    assert command == ['mayapy', farm.WORKER_SCRIPT, 'scene.mb', 'item.json']
+    assert os.path.isfile(farm.WORKER_SCRIPT)
+
+
+def test_worker_imports_skip_the_package_init(tmp_path):
+    script = '\n'.join([
+        'import runpy, sys',
+        'worker = runpy.run_path({!r})'.format(farm.WORKER_SCRIPT),
+        'worker["_register_package"]()',
+        'from syncsketchGUI.lib.maya import farm',
+        'print(farm.OUTPUT_MARKER)',
+        'print(sorted(name for name in sys.modules if name.startswith("syncsketchGUI")))',
+    ])
+    output = subprocess.check_output([sys.executable, '-c', script], cwd = str(tmp_path),
+                                     env = dict(os.environ, PYTHONPATH = '')).decode('utf-8')
+
+    assert farm.OUTPUT_MARKER in output
+    assert "'syncsketchGUI.gui'" not in output
+    assert "'syncsketchGUI.lib.user'" not in output
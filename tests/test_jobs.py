@@ -0,0 +1,93 @@
+import sys
+import threading
+
+from syncsketchGUI.lib import jobs
+
+
+def test_cancel_pending_job_lets_callbacks_use_the_runner():
+    runner = jobs.JobRunner(max_concurrent = 1)
+    release = threading.Event()
+    blocker = runner.submit(jobs.FunctionJob(lambda job: release.wait(5)))
+    resubmitted = []
+
+    def on_error(job, message):
+        # e.g. the upload queue starting the next upload of a batch
+        resubmitted.append(runner.submit(jobs.FunctionJob(lambda job: 'next')))
+
+    pending = runner.submit(jobs.FunctionJob(lambda job: None, on_error = on_error))
+    canceller = threading.Thread(target = runner.cancel, args = (pending,))
+    canceller.daemon = True
+    canceller.start()
+    canceller.join(2)
+
+    assert not canceller.is_alive()
+    assert pending.state == jobs.CANCELLED
+    release.set()
+    assert runner.wait_all(5)
+    assert blocker.state == jobs.FINISHED
+    assert resubmitted[0].result == 'next'
+
+
+# two blocks as written by ffmpeg -nostats -progress pipe:1
+FFMPEG_PROGRESS = '''frame=12
+fps=24.00
+stream_0_0_q=28.0
+bitrate=N/A
+total_size=48
+out_time_us=500000
+out_time_ms=500000
+out_time=00:00:00.500000
+dup_frames=0
+drop_frames=0
+speed=1.02x
+progress=continue
+frame=48
+fps=25.50
+out_time=00:00:02.000000
+speed=1.1x
+progress=end
+'''
+
+
+def _parse(total_frames, output = FFMPEG_PROGRESS):
+    progress = []
+    job = jobs.FFmpegJob(['ffmpeg', '-i', 'in.%04d.png', 'out.mov'], total_frames = total_frames,
+                         on_progress = lambda job, values: progress.append(values))
+    for line in output.splitlines():
+        job._handle_line(line)
+    return job, progress
+
+
+def test_ffmpeg_progress_blocks_are_reported_once_complete():
+    job, progress = _parse(total_frames = 96)
+
+    assert job.command[:4] == ['ffmpeg', '-nostats', '-progress', 'pipe:1']
+    assert len(progress) == 2
+    assert progress[0]['frame'] == 12
+    assert progress[0]['fps'] == 24.0
+    assert progress[0]['out_time'] == 0.5
+    assert progress[0]['speed'] == '1.02x'
+    assert progress[0]['percent'] == 12.5
+    assert not progress[0]['end']
+    # the end block is complete whatever the frame count says
+    assert progress[1]['end']
+    assert progress[1]['percent'] == 100.0
+    assert job.progress == progress[1]
+
+
+def test_ffmpeg_progress_without_frame_count():
+    job, progress = _parse(total_frames = None, output = 'frame=N/A\nout_time=N/A\nsome log line\nprogress=continue\n')
+
+    assert progress == [{'frame': None, 'fps': None, 'out_time': None, 'speed': None,
+                         'percent': None, 'end': False}]
+    assert jobs.parse_out_time('01:02:03.5') == 3723.5
+
+
+def test_process_gets_no_open_stdin(tmp_path):
+    script = 'import sys; sys.stdout.write(repr(sys.stdin.read()))'
+    lines = []
+    job = jobs.ProcessJob([sys.executable, '-c', script], timeout = 10,
+                          on_output = lambda job, line: lines.append(line))
+
+    assert job.run() == jobs.FINISHED
+    assert lines == ["''"]
@@ -0,0 +1,134 @@
+'''
+VersionCheck against a local stand-in of the release repo
+'''
+import importlib
+import json
+import os
+import sys
+import threading
+import types
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+pytest.importorskip('syncsketch')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class ReleaseRepo(HTTPServer):
+    def __init__(self):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), ReleaseHandler)
+        self.version = '1.2.3'
+        self.requests = []
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}/setup.py'.format(self.server_address[1])
+
+
+class ReleaseHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        etag = '"{}"'.format(self.server.version)
+        self.server.requests.append(self.headers.get('If-None-Match'))
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = "setup(name = 'syncSketchGUI', version = '{}')".format(self.server.version).encode('utf8')
+        self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeMonitor(object):
+    is_offline = False
+
+
+@pytest.fixture
+def repo():
+    server = ReleaseRepo()
+    thread = threading.Thread(target = server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def maintenance(monkeypatch):
+    # the installer gui needs maya, the version check doesn't use it
+    package = types.ModuleType('syncsketchGUI.installScripts')
+    package.__path__ = [os.path.join(ROOT, 'syncsketchGUI', 'installScripts')]
+    monkeypatch.setitem(sys.modules, 'syncsketchGUI.installScripts', package)
+    monkeypatch.setitem(sys.modules, 'syncsketchGUI.installScripts.installGui',
+                        types.ModuleType('syncsketchGUI.installScripts.installGui'))
+    monkeypatch.delitem(sys.modules, 'syncsketchGUI.installScripts.maintenance', raising = False)
+    maintenance = importlib.import_module('syncsketchGUI.installScripts.maintenance')
+    monitor = FakeMonitor()
+    monkeypatch.setattr(maintenance.connection, 'get_monitor', lambda: monitor)
+    return maintenance
+
+
+def check(maintenance, repo, cache_file, ttl = 60):
+    return maintenance.VersionCheck(url = repo.url, cache_file = cache_file, ttl = ttl, timeout = 5).wait()
+
+
+def test_answer_is_reused_within_the_ttl(maintenance, repo, tmp_path):
+    cache_file = str(tmp_path / 'syncsketch_version.json')
+
+    assert check(maintenance, repo, cache_file) == '1.2.3'
+    repo.version = '1.2.4'
+    assert check(maintenance, repo, cache_file) == '1.2.3'
+    assert repo.requests == [None]
+
+    with open(cache_file) as f:
+        cached = json.load(f)
+    assert cached['etag'] == '"1.2.3"'
+    assert cached['url'] == repo.url
+
+
+def test_expired_answer_is_revalidated_with_its_etag(maintenance, repo, tmp_path, monkeypatch):
+    cache_file = str(tmp_path / 'syncsketch_version.json')
+    assert check(maintenance, repo, cache_file) == '1.2.3'
+
+    now = maintenance.time.time()
+    monkeypatch.setattr(maintenance.time, 'time', lambda: now + 120)
+    # unchanged, the repo answers an empty 304
+    assert check(maintenance, repo, cache_file) == '1.2.3'
+    assert repo.requests == [None, '"1.2.3"']
+    with open(cache_file) as f:
+        assert json.load(f)['checked_at'] == now + 120
+
+    monkeypatch.setattr(maintenance.time, 'time', lambda: now + 240)
+    repo.version = '1.2.4'
+    assert check(maintenance, repo, cache_file) == '1.2.4'
+    assert repo.requests == [None, '"1.2.3"', '"1.2.3"']
+
+
+def test_offline_answers_the_cache_without_asking(maintenance, repo, tmp_path):
+    cache_file = str(tmp_path / 'syncsketch_version.json')
+    maintenance.connection.get_monitor().is_offline = True
+    assert check(maintenance, repo, cache_file) is None
+
+    with open(cache_file, 'w') as f:
+        json.dump({'url': repo.url, 'version': '1.2.0', 'etag': '"1.2.0"', 'checked_at': 0}, f)
+    assert check(maintenance, repo, cache_file) == '1.2.0'
+    assert repo.requests == []
+
+
+def test_cache_of_another_repo_is_ignored(maintenance, repo, tmp_path):
+    cache_file = str(tmp_path / 'syncsketch_version.json')
+    with open(cache_file, 'w') as f:
+        json.dump({'url': 'http://127.0.0.1/dev/setup.py', 'version': '9.9.9', 'checked_at': 1e12}, f)
+    assert check(maintenance, repo, cache_file) == '1.2.3'
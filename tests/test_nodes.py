@@ -0,0 +1,48 @@
+'''
+Compact node records standing in for the api dicts
+'''
+import pytest
+
+from syncsketchGUI.lib import nodes
+
+
+def test_records_answer_like_the_api_dicts():
+    review = nodes.from_payload('review', {'id': 100, 'name': 'anim', 'uuid': 'bff609f9cbac',
+                                           'reviewURL': 'https://syncsketch.com/sketch/bff609f9cbac',
+                                           'thumbnail': 'https://syncsketch.invalid/t.png'})
+
+    assert isinstance(review, nodes.Review)
+    assert review['id'] == 100
+    assert review.get('name') == 'anim'
+    assert review.get('description', 'none') == 'none'
+    # fields that aren't kept read like missing keys
+    assert review.get('thumbnail') is None
+    assert 'thumbnail' not in review
+    assert 'uuid' in review
+    with pytest.raises(KeyError):
+        review['thumbnail']
+    assert review.to_dict() == {'id': 100, 'name': 'anim', 'description': None, 'uuid': 'bff609f9cbac',
+                                'reviewURL': 'https://syncsketch.com/sketch/bff609f9cbac'}
+
+
+def test_records_have_no_instance_dict():
+    account = nodes.Account(id = 1, name = 'studio')
+    assert not hasattr(account, '__dict__')
+    with pytest.raises(AttributeError):
+        account.projects = []
+
+
+def test_media_take_the_uuid_of_their_review():
+    review = nodes.from_payload('review', {'id': 100, 'uuid': ''.join(['bff609', 'f9cbac'])})
+    media = nodes.from_payload('media', {'id': 1000, 'name': 'sh010.mov', 'type': ''.join(['vid', 'eo'])}, review)
+    other = nodes.from_payload('media', {'id': 1001, 'type': 'video'}, review)
+
+    assert media['uuid'] == 'bff609f9cbac'
+    # repeated strings are shared
+    assert media.uuid is review.uuid
+    assert media.type is other.type
+
+
+def test_records_are_not_wrapped_twice():
+    project = nodes.Project(id = 10, name = 'show')
+    assert nodes.from_payload('project', project) is project
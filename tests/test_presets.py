@@ -0,0 +1,91 @@
+'''
+Preset repositories reading their yaml only when it changes
+'''
+import os
+
+import pytest
+
+from syncsketchGUI.lib import presets
+
+
+FORMAT_YAML = '''
+Standard:
+    encoding: H.264
+    format: qt
+    width: 1920
+    height: 1080
+Broken:
+    encoding: H.264
+    format: qt
+    width: 0
+    height: 1080
+'''
+
+
+@pytest.fixture
+def parses(monkeypatch):
+    parses = []
+    parse_yaml = presets.database._parse_yaml
+    monkeypatch.setattr(presets.database, '_parse_yaml', lambda yaml_file: parses.append(yaml_file) or parse_yaml(yaml_file))
+    return parses
+
+
+def write_yaml(filepath, text, mtime):
+    filepath.write_text(text)
+    os.utime(str(filepath), (mtime, mtime))
+
+
+def test_yaml_is_parsed_again_only_when_it_changes(tmp_path, parses):
+    yaml_file = tmp_path / 'syncsketch_preset.yaml'
+    write_yaml(yaml_file, FORMAT_YAML, 1000)
+    repository = presets.PresetRepository(str(yaml_file), presets.FormatPreset)
+
+    assert repository.names() == ['Standard']
+    assert repository.get('Standard').description == 'H.264 | qt | 1920x1080'
+    assert 'Standard' in repository
+    assert len(parses) == 1
+
+    write_yaml(yaml_file, FORMAT_YAML.replace('1920', '1280'), 2000)
+    assert repository.get('Standard')['width'] == 1280
+    assert len(parses) == 2
+
+    # the same signature is taken for the same file
+    repository.get('Standard')
+    assert len(parses) == 2
+    repository.invalidate()
+    repository.get('Standard')
+    assert len(parses) == 3
+
+
+def test_missing_file_has_no_presets(tmp_path, parses):
+    repository = presets.PresetRepository(str(tmp_path / 'missing.yaml'), presets.FormatPreset)
+    assert repository.names() == []
+    assert repository.get('Standard', 'none') == 'none'
+    assert parses == []
+
+
+def test_presets_are_read_only():
+    preset = presets.ViewportPreset('Default', {'viewport_options': {'grid': False}, 'camera_options': None})
+
+    options = preset['viewport_options']
+    options['grid'] = True
+    assert preset['viewport_options'] == {'grid': False}
+    copied = preset.to_dict()
+    copied['camera_options'] = {}
+    assert preset['camera_options'] is None
+    with pytest.raises(TypeError):
+        preset['camera_options'] = {}
+
+
+def test_invalid_presets_raise():
+    with pytest.raises(presets.PresetError):
+        presets.FormatPreset('Small', {'encoding': 'H.264', 'format': 'qt', 'width': 1920})
+    with pytest.raises(presets.PresetError):
+        presets.ViewportPreset('Default', {'viewport_options': 'grid'})
+    with pytest.raises(presets.PresetError):
+        presets.Preset('Default', ['grid'])
+
+
+def test_repositories_are_shared_per_file_and_kind():
+    assert presets.get_format_presets('studio.yaml') is presets.get_format_presets('studio.yaml')
+    assert presets.get_format_presets('studio.yaml') is not presets.get_viewport_presets('studio.yaml')
@@ -0,0 +1,178 @@
+'''
+playblast_batch with a fake maya and a fake capture
+'''
+import contextlib
+import importlib
+import os
+import sys
+import types
+
+import pytest
+
+pytest.importorskip('yaml')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+VIEWPORT_YAML = '''
+Default:
+    camera_options:
+        displayGateMask: false
+    viewport_options:
+        grid: false
+    display_options:
+        displayGradient: false
+'''
+
+
+class FakeCmds(object):
+    def __init__(self):
+        self.shots = {'sh020': ('shot020Cam', 1101.0, 1180.0), 'sh010': ('shot010Cam', 1001.0, 1100.0)}
+        self.dialogs = []
+        self.answer = 'Yes'
+
+    def ls(self, type = None):
+        return list(self.shots) if type == 'shot' else []
+
+    def shot(self, name, query = False, currentCamera = False, startTime = False, endTime = False):
+        camera, start_frame, end_frame = self.shots[name]
+        return camera if currentCamera else start_frame if startTime else end_frame
+
+    def confirmDialog(self, message = None, **kwargs):
+        self.dialogs.append(message)
+        return self.answer
+
+
+class FakeCapture(types.ModuleType):
+    '''
+    Records the sessions and captures, captures of failing cameras return None
+    '''
+    def __init__(self):
+        super(FakeCapture, self).__init__('syncsketchGUI.vendor.capture.capture')
+        self.sessions = []
+        self.captures = []
+        self.failing = set()
+
+    def CapturePanelPool(self):
+        return self
+
+    @contextlib.contextmanager
+    def activated(self):
+        yield
+
+    @contextlib.contextmanager
+    def capture_session(self, **options):
+        self.sessions.append(options)
+        yield 'capturePanel1'
+
+    def capture(self, panel = None, **options):
+        self.captures.append((panel, options))
+        if options['camera'] in self.failing:
+            return None
+        return options['filename']
+
+
+@pytest.fixture
+def maya(monkeypatch):
+    maya = types.ModuleType('maya')
+    maya.OpenMaya = types.ModuleType('maya.OpenMaya')
+    maya.cmds = FakeCmds()
+    maya.mel = types.ModuleType('maya.mel')
+    for name in ('maya', 'maya.OpenMaya', 'maya.cmds', 'maya.mel'):
+        monkeypatch.setitem(sys.modules, name, maya if name == 'maya' else getattr(maya, name.split('.')[-1]))
+    return maya
+
+
+@pytest.fixture
+def capture(monkeypatch):
+    # the vendored capture needs Qt, which only runs inside Maya
+    capture = FakeCapture()
+    for name in ('syncsketchGUI.vendor', 'syncsketchGUI.vendor.capture'):
+        package = types.ModuleType(name)
+        package.__path__ = [os.path.join(ROOT, *name.split('.'))]
+        monkeypatch.setitem(sys.modules, name, package)
+    sys.modules['syncsketchGUI.vendor.capture'].capture = capture
+    monkeypatch.setitem(sys.modules, 'syncsketchGUI.vendor.capture.capture', capture)
+    return capture
+
+
+@pytest.fixture
+def scene(maya, capture, monkeypatch):
+    monkeypatch.delitem(sys.modules, 'syncsketchGUI.lib.maya.capabilities', raising = False)
+    monkeypatch.delitem(sys.modules, 'syncsketchGUI.lib.maya.scene', raising = False)
+    scene = importlib.import_module('syncsketchGUI.lib.maya.scene')
+    scene.saved = []
+    monkeypatch.setattr(scene.database, 'save_last_recorded', lambda data: scene.saved.append(data))
+    monkeypatch.setattr(scene.database, 'dump_cache', lambda data: scene.saved.append(data))
+    return scene
+
+
+@pytest.fixture
+def viewport_yaml(tmp_path):
+    viewport_yaml = tmp_path / 'syncsketch_viewport.yaml'
+    viewport_yaml.write_text(VIEWPORT_YAML)
+    return str(viewport_yaml)
+
+
+def test_sequencer_shots_are_ordered_by_start_frame(scene):
+    assert scene.get_sequencer_shots() == [
+        {'name': 'sh010', 'camera': 'shot010Cam', 'start_frame': 1001.0, 'end_frame': 1100.0},
+        {'name': 'sh020', 'camera': 'shot020Cam', 'start_frame': 1101.0, 'end_frame': 1180.0}]
+
+
+def test_shots_share_one_capture_session(scene, capture, viewport_yaml, tmp_path):
+    output = str(tmp_path / 'seq')
+    shots = scene.get_sequencer_shots() + [{'camera': '|cams|ns:layoutCam'}]
+    captured = []
+
+    recorded = scene.playblast_batch(shots, viewport_preset = 'Default', viewport_preset_yaml = viewport_yaml,
+                                     on_captured = lambda shot, playblast_file: captured.append(playblast_file),
+                                     filename = output, format = 'qt', compression = 'H.264',
+                                     width = 1280, height = 720, start_frame = 1, end_frame = 24)
+
+    # the panel wide options are applied once
+    assert capture.sessions == [{'width': 1280, 'height': 720, 'off_screen': False,
+                                 'display_options': {'displayGradient': False},
+                                 'viewport_options': {'grid': False}, 'viewport2_options': None}]
+    assert [panel for panel, options in capture.captures] == ['capturePanel1'] * 3
+    assert [(options['camera'], options['start_frame'], options['end_frame'], options['filename'])
+            for panel, options in capture.captures] == [
+        ('shot010Cam', 1001.0, 1100.0, output + '_sh010'),
+        ('shot020Cam', 1101.0, 1180.0, output + '_sh020'),
+        ('|cams|ns:layoutCam', 1, 24, output + '_layoutCam')]
+    for panel, options in capture.captures:
+        assert options['camera_options'] == {'displayGateMask': False}
+        assert 'viewport_options' not in options
+        assert options['viewer'] is False
+
+    assert captured == [output + '_sh010.mov', output + '_sh020.mov', output + '_layoutCam.mov']
+    assert [playblast_file for shot, playblast_file in recorded] == captured
+    assert scene.saved[-1] == {'last_recorded_selection': output + '_layoutCam.mov'}
+    assert scene.saved[0]['start_frame'] == 1
+
+
+def test_failed_shots_are_left_out(scene, capture, tmp_path):
+    capture.failing.add('shot020Cam')
+    output = str(tmp_path / 'seq')
+
+    recorded = scene.playblast_batch(scene.get_sequencer_shots(), filename = output, format = 'qt', compression = 'H.264')
+
+    assert [shot['name'] for shot, playblast_file in recorded] == ['sh010']
+    assert scene.saved[-1] == {'last_recorded_selection': output + '_sh010.mov'}
+
+
+def test_overwrite_is_confirmed_once_for_the_batch(scene, capture, maya, tmp_path):
+    output = str(tmp_path / 'seq')
+    for name in ('sh010', 'sh020'):
+        open('{}_{}.mov'.format(output, name), 'w').close()
+    maya.cmds.answer = 'No'
+
+    recorded = scene.playblast_batch(scene.get_sequencer_shots(), filename = output, format = 'qt', compression = 'H.264')
+
+    assert recorded == []
+    assert maya.cmds.dialogs == ['2 of the 2 playblasts already exist.\nDo you want to replace them?']
+    assert capture.captures == []
+
+    maya.cmds.answer = 'Yes'
+    recorded = scene.playblast_batch(scene.get_sequencer_shots(), filename = output, format = 'qt', compression = 'H.264')
+    assert len(recorded) == 2
+    assert len(maya.cmds.dialogs) == 2
@@ -0,0 +1,57 @@
+'''
+Prefix search of the review browser
+'''
+from syncsketchGUI.lib import search_index
+
+
+def make_index():
+    index = search_index.SearchIndex()
+    index.add('anim', {'id': 100, 'name': 'Shot_010 anim', 'uuid': 'bff609f9cbac'})
+    index.add('layout', {'id': 101, 'name': 'Shot_020 layout', 'uuid': 'c0ffee000000'})
+    index.add('show', {'id': 10, 'name': 'Big Show'})
+    return index
+
+
+def test_tokenize_splits_names_into_lower_case_words():
+    assert search_index.tokenize('Shot_010 v2-final') == ['shot', '010', 'v2', 'final']
+    assert search_index.tokenize(100) == ['100']
+    assert search_index.tokenize(None) == []
+
+
+def test_every_word_of_the_query_is_a_prefix():
+    index = make_index()
+    assert index.search('sho') == {'anim', 'layout', 'show'}
+    assert index.search('shot lay') == {'layout'}
+    assert index.search('LAYOUT shot') == {'layout'}
+    assert index.search('shot big') == set()
+    assert index.search('missing') == set()
+    # an empty query filters nothing
+    assert index.search(' _ ') is None
+
+
+def test_ids_and_uuids_are_searched():
+    index = make_index()
+    assert index.search('bff6') == {'anim'}
+    assert index.find('101') == {'layout'}
+    assert index.find('10') == {'show'}
+    assert index.find('c0ffee') == set()
+
+
+def test_removed_and_replaced_records_are_not_found():
+    index = make_index()
+    index.remove('anim')
+    assert 'anim' not in index
+    assert index.search('anim') == set()
+    assert index.search('shot') == {'layout'}
+    # nothing is left of the words only the removed record had
+    assert 'a' not in index._root.children
+    assert 'bff609f9cbac' not in index._words
+
+    index.add('layout', {'id': 101, 'name': 'Shot_020 blocking'})
+    assert index.search('layout') == set()
+    assert index.search('block') == {'layout'}
+    assert len(index) == 2
+
+    index.clear()
+    assert len(index) == 0
+    assert index.search('shot') == set()
@@ -0,0 +1,101 @@
+'''
+SingleFlight sharing api calls that are in flight
+'''
+import threading
+
+import pytest
+
+pytest.importorskip('syncsketch')
+
+from syncsketchGUI.lib import user
+
+
+class SlowCall(object):
+    '''
+    Blocks until released, counts how often it ran
+    '''
+    def __init__(self, result = None, error = None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, *args):
+        self.calls += 1
+        self.started.set()
+        assert self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def run_callers(flight, key, fn, count):
+    '''
+    Start the leader and count - 1 callers joining it, returns their results
+    '''
+    results = []
+    lock = threading.Lock()
+
+    def caller():
+        try:
+            result = flight.do(key, fn, key)
+        except Exception as err:
+            result = err
+        with lock:
+            results.append(result)
+
+    threads = [threading.Thread(target = caller)]
+    threads[0].start()
+    assert fn.started.wait(5)
+    for _ in range(count - 1):
+        thread = threading.Thread(target = caller)
+        thread.start()
+        threads.append(thread)
+    # the joining callers are counted before they wait
+    for _ in range(5000):
+        if flight.shared == count - 1:
+            break
+        threading.Event().wait(0.001)
+    fn.release.set()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+def test_callers_of_the_same_key_share_one_call():
+    flight = user.SingleFlight()
+    tree = SlowCall(result = [{'id': 1}])
+
+    results = run_callers(flight, ('tree', False), tree, 4)
+
+    assert tree.calls == 1
+    assert flight.shared == 3
+    assert all(result is tree.result for result in results)
+    # a finished call isn't reused
+    assert flight.do(('tree', False), lambda key: 'again', None) == 'again'
+
+
+def test_error_reaches_every_caller():
+    flight = user.SingleFlight()
+    error = IOError('connection reset')
+    review = SlowCall(error = error)
+
+    results = run_callers(flight, ('review', 5), review, 3)
+
+    assert review.calls == 1
+    assert results == [error] * 3
+    assert flight.do(('review', 5), lambda key: {'id': 5}, None) == {'id': 5}
+
+
+def test_other_keys_run_their_own_call():
+    flight = user.SingleFlight()
+    first = SlowCall(result = 'first')
+    thread = threading.Thread(target = flight.do, args = (('item', 1), first, 1))
+    thread.start()
+    assert first.started.wait(5)
+
+    assert flight.do(('item', 2), lambda media_id: 'second', 2) == 'second'
+    assert flight.shared == 0
+    first.release.set()
+    thread.join(5)
@@ -0,0 +1,91 @@
+'''
+Parsing of the getTree response, with and without ijson
+'''
+import decimal
+import json
+
+from syncsketchGUI.lib import tree_stream
+
+
+TREE = [{
+    'id': 1, 'name': 'studio', 'active': True, 'logo': None,
+    'owner': {'id': 7, 'name': 'producer'},
+    'projects': [{
+        'id': 10, 'name': 'show', 'fps': 23.976,
+        'settings': {'reviews': [{'id': 99}]},
+        'reviews': [
+            {'id': 100, 'name': 'anim', 'uuid': 'bff609f9cbac', 'tags': ['wip', 'layout'],
+             'items': [{'id': 1000, 'name': 'sh010.mov', 'type': 'video',
+                        'thumbnails': {'small': 'https://syncsketch.invalid/t.png'}}]},
+            {'id': 101, 'name': 'empty', 'uuid': 'c0ffee000000'},
+        ],
+    }],
+}, {
+    'id': 2, 'name': 'freelance', 'projects': [],
+}]
+
+
+def _join(prefix, key):
+    return '{}.{}'.format(prefix, key) if prefix else key
+
+
+def ijson_events(value, prefix = ''):
+    '''
+    The events ijson.parse() yields for a parsed document
+    '''
+    if isinstance(value, dict):
+        yield prefix, 'start_map', None
+        for key, child in value.items():
+            yield prefix, 'map_key', key
+            for event in ijson_events(child, _join(prefix, key)):
+                yield event
+        yield prefix, 'end_map', None
+    elif isinstance(value, list):
+        yield prefix, 'start_array', None
+        for child in value:
+            for event in ijson_events(child, _join(prefix, 'item')):
+                yield event
+        yield prefix, 'end_array', None
+    elif value is None:
+        yield prefix, 'null', None
+    elif isinstance(value, bool):
+        yield prefix, 'boolean', value
+    elif isinstance(value, (int, float)):
+        # ijson answers decimals for numbers with a fraction
+        yield prefix, 'number', decimal.Decimal(str(value)) if isinstance(value, float) else value
+    else:
+        yield prefix, 'string', value
+
+
+def test_events_and_json_give_the_same_compact_tree():
+    compact = tree_stream._compact(json.loads(json.dumps(TREE)))
+    assert tree_stream._parse_events(ijson_events(TREE)) == compact
+
+    project = compact[0]['projects'][0]
+    assert project['fps'] == 23.976
+    assert 'settings' not in project
+    assert 'owner' not in compact[0]
+    assert 'tags' not in project['reviews'][0]
+    assert project['reviews'][0]['items'] == [{'id': 1000, 'name': 'sh010.mov', 'type': 'video'}]
+    # nodes without children still get their child list
+    assert project['reviews'][1]['items'] == []
+    assert compact[1]['projects'] == []
+
+
+def test_load_tree_reads_a_response_file(tmp_path):
+    filepath = tmp_path / 'tree.json'
+    filepath.write_text(json.dumps(TREE))
+    assert tree_stream.load_tree(str(filepath)) == tree_stream._compact(TREE)
+
+
+def test_iter_nodes_walks_parents_before_children():
+    tree_nodes = list(tree_stream.iter_nodes(tree_stream._compact(TREE)))
+
+    assert [(node.kind, node.data.id, node.child_count) for node in tree_nodes] == [
+        ('account', 1, 1), ('project', 10, 2), ('review', 100, 1), ('media', 1000, 0),
+        ('review', 101, 0), ('account', 2, 0)]
+    media = tree_nodes[3]
+    assert media.parent is tree_nodes[2]
+    # links to media are made of the uuid of their review
+    assert media.data['uuid'] == 'bff609f9cbac'
+    assert media.data['type'] == 'video'
@@ -0,0 +1,120 @@
+'''
+TreeSync against a fake SyncSketch api
+'''
+import datetime
+
+import pytest
+
+pytest.importorskip('syncsketch')
+
+from syncsketchGUI.lib import tree_sync
+
+
+class FakeApi(object):
+    HOST = 'https://syncsketch.invalid'
+    user_auth = 'artist@studio.com'
+
+    def __init__(self):
+        self.reviews = {1: {'id': 1, 'name': 'anim', 'project': 10},
+                        2: {'id': 2, 'name': 'layout', 'project': 10}}
+        self.calls = []
+
+    def getTree(self, withItems = False):
+        self.calls.append('tree')
+        reviews = [dict(tree_sync.review_node(review), items = review.get('items') or [])
+                   for review in self.reviews.values()]
+        return [{'id': 1, 'name': 'studio', 'projects': [{'id': 10, 'name': 'show', 'reviews': reviews}]}]
+
+    def getProjects(self):
+        return {'objects': [{'id': 10, 'name': 'show', 'account': 1, 'modified': '2026-01-01T00:00:00'}]}
+
+    def get_reviews(self, limit = 100, offset = 0, **filters):
+        # like the api, deleted reviews are not listed
+        self.calls.append('delta')
+        reviews = [review for review in self.reviews.values() if review.get('modified', '') >= filters['modified__gte']]
+        return {'meta': {'total_count': len(reviews)}, 'objects': reviews}
+
+    def getMediaByReviewId(self, review_id):
+        self.calls.append('items')
+        return {'objects': list(self.reviews[review_id].get('items') or [])}
+
+    def getReviewsByProjectId(self, project_id):
+        return {'objects': list(self.reviews.values())}
+
+
+def _review_ids(tree):
+    return sorted(review['id'] for review in tree[0]['projects'][0]['reviews'])
+
+
+def test_deleted_reviews_leave_the_tree_with_the_next_full_sync(tmp_path, monkeypatch):
+    api = FakeApi()
+    sync = tree_sync.TreeSync(api, snapshot_file = str(tmp_path / 'tree.json'))
+    assert _review_ids(sync.refresh()) == [1, 2]
+    assert sync.last_mode == tree_sync.FULL
+
+    del api.reviews[2]
+    assert _review_ids(sync.refresh()) == [1, 2]
+    assert sync.last_mode == tree_sync.DELTA
+
+    later = tree_sync._utc_now() + datetime.timedelta(seconds = tree_sync.FULL_SYNC_INTERVAL + 1)
+    monkeypatch.setattr(tree_sync, '_utc_now', lambda: later)
+    assert _review_ids(sync.refresh()) == [1]
+    assert sync.last_mode == tree_sync.FULL
+    assert api.calls == ['tree', 'delta', 'tree']
+
+
+def test_snapshot_without_full_sync_time_is_synced_in_full(tmp_path):
+    api = FakeApi()
+    sync = tree_sync.TreeSync(api, snapshot_file = str(tmp_path / 'tree.json'))
+    sync.refresh()
+    del sync.snapshot['full_synced_at']
+
+    sync.refresh()
+    assert sync.last_mode == tree_sync.FULL
+
+
+def test_cached_review_items_come_from_the_snapshot(tmp_path):
+    api = FakeApi()
+    api.reviews[1]['items'] = [{'id': 100, 'name': 'shot010.mov'}]
+    sync = tree_sync.TreeSync(api, snapshot_file = str(tmp_path / 'tree.json'))
+    sync.refresh(with_items = True)
+
+    offline = tree_sync.TreeSync(api, snapshot_file = str(tmp_path / 'tree.json'))
+    assert offline.cached_review_items('1') == [{'id': 100, 'name': 'shot010.mov'}]
+    assert offline.cached_review_items(2) == []
+    assert offline.cached_review_items(3) == []
+    assert api.calls == ['tree']
+
+
+def test_delta_updates_the_items_of_changed_reviews(tmp_path):
+    api = FakeApi()
+    api.reviews[1]['items'] = [{'id': 100, 'name': 'v1'}]
+    sync = tree_sync.TreeSync(api, snapshot_file = str(tmp_path / 'tree.json'))
+    sync.refresh(with_items = True)
+    assert sync.cached_review_items(1) == [{'id': 100, 'name': 'v1'}]
+
+    api.reviews[1]['items'].append({'id': 101, 'name': 'v2'})
+    api.reviews[1]['modified'] = (tree_sync._utc_now() + datetime.timedelta(seconds = 1)).isoformat()
+    sync.refresh(with_items = True)
+
+    assert sync.last_mode == tree_sync.DELTA
+    assert [item['id'] for item in sync.cached_review_items(1)] == [100, 101]
+    # the unchanged review keeps its items without asking
+    assert api.calls == ['tree', 'delta', 'items']
+
+
+def test_refresh_drops_cached_reviews_and_projects(tmp_path, monkeypatch):
+    invalidated = []
+    monkeypatch.setattr(tree_sync.client, 'invalidate_cache', lambda *endpoints: invalidated.extend(endpoints))
+    sync = tree_sync.TreeSync(FakeApi(), snapshot_file = str(tmp_path / 'tree.json'))
+
+    sync.refresh()
+
+    assert set(invalidated) == {'review', 'project'}
+
+
+def test_unwritable_snapshot_is_not_an_error(tmp_path):
+    sync = tree_sync.TreeSync(FakeApi(), snapshot_file = str(tmp_path / 'missing' / 'tree.json'))
+
+    assert _review_ids(sync.refresh()) == [1, 2]
+    assert sync.last_mode == tree_sync.FULL
@@ -0,0 +1,174 @@
+'''
+upload_media retrying addMedia of a fake SyncSketch api, send_media against
+a local stand-in of the upload view
+'''
+import json
+import os
+import socket
+import threading
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+requests = pytest.importorskip('requests')
+
+from syncsketchGUI.lib import upload
+
+
+class HostData(object):
+    HOST = 'https://syncsketch.invalid'
+    headers = {'Authorization': 'apikey test'}
+    api_params = {}
+
+    def __init__(self, failures = 0, response = None):
+        self.failures = failures
+        self.response = response or {'id': 7}
+        self.calls = 0
+
+    def addMedia(self, review_id, filepath, noConvertFlag = False, itemParentId = False):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise requests.exceptions.ConnectionError('connection reset')
+        return self.response
+
+
+class UploadView(HTTPServer):
+    def __init__(self):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), UploadHandler)
+        self.requests = []
+
+
+class UploadHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        # like Django, the body is read by its Content-Length only
+        length = self.headers.get('Content-Length')
+        body = self.rfile.read(int(length)) if length else b''
+        self.server.requests.append((dict(self.headers), body))
+        reply = json.dumps({'id': 7}).encode('utf-8')
+        self.send_response(200 if length else 411)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+
+@pytest.fixture
+def upload_view():
+    server = UploadView()
+    thread = threading.Thread(target = server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _closed_port():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+class BrokenSession(object):
+    '''
+    Drops the connection after the first part of the body went out
+    '''
+    def post(self, url, data = None, **kwargs):
+        data.read(1024)
+        raise requests.exceptions.ConnectionError('connection reset')
+
+
+@pytest.fixture
+def media(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload, 'BACKOFF', 0.0)
+    media = tmp_path / 'shot.mov'
+    media.write_bytes(os.urandom(10 * 1024))
+    return str(media)
+
+
+def test_dropped_connection_is_retried(media):
+    host_data = HostData(failures = 2)
+    progress = []
+
+    item = upload.upload_media(host_data, 42, media, on_progress = progress.append)
+
+    assert item == {'id': 7}
+    assert host_data.calls == 3
+    assert [report['bytes_sent'] for report in progress] == [0, 10 * 1024]
+    assert progress[-1]['total'] == 10 * 1024
+    assert progress[-1]['percent'] == 100.0
+
+
+def test_gives_up_after_max_retries(media):
+    host_data = HostData(failures = 10)
+
+    with pytest.raises(upload.UploadError):
+        upload.upload_media(host_data, 42, media, max_retries = 2)
+    assert host_data.calls == 3
+
+
+def test_error_response_is_not_retried(media):
+    # addMedia returns None when the server answered with an error page
+    host_data = HostData()
+    host_data.response = None
+
+    with pytest.raises(upload.UploadError):
+        upload.upload_media(host_data, 42, media)
+    assert host_data.calls == 1
+
+
+def test_cancelled_upload_stops_retrying(media):
+    host_data = HostData(failures = 1)
+    attempts = []
+    def is_cancelled():
+        attempts.append(True)
+        return len(attempts) > 1
+
+    with pytest.raises(upload.UploadAborted):
+        upload.upload_media(host_data, 42, media, is_cancelled = is_cancelled)
+    assert host_data.calls == 1
+
+
+def test_send_media_posts_a_sized_body(upload_view, media):
+    host_data = HostData()
+    host_data.HOST = 'http://127.0.0.1:{}'.format(upload_view.server_address[1])
+    progress = []
+
+    item = upload.send_media(host_data, 42, media, on_progress = progress.append)
+
+    assert item == {'id': 7}
+    headers, body = upload_view.requests[0]
+    assert int(headers['Content-Length']) == len(body)
+    assert 'Transfer-Encoding' not in headers
+    with open(media, 'rb') as f:
+        assert f.read() in body
+    assert progress[-1]['total'] == len(body)
+    assert progress[-1]['percent'] == 100.0
+
+
+def test_send_media_falls_back_before_the_body_goes_out(media):
+    host_data = HostData()
+    host_data.HOST = 'http://127.0.0.1:{}'.format(_closed_port())
+
+    item = upload.send_media(host_data, 42, media, fallback = lambda: upload.upload_media(host_data, 42, media))
+
+    assert item == {'id': 7}
+    assert host_data.calls == 1
+
+
+def test_send_media_never_sends_the_file_twice(media):
+    host_data = HostData()
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        upload.send_media(host_data, 42, media, session = BrokenSession(),
+                          fallback = lambda: upload.upload_media(host_data, 42, media))
+    assert host_data.calls == 0
@@ -0,0 +1,198 @@
+'''
+UploadQueue batches with fake Qt signals, a fake user and no network
+'''
+import importlib
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+requests = pytest.importorskip('requests')
+
+from syncsketchGUI.lib import connection
+from syncsketchGUI.lib import user
+
+
+class FakeSignal(object):
+    def __init__(self):
+        self.emitted = []
+
+    def emit(self, *args):
+        self.emitted.append(args)
+
+
+class FakeSignals(object):
+    def __init__(self):
+        for name in ('queued', 'progress', 'finished', 'error', 'batch_finished'):
+            setattr(self, name, FakeSignal())
+
+
+class FakeMonitor(object):
+    is_offline = False
+
+    def __init__(self):
+        self.observers = []
+
+    def add_observer(self, observer):
+        self.observers.append(observer)
+
+    def set_offline(self, offline):
+        self.is_offline = offline
+        for observer in self.observers:
+            observer(not offline)
+
+
+class FakeUser(object):
+    def __init__(self):
+        self.lookups = []
+        self.uploads = []
+        self.running = 0
+        self.most_running = 0
+        self.lock = threading.Lock()
+
+    def upload_media_to_review(self, review_id, filepath, **kwargs):
+        with self.lock:
+            self.uploads.append(filepath)
+            self.running += 1
+            self.most_running = max(self.most_running, self.running)
+        try:
+            # give the other workers the chance to run next to this one
+            time.sleep(0.02)
+            if 'broken' in filepath:
+                raise IOError('connection reset')
+            kwargs['on_progress']({'bytes_sent': 10, 'total': 10, 'percent': 100.0})
+            return {'id': len(filepath)}
+        finally:
+            with self.lock:
+                self.running -= 1
+
+    def get_review_data_from_id(self, review_id):
+        self.lookups.append([int(review_id)])
+        return {'id': review_id, 'reviewURL': 'https://syncsketch.invalid/review/{}'.format(review_id)}
+
+    def get_review_urls(self, review_ids):
+        self.lookups.append(sorted(set(int(review_id) for review_id in review_ids)))
+        return dict((int(review_id), 'https://syncsketch.invalid/review/{}'.format(review_id))
+                    for review_id in review_ids)
+
+
+@pytest.fixture
+def monitor(monkeypatch):
+    monitor = FakeMonitor()
+    monkeypatch.setattr(connection, 'get_monitor', lambda: monitor)
+    return monitor
+
+
+@pytest.fixture
+def upload_queue(monkeypatch, monitor):
+    # the real signals need Qt, which only runs inside Maya
+    a_sync = types.ModuleType('syncsketchGUI.lib.a_sync')
+    a_sync.UploadQueueSignals = FakeSignals
+    monkeypatch.setitem(sys.modules, 'syncsketchGUI.lib.a_sync', a_sync)
+    monkeypatch.delitem(sys.modules, 'syncsketchGUI.lib.upload_queue', raising = False)
+    return importlib.import_module('syncsketchGUI.lib.upload_queue')
+
+
+@pytest.fixture
+def current_user(monkeypatch):
+    current_user = FakeUser()
+    monkeypatch.setattr(user, 'get_current_user', lambda: current_user)
+    return current_user
+
+
+def test_uploads_run_in_the_background(upload_queue, current_user):
+    queue = upload_queue.UploadQueue(max_concurrent = 2)
+    tasks = [queue.submit(upload_queue.UploadTask('/shots/sh{}.mov'.format(i), 5)) for i in range(5)]
+
+    assert queue.wait_all(5)
+
+    assert sorted(current_user.uploads) == sorted(task.filepath for task in tasks)
+    assert current_user.most_running == 2
+    assert queue.signals.queued.emitted == [(task,) for task in tasks]
+    assert set(queue.signals.finished.emitted) == set((task,) for task in tasks)
+    assert len(queue.signals.progress.emitted) == 5
+    assert tasks[0].uploaded_item == {'id': 14, 'reviewURL': 'https://syncsketch.invalid/review/5#14'}
+    assert queue.tasks == []
+
+
+def test_failed_upload_reports_its_error(upload_queue, current_user):
+    queue = upload_queue.UploadQueue()
+    broken = queue.submit(upload_queue.UploadTask('/shots/broken.mov', 5))
+    fine = queue.submit(upload_queue.UploadTask('/shots/sh1.mov', 5))
+
+    assert queue.wait_all(5)
+
+    assert [task for task, message in queue.signals.error.emitted] == [broken]
+    assert 'connection reset' in queue.signals.error.emitted[0][1]
+    assert queue.signals.finished.emitted == [(fine,)]
+    assert broken.uploaded_item is None
+
+
+def test_uploads_queued_offline_start_when_back_online(upload_queue, current_user, monitor):
+    monitor.is_offline = True
+    queue = upload_queue.UploadQueue()
+    task = queue.submit(upload_queue.UploadTask('/shots/sh1.mov', 5))
+
+    assert queue.held_tasks == [task]
+    assert queue.wait_all(5)
+    assert current_user.uploads == []
+
+    monitor.set_offline(False)
+    assert queue.wait_all(5)
+    assert queue.held_tasks == []
+    assert queue.signals.finished.emitted == [(task,)]
+
+
+def test_batch_looks_up_its_review_urls_once(upload_queue, current_user):
+    queue = upload_queue.UploadQueue()
+    tasks = [upload_queue.UploadTask('/shots/sh{}.mov'.format(i), review_id) for i, review_id in ((1, 5), (2, 5), (3, 6))]
+
+    batch = queue.submit_batch(tasks)
+    assert queue.wait_all(5)
+
+    assert queue.signals.batch_finished.emitted == [(batch,)]
+    # uploads of a batch only report as a whole
+    assert queue.signals.finished.emitted == []
+    assert current_user.lookups == [[5, 6]]
+    assert [item['reviewURL'] for item in batch.uploaded_items] == [
+        'https://syncsketch.invalid/review/5#14', 'https://syncsketch.invalid/review/5#14',
+        'https://syncsketch.invalid/review/6#14']
+
+
+def test_empty_batch_finishes_quietly(upload_queue, current_user):
+    queue = upload_queue.UploadQueue()
+
+    queue.close_batch(queue.open_batch())
+
+    assert queue.wait_all(5)
+    assert queue.signals.batch_finished.emitted == []
+    assert current_user.lookups == []
+
+
+class HostData(object):
+    HOST = 'https://syncsketch.invalid'
+    api_params = {}
+    headers = {}
+
+    def get_api_base_url(self):
+        return self.HOST + '/api/v1/'
+
+    def getReviewById(self, review_id):
+        # the api answers None for reviews that are gone
+        return {'id': 6, 'reviewURL': 'https://syncsketch.invalid/review/6'} if review_id == 6 else None
+
+
+class OfflineSession(object):
+    def get(self, url, **kwargs):
+        raise requests.exceptions.ConnectionError('offline')
+
+
+def test_review_urls_of_missing_reviews_are_none(monkeypatch):
+    monkeypatch.setattr(user.client, 'get_session', lambda: OfflineSession())
+    current_user = user.SyncSketchUser()
+    host_data = HostData()
+    monkeypatch.setattr(current_user, 'auto_login', lambda: setattr(current_user, 'host_data', host_data) or host_data)
+
+    assert current_user.get_review_urls([5, 6]) == {5: None, 6: 'https://syncsketch.invalid/review/6'}
@@ -0,0 +1,58 @@
+'''
+Parsing and building of review links
+'''
+import pytest
+
+from syncsketchGUI.lib import urls
+
+
+@pytest.fixture(autouse = True)
+def empty_cache():
+    urls.clear_cache()
+    yield
+    urls.clear_cache()
+
+
+@pytest.mark.parametrize('link, expected', [
+    ('https://syncsketch.com/sketch/bff609f9cbac', ('bff609f9cbac', None, None)),
+    ('https://www.syncsketch.com/sketch/bff609f9cbac/', ('bff609f9cbac', None, None)),
+    ('syncsketch.com/sketch/BFF609F9CBAC', ('bff609f9cbac', None, None)),
+    ('https://www.syncsketch.com/sketch/bff609f9cbac/#711273', ('bff609f9cbac', 711273, None)),
+    ('https://syncsketch.com/sketch/bff609f9cbac#711273/637821', ('bff609f9cbac', 711273, 637821)),
+    ('https://syncsketch.com/sketch/bff609f9cbac?offlineMode=1#711273', ('bff609f9cbac', 711273, None)),
+    ('  http://syncsketch.com/sketch/bff609f9cbac#/711273/  ', ('bff609f9cbac', 711273, None)),
+])
+def test_review_links_are_parsed(link, expected):
+    assert urls.parse_review_url(link) == urls.ReviewUrl(*expected)
+
+
+@pytest.mark.parametrize('link', [
+    None, '', 'https://example.com/sketch/bff609f9cbac', 'https://syncsketch.com/sketch/bff609',
+    'https://syncsketch.com/sketch/bff609f9cbac#media', 'https://syncsketch.com/sketch/bff609f9cbac/extra',
+])
+def test_other_links_are_not_review_links(link):
+    assert urls.parse_review_url(link) is None
+
+
+def test_make_review_url_builds_what_is_parsed():
+    link = urls.make_review_url('bff609f9cbac', 711273, 637821)
+    assert link == 'https://syncsketch.com/sketch/bff609f9cbac#711273/637821'
+    assert urls.parse_review_url(link) == ('bff609f9cbac', 711273, 637821)
+    # a revision without its media isn't linked
+    assert urls.make_review_url('bff609f9cbac', revision_id = 637821) == 'https://syncsketch.com/sketch/bff609f9cbac'
+
+
+def test_only_the_most_recent_links_are_cached(monkeypatch):
+    monkeypatch.setattr(urls, 'URL_CACHE_SIZE', 2)
+    parsed = []
+    parse = urls._parse
+    monkeypatch.setattr(urls, '_parse', lambda link: parsed.append(link) or parse(link))
+
+    first = urls.make_review_url('bff609f9cbac', 1)
+    second = urls.make_review_url('bff609f9cbac', 2)
+    third = urls.make_review_url('bff609f9cbac', 3)
+    for link in (first, second, first, third, first, second):
+        urls.parse_review_url(link)
+
+    # first was used again before third came in, so second was the one dropped
+    assert parsed == [first, second, third, second]
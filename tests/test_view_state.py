@@ -0,0 +1,267 @@
+'''
+ViewState against a fake cmds module
+'''
+import re
+
+from syncsketchGUI.lib.maya import view_state
+
+
+class FakeCmds(object):
+    '''
+    The commands ViewState uses, edits are recorded in calls
+    '''
+    def __init__(self):
+        self.calls = []
+        self.attrs = {'cam1.overscan': 1.0, 'cam1.displayResolution': False,
+                      'hardwareRenderingGlobals.ssaoEnable': False}
+        self.prefs = {'displayGradient': True}
+        self.rgb = {'background': [(0.631, 0.631, 0.631)]}
+        self.editor = {'grid': True, 'polymeshes': True, 'displayAppearance': 'smoothShaded'}
+        self.plugins = {'gpuCache': True}
+
+    @property
+    def edits(self):
+        return [call for call in self.calls if isinstance(call, tuple)]
+
+    def pluginDisplayFilter(self, query = False, listFilters = False):
+        self.calls.append('pluginDisplayFilter')
+        return list(self.plugins)
+
+    def modelPanel(self, panel, query = False, camera = False):
+        return 'cam1'
+
+    def displayRGBColor(self, key, *values, **kwargs):
+        if kwargs.get('query'):
+            return self.rgb[key]
+        self.calls.append(('displayRGBColor', key))
+        self.rgb[key] = [tuple(values)]
+
+    def displayPref(self, **kwargs):
+        if kwargs.pop('query', False):
+            return self.prefs[list(kwargs)[0]]
+        self.calls.append(('displayPref', tuple(sorted(kwargs))))
+        self.prefs.update(kwargs)
+
+    def getAttr(self, attr):
+        if attr not in self.attrs:
+            raise ValueError(attr)
+        return self.attrs[attr]
+
+    def setAttr(self, attr, value):
+        self.calls.append(('setAttr', attr))
+        self.attrs[attr] = value
+
+    def modelEditor(self, panel, query = False, edit = False, **kwargs):
+        if query:
+            if 'queryPluginObjects' in kwargs:
+                return self.plugins[kwargs['queryPluginObjects']]
+            key = list(kwargs)[0]
+            if key not in self.editor:
+                raise TypeError(key)
+            return self.editor[key]
+        self.calls.append(('modelEditor', tuple(sorted(kwargs))))
+        for name, value in kwargs.pop('pluginObjects', []):
+            self.plugins[name] = value
+        self.editor.update(kwargs)
+
+
+PRESET = {
+    'display_options': {'displayGradient': True, 'background': (0.631, 0.631, 0.631)},
+    'camera_options': {'overscan': 1.0000001, 'displayResolution': True},
+    'viewport_options': {'grid': False, 'polymeshes': True, 'displayAppearance': 'wireframe',
+                         'gpuCache': False, 'notAFlag': 1},
+    'viewport2_options': {'ssaoEnable': False, 'notAnAttribute': 3},
+}
+
+
+def test_diff_keeps_only_what_differs():
+    current = {
+        'display_options': {'background': [(0.5, 0.5, 0.5)]},
+        'camera_options': {'overscan': 1.0},
+        'viewport_options': {'grid': True, 'polymeshes': True},
+    }
+    target = {
+        'display_options': {'background': (0.5, 0.5, 0.5000001)},
+        'camera_options': {'overscan': 1.3},
+        # options current couldn't read are never sent
+        'viewport_options': {'grid': False, 'polymeshes': True, 'notAFlag': True},
+    }
+    changes = view_state.diff(current, target)
+    assert changes == {'camera_options': {'overscan': 1.3}, 'viewport_options': {'grid': False}}
+    assert view_state.count_changes(changes) == 2
+
+
+def test_apply_sends_the_changes_with_one_command_per_kind():
+    cmds = FakeCmds()
+    state = view_state.ViewState(cmds)
+
+    previous = state.apply('modelPanel1', PRESET)
+
+    assert previous == {
+        'camera_options': {'displayResolution': False},
+        'viewport_options': {'grid': True, 'displayAppearance': 'smoothShaded', 'gpuCache': True},
+    }
+    assert sorted(cmds.edits) == sorted([
+        ('setAttr', 'cam1.displayResolution'),
+        ('modelEditor', ('displayAppearance', 'grid')),
+        ('modelEditor', ('pluginObjects',)),
+    ])
+    assert cmds.editor['grid'] is False and cmds.plugins['gpuCache'] is False
+
+    # the panel looks like the preset now, nothing is sent again
+    del cmds.calls[:]
+    assert state.apply('modelPanel1', PRESET) == {}
+    assert cmds.edits == []
+
+
+def test_applying_the_previous_values_restores_the_panel():
+    cmds = FakeCmds()
+    state = view_state.ViewState(cmds)
+    before = (dict(cmds.attrs), dict(cmds.editor), dict(cmds.plugins))
+
+    state.apply('modelPanel1', state.apply('modelPanel1', PRESET))
+
+    assert (cmds.attrs, cmds.editor, cmds.plugins) == before
+
+
+def test_applied_restores_on_exit():
+    cmds = FakeCmds()
+    state = view_state.ViewState(cmds)
+
+    with state.applied('modelPanel1', camera_options = {'overscan': 2.0}, viewport_options = {'grid': False}):
+        assert cmds.attrs['cam1.overscan'] == 2.0
+        assert cmds.editor['grid'] is False
+    assert cmds.attrs['cam1.overscan'] == 1.0
+    assert cmds.editor['grid'] is True
+
+    # the model editor of a panel about to be deleted isn't restored
+    with state.applied('modelPanel1', restore = ('camera_options',),
+                       camera_options = {'overscan': 2.0}, viewport_options = {'grid': False}):
+        pass
+    assert cmds.attrs['cam1.overscan'] == 1.0
+    assert cmds.editor['grid'] is False
+
+
+def test_applied_restores_when_the_capture_fails():
+    cmds = FakeCmds()
+    state = view_state.ViewState(cmds)
+    try:
+        with state.applied('modelPanel1', viewport_options = {'grid': False}):
+            raise RuntimeError('playblast failed')
+    except RuntimeError:
+        pass
+    assert cmds.editor['grid'] is True
+
+
+class FakeMel(object):
+    '''
+    Runs the query procedures ViewState defines against a FakeCmds
+    '''
+    COMMANDS = [
+        (re.compile(r'displayPref -q -(\w+)'), lambda cmds, key, camera: cmds.prefs[key]),
+        (re.compile(r'displayRGBColor -q "(\w+)"'), lambda cmds, key, camera: cmds.rgb[key][0]),
+        (re.compile(r'getAttr \(\$camera \+ "\.(\w+)"\)'), lambda cmds, key, camera: cmds.getAttr('{}.{}'.format(camera, key))),
+        (re.compile(r'modelEditor -q -queryPluginObjects "(\w+)"'), lambda cmds, key, camera: cmds.plugins[key]),
+        (re.compile(r'modelEditor -q -(\w+) \$panel'), lambda cmds, key, camera: cmds.modelEditor(None, query = True, **{key: True})),
+        (re.compile(r'getAttr "hardwareRenderingGlobals\.(\w+)"'), lambda cmds, key, camera: cmds.getAttr('hardwareRenderingGlobals.' + key)),
+    ]
+
+    def __init__(self, cmds):
+        self.cmds = cmds
+        self.procedures = {}
+        self.calls = 0
+
+    def eval(self, code):
+        self.calls += 1
+        if code.startswith('global proc'):
+            name = re.search(r'string\[\] (\w+)\(', code).group(1)
+            self.procedures[name] = [line for line in code.splitlines() if 'catchQuiet' in line]
+            return
+        name, camera = re.match(r'(\w+)\("[^"]*", "([^"]*)"\)', code).groups()
+        return [self._query(line, camera) for line in self.procedures[name]]
+
+    def _query(self, line, camera):
+        for pattern, query in self.COMMANDS:
+            match = pattern.search(line)
+            if match:
+                try:
+                    value = query(self.cmds, match.group(1), camera)
+                except (KeyError, TypeError, ValueError):
+                    return view_state.UNAVAILABLE
+                if isinstance(value, (list, tuple)):
+                    return ''.join('{} '.format(float(item)) for item in value)
+                if isinstance(value, (bool, int, float)):
+                    return '{}'.format(float(value))
+                return value
+        raise AssertionError(line)
+
+
+def test_snapshots_compare_by_value():
+    cmds = FakeCmds()
+    state = view_state.ViewState(cmds)
+
+    first = state.snapshot('modelPanel1', PRESET)
+    second = state.snapshot('modelPanel1', PRESET)
+    assert first == second and hash(first) == hash(second)
+    assert len(set([first, second])) == 1
+    assert first['viewport_options']['gpuCache'] is True
+    assert 'notAFlag' not in first['viewport_options']
+
+    # floats read back from maya differ in the last digits
+    rounded = view_state.ViewSnapshot(camera = 'other', camera_options = {'overscan': 1.0000001})
+    assert rounded == view_state.ViewSnapshot(camera = 'cam1', camera_options = {'overscan': 1.0})
+    assert hash(rounded) == hash(view_state.ViewSnapshot(camera_options = {'overscan': 1.0}))
+
+    cmds.editor['grid'] = False
+    changed = state.snapshot('modelPanel1', PRESET)
+    assert changed != first
+    assert first.diff(changed) == {'viewport_options': {'grid': False}}
+
+
+def test_snapshots_are_immutable():
+    snapshot = view_state.ViewSnapshot(camera = 'cam1', viewport_options = {'grid': True})
+    for change in (lambda: setattr(snapshot, 'camera', 'cam2'),
+                   lambda: snapshot.viewport_options.__setitem__('grid', False)):
+        try:
+            change()
+        except (AttributeError, TypeError):
+            continue
+        raise AssertionError('snapshot was changed')
+    assert snapshot.to_dict()['viewport_options'] == {'grid': True}
+
+
+def test_plugin_filters_are_listed_once_until_invalidated():
+    cmds = FakeCmds()
+    state = view_state.ViewState(cmds)
+
+    state.snapshot('modelPanel1', PRESET)
+    state.apply('modelPanel1', PRESET)
+    assert cmds.calls.count('pluginDisplayFilter') == 1
+
+    state.invalidate_plugin_filters()
+    state.snapshot('modelPanel1', PRESET)
+    assert cmds.calls.count('pluginDisplayFilter') == 2
+
+
+def test_batched_read_is_one_mel_call():
+    cmds = FakeCmds()
+    mel = FakeMel(cmds)
+    state = view_state.ViewState(cmds, mel)
+    single_reads = []
+    read_value = state._read_value
+    state._read_value = lambda panel, camera, category, key, plugin: single_reads.append(key) or read_value(
+        panel, camera, category, key, plugin)
+
+    batched = state.snapshot('modelPanel1', PRESET)
+    # only what the batch couldn't read is asked for again on its own
+    assert sorted(single_reads) == ['notAFlag', 'notAnAttribute']
+    # the procedure is defined by the first read only
+    assert (mel.calls, len(mel.procedures)) == (2, 1)
+    state.snapshot('modelPanel1', PRESET)
+    assert mel.calls == 3
+
+    assert batched == view_state.ViewState(cmds).snapshot('modelPanel1', PRESET)
+    assert batched['display_options']['background'] == [0.631, 0.631, 0.631]
+    assert batched['viewport_options']['displayAppearance'] == 'smoothShaded'
+    assert batched['camera_options']['displayResolution'] is False
+    assert 'notAnAttribute' not in batched['viewport2_options']